@@ -1,14 +1,40 @@
+import os
+import time
 import uuid
 from django.db import models
 
+
+def uuid7(timestamp_ms=None, random_bits=None):
+    """
+    Returns a time-ordered UUID (RFC 9562 version 7).
+
+    The first 48 bits hold the Unix time in milliseconds and the rest is random, so
+    keys generated close together sort close together. New rows land at the right
+    edge of the primary key B-tree instead of on random pages across the index.
+
+    Args:
+        timestamp_ms (int): The time to encode. Defaults to now.
+        random_bits (int): 80 bits to use instead of ``os.urandom``, for
+            reproducible keys such as generated test data.
+    """
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    if random_bits is None:
+        random_bits = int.from_bytes(os.urandom(10), 'big')
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80 | (random_bits & (1 << 80) - 1)
+    # Stamp the version (0b0111) and variant (0b10) bits.
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
 """
 This BaseModel is used for all models in the project.
 """
 class BaseModel(models.Model):
-    uid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uid = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
-
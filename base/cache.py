@@ -0,0 +1,210 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from base.metrics import record_cache_lookups
+
+_MISSING = object()
+
+# Local tiers, their locks and counters by LOCATION. Django creates a backend
+# instance per thread, so these live at module level to be shared by the whole
+# process, like LocMemCache's.
+_local_tiers = {}
+_locks = {}
+_stats = {}
+
+STAT_NAMES = ('local_hits', 'shared_hits', 'misses', 'sets', 'deletes')
+LOOKUP_RESULTS = STAT_NAMES[:3]
+
+
+class TwoTierCache(BaseCache):
+    """
+    A cache backend with an in-process LRU tier in front of a shared backend.
+
+    ``LOCATION`` names the cache alias used as the shared tier (e.g. a file-based,
+    database or Redis cache). Reads are served from the local tier when possible
+    and fall through to the shared tier on a miss. The local tier is shared by
+    every thread of the process. Writes and deletes go to both tiers
+    (write-through), so the process that changes a value never sees a stale
+    copy. Other processes may keep serving their local copy for up to
+    ``LOCAL_TIMEOUT`` seconds, which should stay short.
+
+    ``incr``/``decr`` only use the shared tier, and are only atomic across
+    workers if its backend's are: Redis and Memcached, not the file-based or
+    database caches.
+
+    Options:
+        LOCAL_TIMEOUT: Maximum lifetime of a local entry in seconds. Default 5.
+        LOCAL_MAX_ENTRIES: Size of the local LRU. Default 1000.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local = _local_tiers.setdefault(location, OrderedDict())
+        self._lock = _locks.setdefault(location, threading.Lock())
+        self._stats = _stats.setdefault(location, dict.fromkeys(STAT_NAMES, 0))
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _timeout(self, timeout):
+        # Resolve DEFAULT_TIMEOUT here so both tiers use this backend's TIMEOUT.
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # Local tier
+
+    def _local_get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            expires, pickled = entry
+            if expires <= now:
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout):
+        lifetime = self._local_timeout
+        if timeout is not None:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            self._local_delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.monotonic() + lifetime, pickled)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+        if name in LOOKUP_RESULTS:
+            record_cache_lookups(self._shared_alias, name, amount)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('shared_hits')
+        self._local_set(local_key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        self._count('local_hits', len(found))
+        if remaining:
+            shared = self.shared.get_many(remaining, version=version)
+            for key, value in shared.items():
+                self._local_set(self.make_and_validate_key(key, version=version), value, None)
+            self._count('shared_hits', len(shared))
+            self._count('misses', len(remaining) - len(shared))
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        self._count('sets')
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        self._count('sets', len(data))
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+            self._count('sets')
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.touch(key, timeout=self._timeout(timeout), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Counters are never copied locally, where other processes couldn't see them.
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local_get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        self._count('deletes')
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self._count('deletes', len(keys))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        """
+        Returns this process's hit/miss counters and the overall hit rate.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,69 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Per-request routing state: {'replica': reads may use a replica,
+# 'alias': the replica chosen for them, 'wrote': the request has written}. It holds a mutable dict so changes made in
+# sync_to_async threads are seen by the middleware that owns the request.
+_routing_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """
+    Lets reads inside the block go to a read replica, until something writes.
+
+    Outside such a block (management commands, the email worker, tests) every
+    query goes to the primary.
+    """
+    state = {'replica': allowed, 'alias': None, 'wrote': False}
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the primary and, inside ``replica_reads()``, reads to a
+    replica from ``DATABASE_REPLICAS``. The replica is picked at random on the
+    first read of the block and used for the rest of it, so a request sees one
+    consistent snapshot however far behind each replica is.
+
+    The first write in a block pins the block's remaining reads to the primary,
+    so a request always reads its own writes. Replicas are copies of the primary,
+    so migrations only run on the primary.
+    """
+
+    def _replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        replicas = self._replicas()
+        if state is not None and state['replica'] and replicas:
+            if state['alias'] not in replicas:
+                state['alias'] = random.choice(replicas)
+            return state['alias']
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state['replica'] = False
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in self._replicas():
+            return False
+        return None
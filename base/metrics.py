@@ -0,0 +1,280 @@
+"""
+Request metrics in the Prometheus text format.
+
+Every thread records into its own store, so recording takes no lock; a scrape
+adds the stores up. With ``METRICS_MULTIPROC_DIR`` set, each worker process
+also writes its totals there at most every ``METRICS_FLUSH_SECONDS``, and a
+scrape of any worker reports the sum over all of them. Clear the directory
+when the workers are (re)started, like ``prometheus_client`` requires.
+"""
+
+import atexit
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by view, method and status class.', None),
+    'http_request_duration_seconds': ('histogram', 'Time spent handling requests.', LATENCY_BUCKETS),
+    'http_request_db_queries': ('histogram', 'Database queries per request.', QUERY_BUCKETS),
+    'http_request_db_seconds_total': ('counter', 'Time spent in database queries.', None),
+    'http_response_size_bytes': ('histogram', 'Response body sizes, where known.', SIZE_BUCKETS),
+    'cache_lookups_total': ('counter', 'Cache lookups during requests, by cache and result.', None),
+}
+
+_request_state = contextvars.ContextVar('metrics_request_state', default=None)
+
+_local = threading.local()
+_stores = []
+_pid = os.getpid()
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+_flush_name = None
+
+
+def _store():
+    store = getattr(_local, 'store', None)
+    if store is None or _local.pid != os.getpid():
+        _reset_after_fork()
+        store = _local.store = {}
+        _local.pid = os.getpid()
+        _stores.append(store)
+    return store
+
+
+def _reset_after_fork():
+    # A forked worker must not report its parent's totals as its own
+    global _pid, _flush_name, _last_flush
+    if os.getpid() != _pid:
+        _pid = os.getpid()
+        _stores.clear()
+        _flush_name = None
+        _last_flush = 0.0
+
+
+def inc(name, labels, amount=1):
+    """Adds ``amount`` to the counter ``name`` with the ``labels`` tuple of pairs."""
+    store = _store()
+    key = (name, labels)
+    store[key] = store.get(key, 0) + amount
+
+
+def observe(name, labels, value):
+    """Records ``value`` in the histogram ``name`` with the ``labels`` tuple of pairs."""
+    store = _store()
+    key = (name, labels)
+    buckets = METRICS[name][2]
+    series = store.get(key)
+    if series is None:
+        # Per-bucket counts, then the +Inf count and the sum
+        series = store[key] = [0] * (len(buckets) + 2)
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            series[index] += 1
+            break
+    else:
+        series[-2] += 1
+    series[-1] += value
+
+
+def snapshot():
+    """Returns this process's totals as ``{(name, labels): value or series}``."""
+    _reset_after_fork()
+    totals = {}
+    for store in list(_stores):
+        _merge(totals, store.copy())
+    return totals
+
+
+def _merge(totals, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = totals.get(key)
+            totals[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def collect():
+    """Returns the totals of every worker in multiprocess mode, else of this process."""
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+    if not directory:
+        return snapshot()
+    flush(force=True)
+    totals = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as file:
+                values = json.load(file)
+        except (OSError, ValueError):
+            continue
+        _merge(totals, {(name, tuple(map(tuple, labels))): value for name, labels, value in values})
+    return totals
+
+
+def flush(force=False):
+    """Writes this process's totals to ``METRICS_MULTIPROC_DIR``, at most once per interval."""
+    global _last_flush, _flush_name
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS:
+        return
+    # Whoever holds the lock is writing already; requests never wait for it.
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = now
+        values = [[name, labels, value] for (name, labels), value in snapshot().items()]
+        if _flush_name is None:
+            # The random part keeps a reused pid from overwriting a dead worker's totals
+            _flush_name = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        path = os.path.join(directory, _flush_name)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(values, file)
+        os.replace(f'{path}.tmp', path)
+    finally:
+        _flush_lock.release()
+
+
+atexit.register(flush, force=True)
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf'
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def exposition(totals, extra=()):
+    """
+    Renders ``totals`` in the Prometheus text exposition format.
+
+    Args:
+        totals (dict): As returned by ``collect``.
+        extra (iterable): More ``(name, type, help, [(labels, value), ...])``
+            families, computed at scrape time.
+    """
+    families = {}
+    for (name, labels), value in totals.items():
+        families.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        samples = sorted(families.get(name, ()))
+        if not samples:
+            continue
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+        for labels, value in samples:
+            if metric_type != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                bucket_labels = labels + (('le', _format_value(float(bound))),)
+                lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    for name, metric_type, help_text, samples in extra:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+        lines += [f'{name}{_format_labels(labels)} {_format_value(value)}' for labels, value in samples]
+    return '\n'.join(lines) + '\n'
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting queries and their time for the current request.
+    Installed on every connection by ``CoreConfig.ready``.
+    """
+    state = _request_state.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state['queries'] += 1
+        state['db_seconds'] += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_cache_lookups(location, result, amount=1):
+    """
+    Counts ``amount`` lookups with ``result`` on the ``TwoTierCache`` over
+    ``location`` for the current request. Called by the cache itself, so
+    requests running concurrently in one process don't count each other's.
+    """
+    state = _request_state.get()
+    if state is None or not amount:
+        return
+    key = (location, result)
+    state['cache_lookups'][key] = state['cache_lookups'].get(key, 0) + amount
+
+
+class RequestMetrics:
+    """
+    Collects one request's database and cache activity.
+
+    Args:
+        cache_aliases (dict): The alias to report for each ``TwoTierCache``, by
+            its ``LOCATION``.
+    """
+
+    def __init__(self, cache_aliases):
+        self.cache_aliases = cache_aliases
+        self.state = {'queries': 0, 'db_seconds': 0.0, 'cache_lookups': {}}
+        self.start = time.perf_counter()
+        self.token = _request_state.set(self.state)
+
+    def finish(self, request, response):
+        duration = time.perf_counter() - self.start
+        _request_state.reset(self.token)
+        match = getattr(request, 'resolver_match', None)
+        # URL names, never raw paths, keep the number of series bounded
+        view = match.view_name if match else '<unmatched>'
+        labels = (('view', view), ('method', request.method))
+        inc('http_requests_total', labels + (('status', f'{response.status_code // 100}xx'),))
+        observe('http_request_duration_seconds', labels, duration)
+        observe('http_request_db_queries', labels, self.state['queries'])
+        inc('http_request_db_seconds_total', labels, self.state['db_seconds'])
+        if response.streaming:
+            size = response.get('Content-Length')
+        else:
+            size = len(response.content)
+        if size is not None:
+            observe('http_response_size_bytes', labels, int(size))
+        for (location, result), count in self.state['cache_lookups'].items():
+            alias = self.cache_aliases.get(location)
+            if alias is not None:
+                inc('cache_lookups_total', (('cache', alias), ('result', result)), count)
+        flush()
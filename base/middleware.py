@@ -0,0 +1,98 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+from base.db_router import replica_reads
+from base.metrics import RequestMetrics
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets read-only requests use the read replicas, with read-your-writes stickiness.
+
+    Safe requests (GET/HEAD/OPTIONS) read from a replica unless the client
+    recently wrote. Any request that writes sets a short-lived cookie
+    (``REPLICA_PIN_COOKIE_NAME``) so the client's following requests read from
+    the primary until the replicas have caught up (``REPLICA_PIN_SECONDS``).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self._use_replica(request)) as state:
+            response = self.get_response(request)
+        return self._process_response(response, state)
+
+    async def __acall__(self, request):
+        with replica_reads(self._use_replica(request)) as state:
+            response = await self.get_response(request)
+        return self._process_response(response, state)
+
+    def _use_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        pinned_until = request.COOKIES.get(settings.REPLICA_PIN_COOKIE_NAME)
+        try:
+            return float(pinned_until) < time.time()
+        except (TypeError, ValueError):
+            return True
+
+    def _process_response(self, response, state):
+        if state['wrote']:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE_NAME,
+                str(time.time() + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency, database queries and time, cache lookups
+    and response size per URL name (see ``base.metrics``).
+
+    Goes first in ``MIDDLEWARE`` so the time spent in other middleware counts.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cache_aliases = {
+            settings.CACHES[alias]['LOCATION']: alias
+            for alias in settings.CACHES if hasattr(caches[alias], 'stats')
+        }
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = self._start()
+        response = self.get_response(request)
+        metrics.finish(request, response)
+        return response
+
+    async def __acall__(self, request):
+        metrics = self._start()
+        response = await self.get_response(request)
+        metrics.finish(request, response)
+        return response
+
+    def _start(self):
+        return RequestMetrics(self.cache_aliases)
@@ -0,0 +1,46 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that trusts the query planner for the size of large result sets.
+
+    An exact ``COUNT(*)`` has to visit every matching row. On Postgres this paginator
+    asks the planner instead: ``pg_class.reltuples`` for unfiltered querysets and the
+    ``EXPLAIN`` row estimate for filtered ones. Exact counting is kept when the
+    estimate is below ``exact_count_threshold``, where it is cheap, and on other
+    database engines.
+    """
+    exact_count_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            estimate = self._planner_estimate(self.object_list)
+            if estimate is not None and estimate >= self.exact_count_threshold:
+                return estimate
+        return super().count
+
+    def _planner_estimate(self, queryset):
+        """
+        Returns the planner's row estimate for the queryset, or None if unavailable.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        if not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 until the table has been vacuumed or analyzed.
+            return row[0] if row and row[0] >= 0 else None
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
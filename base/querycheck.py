@@ -0,0 +1,187 @@
+"""
+N+1 and slow query detection for development and tests.
+
+Every SQL statement run while a ``QueryLog`` is open is recorded with its
+connection alias and duration, on all databases (shards and replicas too).
+Statements are grouped by shape, i.e. with their parameters and literals
+taken out, so the same query run for each row of a list shows up as one
+shape executed many times.
+
+``QueryInspectorMiddleware`` logs repeated shapes and slow statements for
+every request when ``QUERY_INSPECTOR_ENABLED`` is set, which it is by default
+with ``DEBUG``. ``QueryBudgetMixin`` fails tests instead.
+"""
+
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+# The lists of every open QueryLog in this context
+_recording = contextvars.ContextVar('querycheck_recording', default=())
+
+_IN_LIST = re.compile(r'\bIN\s*\(\s*%s(?:\s*,\s*%s)*\s*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """Returns ``sql`` with parameters, literals and ``IN`` list lengths taken out."""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape.replace('%s', '?')).strip()
+
+
+class Query:
+    __slots__ = ('alias', 'sql', 'duration')
+
+    def __init__(self, alias, sql, duration):
+        self.alias = alias
+        self.sql = sql
+        self.duration = duration
+
+    def __repr__(self):
+        return f'<Query {self.alias} {self.duration * 1000:.1f}ms {self.sql[:60]!r}>'
+
+
+def record_statement(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding each statement to the open ``QueryLog``s.
+    Installed on every connection by ``CoreConfig.ready``.
+    """
+    logs = _recording.get()
+    if not logs:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        query = Query(context['connection'].alias, sql, time.perf_counter() - start)
+        for queries in logs:
+            queries.append(query)
+
+
+def install_statement_recorder(sender, connection, **kwargs):
+    if record_statement not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_statement)
+
+
+class QueryLog:
+    """
+    Records the SQL statements run inside a ``with`` block.
+
+    Attributes:
+        queries (list): The ``Query`` objects recorded, in order.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._token = None
+
+    def __enter__(self):
+        self._token = _recording.set(_recording.get() + (self.queries,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _recording.reset(self._token)
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query.duration for query in self.queries)
+
+    def repeated(self, threshold=None):
+        """
+        Returns the ``(shape, count)`` of query shapes run at least ``threshold``
+        times (default ``QUERY_REPEAT_THRESHOLD``) on one database, most frequent first.
+        """
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        counts = Counter((query.alias, query_shape(query.sql)) for query in self.queries)
+        return [(shape, count) for (_, shape), count in counts.most_common() if count >= threshold]
+
+    def slow(self, threshold=None):
+        """Returns the queries that took ``threshold`` seconds or more (default ``QUERY_SLOW_SECONDS``)."""
+        threshold = settings.QUERY_SLOW_SECONDS if threshold is None else threshold
+        return [query for query in self.queries if query.duration >= threshold]
+
+    def problems(self, budget=None, include_slow=True):
+        """Returns a line describing each problem found: over budget, N+1 or slow."""
+        problems = []
+        if budget is not None and len(self) > budget:
+            problems.append(f'{len(self)} queries, over the budget of {budget}')
+        for shape, count in self.repeated():
+            problems.append(f'possible N+1, run {count} times: {shape}')
+        for query in self.slow() if include_slow else ():
+            problems.append(f'slow query, {query.duration * 1000:.0f}ms on {query.alias}: {query.sql}')
+        return problems
+
+
+class QueryInspectorMiddleware:
+    """
+    Logs possible N+1 queries and slow queries for each request, and adds
+    ``X-Query-Count``/``X-Query-Time`` headers. Only loaded when
+    ``QUERY_INSPECTOR_ENABLED`` is set.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryLog() as log:
+            response = self.get_response(request)
+        return self._report(request, response, log)
+
+    async def __acall__(self, request):
+        with QueryLog() as log:
+            response = await self.get_response(request)
+        return self._report(request, response, log)
+
+    def _report(self, request, response, log):
+        for problem in log.problems():
+            logger.warning('%s %s: %s', request.method, request.path, problem)
+        response['X-Query-Count'] = str(len(log))
+        response['X-Query-Time'] = f'{log.duration * 1000:.1f}ms'
+        return response
+
+
+class QueryBudgetMixin:
+    """
+    ``TestCase`` mixin failing tests whose code runs too many queries or
+    repeats a query shape (N+1). Slow queries are logged, since test timings
+    vary too much to fail on.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, label='the block'):
+        """
+        Fails if the block runs more than ``budget`` queries on any database or
+        repeats a query shape ``QUERY_REPEAT_THRESHOLD`` times.
+        """
+        with QueryLog() as log:
+            yield log
+        for query in log.slow():
+            logger.warning('%s: slow query, %.0fms: %s', label, query.duration * 1000, query.sql)
+        failures = log.problems(budget, include_slow=False)
+        if failures:
+            statements = '\n'.join(f'  {query.alias}: {query.sql}' for query in log.queries)
+            self.fail(f'{label}: ' + '; '.join(failures) + f'\nQueries:\n{statements}')
@@ -0,0 +1,192 @@
+"""
+Efficient file responses: conditional GET, single byte ranges and web server
+offload (X-Accel-Redirect for nginx, X-Sendfile for Apache/lighttpd).
+
+Files are never read into memory. Whole files are returned as a plain
+``FileResponse`` over the open file, which WSGI servers send with
+``wsgi.file_wrapper`` (sendfile, zero-copy); ranges are streamed in blocks.
+"""
+
+import mimetypes
+import os
+import re
+from email.utils import parsedate_to_datetime
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from base.storage import STATIC_ENCODINGS
+
+BLOCK_SIZE = 64 * 2 ** 10
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Reads at most ``length`` bytes of an open file, starting at ``start``."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def etag_for(stat):
+    """Returns a strong validator for a file from its modification time and size."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parses a ``Range`` header against a file of ``size`` bytes.
+
+    Only single ranges are served; anything else gets the whole file, which the
+    RFC allows.
+
+    Returns:
+        tuple: ``(start, end)`` inclusive, None to send the whole file, or
+        ``(size, size)`` if the range can't be satisfied.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = min(int(last), size)
+        return (size - length, size - 1) if length else (size, size)
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return size, size
+    if end < start:
+        return None
+    return start, end
+
+
+def accepted_encodings(request):
+    """Returns the content codings the client accepts, leaving out ``q=0`` ones."""
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, *params = (part.strip().lower() for part in item.split(';'))
+        quality = next((param[2:] for param in params if param.startswith('q=')), '1')
+        try:
+            if float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        if coding:
+            accepted.add(coding)
+    return accepted
+
+
+def precompressed_variant(request, path):
+    """
+    Picks the preferred precompressed sibling of ``path`` the client accepts.
+
+    Returns:
+        tuple: The path to send, its ``Content-Encoding`` (None for ``path``
+        itself) and whether any sibling exists, i.e. whether the response varies
+        on ``Accept-Encoding``.
+    """
+    accepted = accepted_encodings(request)
+    available = [(encoding, path + suffix) for encoding, suffix in STATIC_ENCODINGS if os.path.isfile(path + suffix)]
+    for encoding, variant in available:
+        if encoding in accepted or '*' in accepted:
+            return variant, encoding, True
+    return path, None, bool(available)
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    try:
+        return int(parsedate_to_datetime(value).timestamp()) == int(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+def serve_file(request, path, url_path, cache_control, accel_prefix=None, sendfile=False, content_type=None,
+               extra_headers=None):
+    """
+    Returns a response for the file at ``path``, honouring conditional and range
+    requests or handing the transfer to the web server.
+
+    Args:
+        request: The HTTP request.
+        path (str): Absolute path of an existing regular file.
+        url_path (str): The file's path relative to the served root, for offload.
+        cache_control (str): The ``Cache-Control`` header value.
+        accel_prefix (str): Internal nginx location to redirect to, if offloading.
+        sendfile (bool): Whether to offload with ``X-Sendfile``.
+        content_type (str): Overrides the type guessed from ``path``.
+        extra_headers (dict): More headers to set, e.g. ``Content-Encoding``.
+    """
+    stat = os.stat(path)
+    etag = etag_for(stat)
+    last_modified = int(stat.st_mtime)
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = cache_control
+        for header, value in (extra_headers or {}).items():
+            if header == 'Vary':
+                patch_vary_headers(response, value.split(','))
+            else:
+                response[header] = value
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return finish(not_modified)
+
+    if accel_prefix or sendfile:
+        # The web server handles ranges and conditional requests itself.
+        response = HttpResponse(content_type=content_type)
+        if accel_prefix:
+            response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + url_path.lstrip('/')
+        else:
+            response['X-Sendfile'] = path
+        return finish(response)
+
+    size = stat.st_size
+    byte_range = None
+    if request.method in ('GET', 'HEAD') and _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range == (size, size):
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(file, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.block_size = BLOCK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    return finish(response)
@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import os
+import re
+import uuid
+from functools import cached_property
+
+from django.apps import apps
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASH_CHUNK_SIZE = 64 * 2 ** 10
+
+# Encodings written next to static files, in order of preference when serving
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CONTENT_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})(?:\.[^/]*)?$')
+
+
+def is_content_addressed(name):
+    """
+    Returns whether ``name`` is a blob stored by ``ContentAddressedStorage`` or a
+    file derived from one, whose content therefore never changes.
+    """
+    return _CONTENT_NAME.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names uploads by the SHA-256 of their content.
+
+    ``media/avatar.JPG`` is stored as ``media/<d[:2]>/<digest>.jpg``, so identical
+    uploads share one file and a name never changes content, which makes them
+    safe to cache forever. Saving content that is already stored writes nothing.
+    Every save claims the blob's ``core.models.MediaBlob`` row first, so the
+    garbage collector can't delete the file between the check and the upload's
+    reference being recorded. Files derived from a blob, such as image variants, are written under a name
+    of the caller's choosing with ``save_derived``.
+
+    Shared files must not be deleted while anything refers to them; see
+    ``core.models.MediaBlob`` and the ``gc_media`` command.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal content, so there is never a need to pick another.
+        return name
+
+    def content_name(self, name, content):
+        """
+        Returns the content-addressed name for ``content`` uploaded as ``name``.
+        """
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return os.path.join(directory, hexdigest[:2], f'{hexdigest}{extension}')
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        with transaction.atomic():
+            apps.get_model('core', 'MediaBlob').objects.claim(name)
+            if self.exists(name):
+                return name
+            return self._replace(name, content)
+
+    def save_derived(self, name, content):
+        """
+        Stores ``content`` under exactly ``name``, replacing any existing file.
+        Only for names derived from a stored blob's name, never for uploads.
+        """
+        return self._replace(name, content)
+
+    def _replace(self, name, content):
+        # Write under a unique name and rename into place, so concurrent saves of
+        # the same content each succeed and readers never see a partial file.
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files storage that adds content hashes to file names and writes
+    ``.gz`` and, with the ``brotli`` package installed, ``.br`` siblings of
+    text assets during ``collectstatic``.
+
+    Compressed files are only kept when they save at least 5%, so the serving
+    layer (``core.views.StaticView``) picks whatever exists for a client's
+    ``Accept-Encoding``. Names missing from the manifest fall back to hashing
+    the file on the fly instead of failing.
+    """
+    manifest_strict = False
+    compress_extensions = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                names.update(n for n in (name, hashed_name) if n)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(names):
+                self.compress(name)
+
+    def compress(self, name):
+        """Writes the compressed siblings of ``name`` worth keeping."""
+        if not name.lower().endswith(self.compress_extensions):
+            return
+        with self.open(name) as file:
+            content = file.read()
+        if len(content) < self.compress_min_size:
+            return
+        for encoding, suffix in STATIC_ENCODINGS:
+            if encoding == 'br':
+                if brotli is None:
+                    continue
+                compressed = brotli.compress(content, quality=11)
+            else:
+                # mtime=0 keeps the output identical across collectstatic runs
+                compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) <= len(content) * 0.95:
+                self._save(name + suffix, ContentFile(compressed))
+
+    @cached_property
+    def hashed_names(self):
+        """The set of file names that carry a content hash, from the manifest."""
+        return set(self.hashed_files.values())
+
+    def is_hashed(self, name):
+        """Returns whether ``name`` is a hashed name, so it never changes content."""
+        return name in self.hashed_names
@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_platform.settings')
+# Serve the user views with their async versions; see settings.USE_ASYNC_VIEWS.
+os.environ.setdefault('USE_ASYNC_VIEWS', 'True')
+# Persistent connections are per thread and are not reused reliably under ASGI;
+# use DATABASE_POOL=True here instead.
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -1,4 +1,5 @@
 import os
+import sys
 import environ
 from pathlib import Path
 
@@ -38,7 +39,10 @@ USER_DEFINED_APPS = [
 INSTALLED_APPS = BUILT_IN_APPS + THIRD_PARTY_APPS + USER_DEFINED_APPS
 
 MIDDLEWARE = [
+    'base.middleware.MetricsMiddleware',
+    'base.querycheck.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'base.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,6 +71,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'blog_platform.wsgi.application'
 
+# Route the user views to their async versions (user.async_views).
+# blog_platform.asgi turns this on unless the environment says otherwise.
+USE_ASYNC_VIEWS = env.bool('USE_ASYNC_VIEWS', default=False)
+# Threads available for password hashing in the async views
+PASSWORD_HASHING_WORKERS = env.int('PASSWORD_HASHING_WORKERS', default=os.cpu_count())
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -83,7 +93,115 @@ DATABASES = {
         'PASSWORD': env('DATABASE_PASSWORD'),
         'HOST': env('DATABASE_HOST', default='127.0.0.1'),
         'PORT': env('DATABASE_PORT', default='5432'),
+        # Reuse connections across requests instead of reconnecting every time,
+        # checking them before reuse. blog_platform.asgi defaults this to 0.
+        'CONN_MAX_AGE': env.int('DATABASE_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('DATABASE_CONN_HEALTH_CHECKS', default=True),
+        # Required behind transaction-mode poolers such as PgBouncer
+        'DISABLE_SERVER_SIDE_CURSORS': env.bool('DATABASE_DISABLE_SERVER_SIDE_CURSORS', default=False),
+    }
+}
+
+# Connection pool (psycopg 3 + psycopg_pool, Django 5.1+). Works the same under
+# WSGI and ASGI, and replaces persistent connections when enabled.
+if env.bool('DATABASE_POOL', default=False):
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+            # Seconds before idle connections above min_size are closed
+            'max_idle': env.float('DATABASE_POOL_MAX_IDLE', default=300.0),
+            # Seconds before any connection is recycled
+            'max_lifetime': env.float('DATABASE_POOL_MAX_LIFETIME', default=3600.0),
+            # Seconds to wait for a free connection before failing
+            'timeout': env.float('DATABASE_POOL_TIMEOUT', default=10.0),
+            # Health check run when a connection is handed out
+            'check': ConnectionPool.check_connection,
+        },
+    }
+
+
+# Read replicas
+# Safe requests read from a replica unless the client wrote within the last
+# REPLICA_PIN_SECONDS (see base.middleware.ReplicaRoutingMiddleware). Each host in
+# DATABASE_REPLICA_HOSTS becomes a "replica_<n>" alias mirroring the primary.
+
+DATABASE_REPLICAS = []
+for index, host in enumerate(env.list('DATABASE_REPLICA_HOSTS', default=[])):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(alias)
+
+REPLICA_PIN_COOKIE_NAME = 'pin_primary'
+
+# Should exceed the worst expected replication lag
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
+
+
+# User sharding
+# The user table is split across USER_SHARDS by a hash of its primary key (see
+# user.sharding). Each host in DATABASE_USER_SHARD_HOSTS adds a "user_shard_<n>"
+# alias; run rebalance_user_shards after changing the list.
+
+USER_SHARDS = ['default']
+for index, host in enumerate(env.list('DATABASE_USER_SHARD_HOSTS', default=[]), start=1):
+    alias = f'user_shard_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host}
+    USER_SHARDS.append(alias)
+
+# Test runs get a second database to shard users across, enabled per test with
+# override_settings(USER_SHARDS=...). Its test database is a separate SQLite one.
+# They also get a read replica mirroring the primary's test database, enabled
+# with override_settings(DATABASE_REPLICAS=['replica_test']). Configured replicas
+# are not used: a test case's uncommitted rows are invisible to them.
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    DATABASES['user_shard_test'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'user_shard_test.sqlite3'}
+    DATABASES['replica_test'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = [
+    'user.sharding.UserShardRouter',
+    'base.db_router.PrimaryReplicaRouter',
+]
+
+
+# Cache
+# Two tiers: a small per-process LRU in front of a cache shared by all workers.
+# The shared tier defaults to a file-based cache; point CACHE_SHARED_BACKEND at
+# Redis, Memcached or django.core.cache.backends.db.DatabaseCache in production.
+# Only Redis and Memcached have an atomic incr().
+
+CACHES = {
+    'default': {
+        'BACKEND': 'base.cache.TwoTierCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'LOCAL_TIMEOUT': env.int('CACHE_LOCAL_TIMEOUT', default=5),
+            'LOCAL_MAX_ENTRIES': env.int('CACHE_LOCAL_MAX_ENTRIES', default=10000),
+        },
+    },
+    'shared': {
+        'BACKEND': env('CACHE_SHARED_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': env('CACHE_SHARED_LOCATION', default=str(BASE_DIR / '.cache')),
+        'TIMEOUT': 300,
+    },
+    # Login throttle counters (see THROTTLE_CACHE_ALIAS). They need a backend
+    # with an atomic incr(), so the file-based and database caches won't do.
+    # Point THROTTLE_CACHE_BACKEND at Redis or Memcached in production; the
+    # default local memory cache is atomic but counts per worker process.
+    'throttle': {
+        'BACKEND': env('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('THROTTLE_CACHE_LOCATION', default='throttle'),
+    },
 }
 
 
@@ -125,10 +243,52 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Hashed names (see base.storage.CompressedManifestStaticFilesStorage) are cached
+# as immutable; anything else collected is cached for this long.
+STATIC_CACHE_MAX_AGE = env.int('STATIC_CACHE_MAX_AGE', default=3600)
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per distinct content and named by its hash; the
+# gc_media command deletes files no longer referenced (see core.models.MediaBlob).
+# collectstatic writes hashed static names with gzip/brotli siblings, served by
+# core.views.StaticView.
+STORAGES = {
+    'default': {
+        'BACKEND': 'base.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'base.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+# Unreferenced files younger than this are kept, covering uploads whose
+# reference is not recorded yet
+MEDIA_GC_GRACE_SECONDS = env.int('MEDIA_GC_GRACE_SECONDS', default=24 * 3600)
+
+# How core.views.MediaView sends files: 'python' streams them itself (ranges,
+# sendfile through wsgi.file_wrapper), 'x-accel-redirect' hands them to nginx
+# through an internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to
+# MEDIA_ROOT, and 'x-sendfile' to Apache/lighttpd.
+MEDIA_SERVE_MODE = env.str('MEDIA_SERVE_MODE', default='python')
+MEDIA_ACCEL_REDIRECT_PREFIX = env.str('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+# Content-addressed files never change and are cached for a year; anything
+# else under MEDIA_ROOT only for this long.
+MEDIA_CACHE_MAX_AGE = env.int('MEDIA_CACHE_MAX_AGE', default=3600)
+
+# Profile pictures are streamed to disk in 64 KiB chunks and their image header
+# checked as they arrive (see user.uploads.LimitedImageUploadMixin), so none is
+# ever held in memory. Other uploads use Django's default handlers.
+PROFILE_PICTURE_MAX_BYTES = env.int('PROFILE_PICTURE_MAX_BYTES', default=5 * 2 ** 20)
+PROFILE_PICTURE_MAX_PIXELS = env.int('PROFILE_PICTURE_MAX_PIXELS', default=25_000_000)
+PROFILE_PICTURE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Square WebP variants generated for each profile picture, by edge length
+PROFILE_PICTURE_VARIANTS = {'small': 64, 'medium': 128, 'large': 256}
+PROFILE_PICTURE_WEBP_QUALITY = 80
+# Processes generating variants in the background; 0 generates them inline
+PROFILE_PICTURE_WORKERS = env.int('PROFILE_PICTURE_WORKERS', default=2)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -144,5 +304,58 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
 
-
-AUTH_USER_MODEL = 'user.User'
\ No newline at end of file
+# Lifetime of the signed links sent by EmailService.send_confirmation_email
+EMAIL_CONFIRMATION_TOKEN_MAX_AGE = env.int('EMAIL_CONFIRMATION_TOKEN_MAX_AGE', default=60 * 60 * 24)
+
+# Email outbox, drained by `manage.py run_email_worker`
+EMAIL_OUTBOX_BATCH_SIZE = env.int('EMAIL_OUTBOX_BATCH_SIZE', default=100)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5)
+EMAIL_OUTBOX_RETRY_BACKOFF = env.int('EMAIL_OUTBOX_RETRY_BACKOFF', default=60)
+EMAIL_OUTBOX_RETRY_BACKOFF_MAX = env.int('EMAIL_OUTBOX_RETRY_BACKOFF_MAX', default=3600)
+
+
+AUTH_USER_MODEL = 'user.User'
+# User.email is unique through a lower(email) constraint, which the auth check
+# for a unique USERNAME_FIELD doesn't recognise.
+SILENCED_SYSTEM_CHECKS = ['auth.W004']
+
+# Serve the session user from the cache instead of querying it on every request
+AUTHENTICATION_BACKENDS = ['user.backends.CachedModelBackend']
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+USER_CACHE_TIMEOUT = env.int('USER_CACHE_TIMEOUT', default=300)
+
+# Sliding-window limits on POSTs that hash a password or send email, checked
+# before any hashing (see user.throttling). Each scope maps "ip" and/or
+# "account" (the submitted email) to (attempts, window in seconds).
+THROTTLE_RATES = {
+    'login': {'ip': (30, 60), 'account': (10, 300)},
+    'register': {'ip': (10, 3600)},
+    'password_reset': {'ip': (10, 3600), 'account': (3, 3600)},
+    'password_reset_confirm': {'ip': (10, 300)},
+}
+# Must have an atomic incr() (checked at startup, see user.checks), or
+# concurrent attempts lose counts and parallel guessing exceeds the limits
+THROTTLE_CACHE_ALIAS = 'throttle'
+# Reverse proxies in front of the app that append to X-Forwarded-For
+THROTTLE_NUM_PROXIES = env.int('THROTTLE_NUM_PROXIES', default=0)
+
+# Users updated or deleted per transaction by the bulk admin actions
+USER_MODERATION_CHUNK_SIZE = env.int('USER_MODERATION_CHUNK_SIZE', default=1000)
+# Request metrics, served in the Prometheus format at /metrics (see
+# base.metrics). With several worker processes, point METRICS_MULTIPROC_DIR at
+# a directory shared by them and emptied on deploy; each worker writes its
+# totals there at most every METRICS_FLUSH_SECONDS.
+METRICS_MULTIPROC_DIR = env.str('METRICS_MULTIPROC_DIR', default='')
+METRICS_FLUSH_SECONDS = env.float('METRICS_FLUSH_SECONDS', default=1.0)
+# Scrapers send METRICS_TOKEN as a bearer token. Without one, only requests made
+# directly (not through a proxy, see THROTTLE_NUM_PROXIES) from METRICS_ALLOWED_IPS
+# may scrape; set a token when the app runs behind a reverse proxy.
+METRICS_TOKEN = env.str('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+
+# Development aid logging possible N+1 queries (one query shape run at least
+# QUERY_REPEAT_THRESHOLD times in a request) and queries slower than
+# QUERY_SLOW_SECONDS (see base.querycheck). Tests use QueryBudgetMixin instead.
+QUERY_INSPECTOR_ENABLED = env.bool('QUERY_INSPECTOR_ENABLED', default=DEBUG)
+QUERY_REPEAT_THRESHOLD = env.int('QUERY_REPEAT_THRESHOLD', default=3)
+QUERY_SLOW_SECONDS = env.float('QUERY_SLOW_SECONDS', default=0.1)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from base.metrics import install_query_recorder
+        from base.querycheck import install_statement_recorder
+        connection_created.connect(install_query_recorder, dispatch_uid='base.metrics.install_query_recorder')
+        connection_created.connect(install_statement_recorder, dispatch_uid='base.querycheck.install_statement_recorder')
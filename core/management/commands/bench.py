@@ -0,0 +1,223 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from base.querycheck import QueryLog
+from user.models import EmailOutbox, User
+from user.tokens import email_confirmation_token_generator
+
+BENCH_DOMAIN = 'bench.example.invalid'
+BENCH_EMAIL = f'bench@{BENCH_DOMAIN}'
+BENCH_PASSWORD = 'bench-password-123'
+
+SCENARIOS = (
+    'register', 'login', 'profile', 'update_profile', 'email_confirm', 'password_reset', 'password_reset_confirm',
+)
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the auth and profile flows end to end against the configured database.
+
+    Each scenario sends its request through the full middleware stack with the
+    test client, one request at a time, and records its latency and the queries
+    it ran. Per-request setup, such as creating the account an email confirmation
+    link is for, is not timed. Throttling is switched off and outgoing mail kept
+    in memory for the run. Every account the run creates is removed again.
+
+    The results are written as JSON. With ``--baseline`` the run is compared with
+    an earlier result file: a scenario regressed if its p95 latency rose or its
+    throughput fell by more than ``--threshold`` percent, or it runs more queries.
+    """
+
+    help = 'Benchmark the register, login, profile, email confirmation and password reset flows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per scenario first.')
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+            help='Scenario to run (repeatable; default: all).',
+        )
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout.')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare with.')
+        parser.add_argument('--threshold', type=float, default=10.0, help='Allowed slowdown in percent.')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true', help='Exit with an error if any scenario regressed.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError('--requests must be at least 1 and --warmup not negative.')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read the baseline: {e}')
+
+        overrides = override_settings(
+            THROTTLE_RATES={},
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        )
+        with overrides:
+            self._cleanup()
+            self.user = User.objects.create_user(
+                email=BENCH_EMAIL, username='bench', password=BENCH_PASSWORD, is_email_confirmed=True,
+            )
+            try:
+                scenarios = {
+                    name: self._run(name, options['requests'], options['warmup'])
+                    for name in options['scenarios'] or SCENARIOS
+                }
+            finally:
+                self._cleanup()
+                mail.outbox = []
+
+        results = {
+            'meta': {
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'scenarios': scenarios,
+        }
+        if baseline is not None:
+            results['comparison'] = self._compare(scenarios, baseline.get('scenarios', {}), options['threshold'])
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self._summarize(results)
+        else:
+            self.stdout.write(output)
+
+        regressed = sorted(name for name, change in results.get('comparison', {}).items() if change['regressed'])
+        if regressed and options['fail_on_regression']:
+            raise CommandError(f'Regressed: {", ".join(regressed)}')
+
+    def _cleanup(self):
+        User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+        EmailOutbox.objects.filter(to_email__endswith=f'@{BENCH_DOMAIN}').delete()
+
+    def _run(self, name, requests, warmup):
+        prepare = getattr(self, f'_prepare_{name}')
+        latencies = []
+        queries = []
+        for iteration in range(warmup + requests):
+            client, method, path, data, expected = prepare(f'{name}-{iteration}')
+            with QueryLog() as log:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data)
+                elapsed = time.perf_counter() - started
+            if response.status_code != expected:
+                # A failing flow would be measured as a fast one
+                raise CommandError(f'{name}: {method.upper()} {path} returned {response.status_code}, not {expected}')
+            if iteration >= warmup:
+                latencies.append(elapsed * 1000)
+                queries.append(len(log))
+        return {
+            'requests': requests,
+            'throughput': round(requests / (sum(latencies) / 1000), 1),
+            'p50_ms': round(self._percentile(latencies, 50), 2),
+            'p95_ms': round(self._percentile(latencies, 95), 2),
+            'p99_ms': round(self._percentile(latencies, 99), 2),
+            'queries_mean': round(statistics.fmean(queries), 2),
+            'queries_max': max(queries),
+        }
+
+    def _signed_in_client(self):
+        client = Client()
+        client.force_login(self.user)
+        return client
+
+    # Scenarios: each returns the client, method, path, data and expected status
+    # of one timed request
+
+    def _prepare_register(self, key):
+        data = {
+            'username': key, 'email': f'{key}@{BENCH_DOMAIN}',
+            'password': BENCH_PASSWORD, 'password_confirm': BENCH_PASSWORD, 'bio': '',
+        }
+        return Client(), 'post', reverse('user:register'), data, 302
+
+    def _prepare_login(self, key):
+        return Client(), 'post', reverse('user:login'), {'username': BENCH_EMAIL, 'password': BENCH_PASSWORD}, 302
+
+    def _prepare_profile(self, key):
+        return self._signed_in_client(), 'get', reverse('user:profile'), None, 200
+
+    def _prepare_update_profile(self, key):
+        data = {'username': 'bench', 'email': BENCH_EMAIL, 'bio': f'Updated by {key}'}
+        return self._signed_in_client(), 'post', reverse('user:update'), data, 302
+
+    def _prepare_email_confirm(self, key):
+        user = User.objects.create_user(email=f'{key}@{BENCH_DOMAIN}', username=key, is_active=False)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        token = email_confirmation_token_generator.make_token(user)
+        return Client(), 'get', reverse('user:confirm_email', args=[uid, token]), None, 302
+
+    def _prepare_password_reset(self, key):
+        return Client(), 'post', reverse('user:password_reset'), {'email': BENCH_EMAIL}, 302
+
+    def _prepare_password_reset_confirm(self, key):
+        # Opening the emailed link stores the token in the session and redirects
+        client = Client()
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        self.user.refresh_from_db()
+        link = reverse('user:password_reset_confirm', args=[uid, default_token_generator.make_token(self.user)])
+        set_password_url = client.get(link)['Location']
+        data = {'new_password1': BENCH_PASSWORD, 'new_password2': BENCH_PASSWORD}
+        return client, 'post', set_password_url, data, 302
+
+    def _compare(self, scenarios, baseline, threshold):
+        comparison = {}
+        for name, result in scenarios.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+            throughput_change = (result['throughput'] - before['throughput']) / before['throughput'] * 100
+            queries_change = result['queries_mean'] - before['queries_mean']
+            comparison[name] = {
+                'p95_ms_change_pct': round(p95_change, 1),
+                'throughput_change_pct': round(throughput_change, 1),
+                'queries_change': round(queries_change, 2),
+                'regressed': p95_change > threshold or throughput_change < -threshold or queries_change > 0,
+            }
+        return comparison
+
+    def _summarize(self, results):
+        comparison = results.get('comparison', {})
+        for name, result in results['scenarios'].items():
+            line = (
+                f'{name:24} {result["throughput"]:8.1f} req/s  p50 {result["p50_ms"]:7.1f} ms  '
+                f'p95 {result["p95_ms"]:7.1f} ms  p99 {result["p99_ms"]:7.1f} ms  '
+                f'{result["queries_mean"]:5.1f} queries'
+            )
+            change = comparison.get(name)
+            if change:
+                line += f'  p95 {change["p95_ms_change_pct"]:+.1f}%'
+                if change['regressed']:
+                    line = self.style.ERROR(line + '  REGRESSED')
+            self.stdout.write(line)
+
+    @staticmethod
+    def _percentile(values, percentile):
+        return statistics.quantiles(values, n=100)[percentile - 1] if len(values) > 1 else values[0]
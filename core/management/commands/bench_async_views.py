@@ -0,0 +1,115 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.urls import reverse
+
+from user.async_views import AsyncLoginView, AsyncProfileView
+from user.models import User
+from user.views import LoginView, ProfileView
+
+BENCH_EMAIL = 'bench-async@example.invalid'
+BENCH_PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    """
+    Compares the sync (WSGI-style) and async (ASGI-style) login and profile views.
+
+    The sync views are driven from a thread pool, as a threaded WSGI server would
+    run them; the async views are driven from one event loop, as an ASGI server
+    would. Both get the same number of concurrent requests. Views are called
+    directly (without middleware) and sessions are signed cookies, so the numbers
+    isolate the view code path. Login throttling is switched off for the run.
+    A temporary user is created and removed again.
+    """
+
+    help = 'Benchmark concurrency of the sync vs async login and profile views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent requests in flight.')
+
+    @override_settings(THROTTLE_RATES={})
+    def handle(self, *args, **options):
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        self.user = User.objects.create_user(email=BENCH_EMAIL, username='bench-async', password=BENCH_PASSWORD)
+        try:
+            scenarios = [
+                ('login', 'sync', lambda: self._run_sync(LoginView.as_view(), self._login_request, options)),
+                ('login', 'async', lambda: self._run_async(AsyncLoginView.as_view(), self._login_request, options)),
+                ('profile', 'sync', lambda: self._run_sync(ProfileView.as_view(), self._profile_request, options)),
+                ('profile', 'async', lambda: self._run_async(AsyncProfileView.as_view(), self._profile_request, options)),
+            ]
+            for view_name, mode, run in scenarios:
+                elapsed, latencies = run()
+                self.stdout.write(
+                    f'{view_name:8} {mode:5} {options["requests"] / elapsed:8.1f} req/s  '
+                    f'p50 {self._percentile(latencies, 50):7.1f} ms  '
+                    f'p95 {self._percentile(latencies, 95):7.1f} ms'
+                )
+        finally:
+            User.objects.filter(email=BENCH_EMAIL).delete()
+
+    def _login_request(self, factory):
+        request = factory.post(reverse('user:login'), {'username': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+        request.user = AnonymousUser()
+        return request
+
+    def _profile_request(self, factory):
+        request = factory.get(reverse('user:profile'))
+        request.user = self.user
+        return request
+
+    def _prepare(self, request):
+        request.session = SessionStore()
+
+        async def auser():
+            return request.user
+
+        request.auser = auser
+        return request
+
+    def _run_sync(self, view, build_request, options):
+        factory = RequestFactory()
+
+        def timed(_):
+            request = self._prepare(build_request(factory))
+            started = time.perf_counter()
+            response = view(request)
+            if hasattr(response, 'render'):
+                response.render()
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            latencies = list(executor.map(timed, range(options['requests'])))
+        return time.perf_counter() - started, latencies
+
+    def _run_async(self, view, build_request, options):
+        factory = AsyncRequestFactory()
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+
+            async def timed():
+                async with semaphore:
+                    request = self._prepare(build_request(factory))
+                    started = time.perf_counter()
+                    await view(request)
+                    return (time.perf_counter() - started) * 1000
+
+            return await asyncio.gather(*(timed() for _ in range(options['requests'])))
+
+        started = time.perf_counter()
+        latencies = asyncio.run(run_all())
+        return time.perf_counter() - started, latencies
+
+    @staticmethod
+    def _percentile(values, percentile):
+        return statistics.quantiles(values, n=100)[percentile - 1] if len(values) > 1 else values[0]
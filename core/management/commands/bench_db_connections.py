@@ -0,0 +1,82 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+from user.models import User
+
+
+class Command(BaseCommand):
+    """
+    Measures what connection setup adds to the login and profile queries.
+
+    Each scenario runs the login lookup (user by email) and the profile lookup
+    (user by primary key) once per simulated request:
+
+    - connect: a new connection per request, as with CONN_MAX_AGE=0.
+    - persistent: one connection reused for every request.
+    - pool: a connection checked out of the pool per request (only when
+      DATABASE_POOL is enabled).
+    """
+
+    help = 'Benchmark per-request latency with new, persistent and pooled database connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Simulated requests per scenario.')
+        parser.add_argument('--database', default='default', help='Database alias to benchmark against.')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        user = User.objects.using(alias).only('pk', 'email').first()
+        if user is None:
+            self.stderr.write('Create at least one user first (e.g. manage.py createsuperuser).')
+            return
+
+        scenarios = [('connect', False, True), ('persistent', False, False)]
+        if 'pool' in connections.settings[alias].get('OPTIONS', {}):
+            scenarios.append(('pool', True, True))
+
+        for name, pooled, reconnect in scenarios:
+            wrapper = self._wrapper(alias, pooled)
+            try:
+                latencies = self._run(wrapper, user, options['requests'], reconnect)
+            finally:
+                wrapper.close()
+                if pooled:
+                    wrapper.close_pool()
+            self.stdout.write(
+                f'{name:10} p50 {statistics.median(latencies):7.2f} ms  '
+                f'p95 {statistics.quantiles(latencies, n=20)[-1]:7.2f} ms'
+            )
+
+    def _wrapper(self, alias, pooled):
+        """
+        Returns a private connection so the scenarios don't share state with the
+        default connection (or with each other).
+        """
+        settings_dict = copy.deepcopy(connections.settings[alias])
+        if not pooled:
+            settings_dict.get('OPTIONS', {}).pop('pool', None)
+        return load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+
+    def _compile(self, queryset, wrapper):
+        return queryset.query.get_compiler(connection=wrapper).as_sql()
+
+    def _run(self, wrapper, user, requests, reconnect):
+        login_sql = self._compile(User.objects.filter(email=user.email), wrapper)
+        profile_sql = self._compile(User.objects.filter(pk=user.pk), wrapper)
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            with wrapper.cursor() as cursor:
+                for sql, params in (login_sql, profile_sql):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+            if reconnect:
+                # Ends the request: closes the connection or returns it to the pool.
+                wrapper.close()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
@@ -0,0 +1,110 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections, models, transaction
+
+from base.base_model import uuid7
+
+
+def _build_model(table):
+    """
+    Builds an unmanaged model shaped like a BaseModel primary key plus a small payload.
+    """
+    meta = type('Meta', (), {'app_label': 'core', 'db_table': table, 'managed': False})
+    return type(table, (models.Model,), {
+        '__module__': __name__,
+        'uid': models.UUIDField(primary_key=True),
+        'payload': models.CharField(max_length=32),
+        'Meta': meta,
+    })
+
+
+class Command(BaseCommand):
+    """
+    Compares random (v4) and time-ordered (v7) UUID primary keys.
+
+    Each generator fills its own scratch table with the same number of rows in
+    batched INSERTs; the command then reports insert throughput and the size of the
+    primary key index. Run it against the production database engine (Postgres) to
+    get meaningful index sizes; the scratch tables are dropped afterwards.
+    """
+
+    help = 'Benchmark insert throughput and primary key index size for uuid4 vs uuid7 keys.'
+
+    generators = {
+        'uuid4': uuid.uuid4,
+        'uuid7': uuid7,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Rows inserted per key type.')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per INSERT batch.')
+        parser.add_argument('--database', default='default', help='Database alias to benchmark against.')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch tables for inspection.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        for name, generator in self.generators.items():
+            model = _build_model(f'bench_{name}_keys')
+            with connection.schema_editor() as schema_editor:
+                schema_editor.create_model(model)
+            try:
+                elapsed = self._insert(connection, model, generator, options['rows'], options['batch_size'])
+                index_size = self._index_size(connection, model)
+                self.stdout.write(
+                    f'{name}: {options["rows"]} rows in {elapsed:.2f}s '
+                    f'({options["rows"] / elapsed:,.0f} rows/s), '
+                    f'pk index {self._format_size(index_size)}'
+                )
+            finally:
+                if not options['keep']:
+                    with connection.schema_editor() as schema_editor:
+                        schema_editor.delete_model(model)
+
+    def _insert(self, connection, model, generator, rows, batch_size):
+        table = connection.ops.quote_name(model._meta.db_table)
+        uid_field = model._meta.get_field('uid')
+        sql = f'INSERT INTO {table} (uid, payload) VALUES (%s, %s)'
+        elapsed = 0.0
+        for start in range(0, rows, batch_size):
+            count = min(batch_size, rows - start)
+            # Keys are generated outside the timed section; only the writes are measured.
+            params = [
+                (uid_field.get_db_prep_value(generator(), connection), f'row-{start + i}')
+                for i in range(count)
+            ]
+            started = time.perf_counter()
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            elapsed += time.perf_counter() - started
+        return elapsed
+
+    def _index_size(self, connection, model):
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT pg_relation_size(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND indisprimary",
+                    [table],
+                )
+            elif connection.vendor == 'sqlite':
+                try:
+                    cursor.execute(
+                        "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                        "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                        [table],
+                    )
+                except Exception:
+                    # dbstat is an optional SQLite extension.
+                    return None
+            else:
+                return None
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _format_size(size):
+        if size is None:
+            return 'n/a'
+        return f'{size / (1024 * 1024):.1f} MiB'
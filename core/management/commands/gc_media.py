@@ -0,0 +1,133 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import MediaBlob
+
+
+class Command(BaseCommand):
+    """
+    Deletes content-addressed media files that nothing refers to any more.
+
+    Unreferenced blobs are claimed in batches with ``SELECT ... FOR UPDATE SKIP
+    LOCKED``, so several collectors can run at once. A blob's file and any files
+    derived from it (``<digest>.*``, such as image variants) are deleted while
+    its row is locked, the same lock an upload of that content takes before it
+    reuses the file (see ``ContentAddressedStorage``). With ``--orphans`` the
+    content-addressed fan-out directories are also scanned for files that never
+    got a reference, e.g. uploads whose transaction rolled back; each is claimed
+    the same way before it is deleted. Files outside them are never touched.
+    """
+
+    help = 'Delete unreferenced content-addressed media files in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Blobs deleted per transaction.')
+        parser.add_argument(
+            '--grace-seconds', type=int, default=None,
+            help='Keep files unreferenced for less than this long (default: MEDIA_GC_GRACE_SECONDS).',
+        )
+        parser.add_argument('--orphans', action='store_true', help='Also delete files without any reference row.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        grace = options['grace_seconds']
+        if grace is None:
+            grace = getattr(settings, 'MEDIA_GC_GRACE_SECONDS', 24 * 3600)
+        cutoff = timezone.now() - timedelta(seconds=grace)
+
+        if options['dry_run']:
+            count = MediaBlob.objects.collectable(cutoff).count()
+            self.stdout.write(f'Would delete {count} unreferenced blobs.')
+        else:
+            count = self._collect(cutoff, options['batch_size'])
+            self.stdout.write(f'Deleted {count} unreferenced blobs.')
+
+        if options['orphans']:
+            orphans = self._collect_orphans(cutoff, options['dry_run'])
+            verb = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(f'{verb} {orphans} orphaned files.')
+        self.stdout.write(self.style.SUCCESS('Media garbage collection finished.'))
+
+    def _collect(self, cutoff, batch_size):
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    MediaBlob.objects.collectable(cutoff)
+                    .select_for_update(skip_locked=True)
+                    .order_by('updated_at')
+                    .values_list('pk', 'name')[:batch_size]
+                )
+                if not batch:
+                    return deleted
+                # A re-upload of the same content waits for this transaction and
+                # then finds the file gone, so it writes it again.
+                for _, name in batch:
+                    self._delete_blob_files(name)
+                MediaBlob.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+            deleted += len(batch)
+
+    def _delete_blob_files(self, name):
+        directory, basename = os.path.split(name)
+        if not self._is_fanout(directory):
+            # Stored before content addressing; its name says nothing about siblings
+            default_storage.delete(name)
+            return
+        digest = basename.split('.', 1)[0]
+        try:
+            files = default_storage.listdir(directory)[1]
+        except FileNotFoundError:
+            return
+        for filename in files:
+            if filename.split('.', 1)[0] == digest:
+                default_storage.delete(os.path.join(directory, filename))
+
+    def _collect_orphans(self, cutoff, dry_run):
+        deleted = 0
+        for directory, files in self._walk(''):
+            if not files or not self._is_fanout(directory):
+                continue
+            referenced = {
+                os.path.basename(name).split('.', 1)[0]
+                for name in MediaBlob.objects.filter(name__startswith=f'{directory}/').values_list('name', flat=True)
+            }
+            for filename in files:
+                name = os.path.join(directory, filename)
+                temporary = filename.endswith('.tmp')
+                if not temporary and filename.split('.', 1)[0] in referenced:
+                    continue
+                if default_storage.get_modified_time(name) >= cutoff:
+                    continue
+                if not dry_run and not self._delete_orphan(name):
+                    continue
+                deleted += 1
+        return deleted
+
+    def _delete_orphan(self, name):
+        with transaction.atomic():
+            # A row that exists by now belongs to an upload reusing the file
+            if not MediaBlob.objects.claim(name):
+                return False
+            default_storage.delete(name)
+            MediaBlob.objects.filter(name=name).delete()
+        return True
+
+    def _is_fanout(self, directory):
+        # ContentAddressedStorage puts every blob under a two hex digit directory
+        basename = os.path.basename(directory)
+        return len(basename) == 2 and all(char in '0123456789abcdef' for char in basename)
+
+    def _walk(self, directory):
+        try:
+            directories, files = default_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        yield directory, files
+        for child in directories:
+            yield from self._walk(os.path.join(directory, child) if directory else child)
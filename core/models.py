@@ -1,3 +1,69 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
-# Create your models here.
+from base.base_model import BaseModel
+
+
+class MediaBlobManager(models.Manager):
+    """Reference counting for files in content-addressed storage."""
+
+    def acquire(self, name):
+        """Records one more reference to the stored file ``name``."""
+        if self.filter(name=name).update(refcount=F('refcount') + 1, updated_at=timezone.now()):
+            return
+        _, created = self.get_or_create(name=name, defaults={'refcount': 1})
+        if not created:
+            # Another request created the row first
+            self.filter(name=name).update(refcount=F('refcount') + 1, updated_at=timezone.now())
+
+    def claim(self, name):
+        """
+        Locks the row of the stored file ``name`` until the end of the current
+        transaction, creating it unreferenced if needed, and restarts its grace
+        period.
+
+        ``gc_media`` only deletes files while holding this lock, so a file that
+        exists once claimed stays until the reference is recorded.
+
+        Returns:
+            bool: Whether the row was created.
+        """
+        blob, created = self.select_for_update().get_or_create(name=name, defaults={'refcount': 0})
+        if not created:
+            self.filter(pk=blob.pk).update(updated_at=timezone.now())
+        return created
+
+    def release(self, name):
+        """Records one reference fewer. The file is left for ``gc_media`` to delete."""
+        self.filter(name=name).update(refcount=F('refcount') - 1, updated_at=timezone.now())
+
+    def collectable(self, older_than):
+        """Returns the blobs nothing has referred to since ``older_than``."""
+        return self.filter(refcount__lte=0, updated_at__lt=older_than)
+
+
+class MediaBlob(BaseModel):
+    """
+    A file in content-addressed storage and the number of model fields using it.
+
+    Files are shared between every upload with the same content, so they are
+    deleted by the ``gc_media`` command once unreferenced, never when a single
+    reference goes away.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.IntegerField(default=0)
+
+    objects = MediaBlobManager()
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
+
+    class Meta:
+        verbose_name = 'Media blob'
+        verbose_name_plural = 'Media blobs'
+        db_table = 'media_blob'
+        indexes = [
+            # Only unreferenced blobs are ever scanned, by the garbage collector.
+            models.Index(fields=['updated_at'], name='media_blob_unreferenced_idx', condition=models.Q(refcount__lte=0)),
+        ]
@@ -0,0 +1,42 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from user.models import User
+
+
+class BenchCommandTest(TestCase):
+
+    def test_requires_at_least_one_request(self):
+        with self.assertRaisesMessage(CommandError, '--requests must be at least 1'):
+            call_command('bench', '--requests', '0', stdout=StringIO())
+
+    def test_runs_every_flow_and_compares_with_baseline(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        baseline = os.path.join(directory, 'baseline.json')
+        call_command('bench', '--requests', '2', '--warmup', '0', '--output', baseline, stdout=StringIO())
+        with open(baseline) as file:
+            results = json.load(file)
+        self.assertEqual(set(results['scenarios']), {
+            'register', 'login', 'profile', 'update_profile', 'email_confirm', 'password_reset', 'password_reset_confirm',
+        })
+        self.assertEqual(set(results['scenarios']['profile']), {
+            'requests', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'queries_max',
+        })
+        self.assertFalse(User.objects.filter(email__endswith='@bench.example.invalid').exists())
+
+        # The same scenario with more queries than the baseline is a regression
+        baseline_results = {'scenarios': {'profile': {**results['scenarios']['profile'], 'queries_mean': 0}}}
+        with open(baseline, 'w') as file:
+            json.dump(baseline_results, file)
+        with self.assertRaisesMessage(CommandError, 'Regressed: profile'):
+            call_command(
+                'bench', '--requests', '2', '--warmup', '0', '--scenario', 'profile', '--baseline', baseline,
+                '--threshold', '1000', '--fail-on-regression', stdout=StringIO(),
+            )
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'base.cache.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'LOCAL_TIMEOUT': 60, 'LOCAL_MAX_ENTRIES': 2},
+    },
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'two-tier-tests'},
+})
+class TwoTierCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+        self.cache.reset_stats()
+
+    def test_set_writes_through_to_shared_tier(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.shared.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
+
+    def test_local_miss_falls_through_to_shared_tier(self):
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        stats = self.cache.stats()
+        self.assertEqual((stats['shared_hits'], stats['local_hits']), (1, 1))
+
+    def test_delete_removes_both_tiers(self):
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.shared.get('key'))
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_local_tier_is_lru_bounded(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key)
+        self.shared.clear()
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('c'), 'c')
+
+    def test_local_entries_expire(self):
+        self.cache.set('key', 'value', timeout=0.01)
+        time.sleep(0.02)
+        self.shared.set('key', 'fresh')
+        self.assertEqual(self.cache.get('key'), 'fresh')
+
+    def test_incr_uses_shared_counter(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+
+    def test_hit_rate(self):
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get('missing')
+        self.assertEqual(self.cache.stats()['hit_rate'], 0.5)
+
+    def test_local_tier_is_shared_by_threads(self):
+        self.cache.set('key', 'value')
+        self.shared.clear()
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append((caches['default'], caches['default'].get('key'))))
+        thread.start()
+        thread.join()
+        other, value = seen[0]
+        self.assertIsNot(other, self.cache)
+        self.assertEqual(value, 'value')
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
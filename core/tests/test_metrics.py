@@ -0,0 +1,108 @@
+import contextvars
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from base import metrics
+from user.models import User
+
+
+class MetricsTest(TestCase):
+
+    def _sample(self, line_start):
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 200)
+        for line in response.content.decode().splitlines():
+            if line.startswith(line_start + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def test_records_requests_per_url_name(self):
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        self.client.force_login(admin)
+        labels = '{view="admin:user_user_changelist",method="GET"}'
+        requests_before = self._sample('http_requests_total{view="admin:user_user_changelist",method="GET",status="2xx"}')
+        queries_before = self._sample(f'http_request_db_queries_sum{labels}')
+
+        self.client.get(reverse('admin:user_user_changelist'))
+
+        self.assertEqual(
+            self._sample('http_requests_total{view="admin:user_user_changelist",method="GET",status="2xx"}'),
+            requests_before + 1,
+        )
+        self.assertGreater(self._sample(f'http_request_db_queries_sum{labels}'), queries_before)
+        self.assertGreater(self._sample(f'http_request_duration_seconds_count{labels}'), 0)
+        self.assertGreater(self._sample(f'http_response_size_bytes_bucket{{view="admin:user_user_changelist",method="GET",le="+Inf"}}'), 0)
+        self.assertIn('throttle_hashes_saved_total', self.client.get(reverse('core:metrics')).content.decode())
+
+    def test_only_allowed_addresses_can_scrape(self):
+        response = self.client.get(reverse('core:metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    def test_proxied_requests_cannot_scrape_by_address(self):
+        # A reverse proxy on the same host connects from an allowed address
+        response = self.client.get(reverse('core:metrics'), headers={'X-Forwarded-For': '203.0.113.7'})
+        self.assertEqual(response.status_code, 403)
+        with override_settings(THROTTLE_NUM_PROXIES=1):
+            self.assertEqual(self.client.get(reverse('core:metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get(reverse('core:metrics')).status_code, 403)
+        response = self.client.get(
+            reverse('core:metrics'), headers={'Authorization': 'Bearer wrong', 'X-Forwarded-For': '203.0.113.7'},
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            reverse('core:metrics'),
+            headers={'Authorization': 'Bearer scrape-secret', 'X-Forwarded-For': '203.0.113.7'},
+            REMOTE_ADDR='10.0.0.1',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_lookups_are_counted_per_request(self):
+        cache = caches['default']
+        cache.set('metrics-key', 'value')
+        first = metrics.RequestMetrics({settings.CACHES['default']['LOCATION']: 'default'})
+        # A request running concurrently in its own context, as under ASGI
+        second = contextvars.copy_context().run(
+            metrics.RequestMetrics, {settings.CACHES['default']['LOCATION']: 'default'},
+        )
+        cache.get('metrics-key')
+        cache.get('metrics-missing')
+
+        self.assertEqual(first.state['cache_lookups'], {('shared', 'local_hits'): 1, ('shared', 'misses'): 1})
+        self.assertEqual(second.state['cache_lookups'], {})
+        first.finish(RequestFactory().get('/'), HttpResponse())
+
+    def test_histogram_exposition(self):
+        text = metrics.exposition({
+            ('http_request_db_queries', (('view', 'a'), ('method', 'GET'))): [1, 2, 0, 0, 0, 0, 0, 0, 1, 504],
+        })
+        self.assertIn('http_request_db_queries_bucket{view="a",method="GET",le="0"} 1\n', text)
+        self.assertIn('http_request_db_queries_bucket{view="a",method="GET",le="1"} 3\n', text)
+        self.assertIn('http_request_db_queries_bucket{view="a",method="GET",le="+Inf"} 4\n', text)
+        self.assertIn('http_request_db_queries_count{view="a",method="GET"} 4\n', text)
+        self.assertIn('# TYPE http_request_db_queries histogram\n', text)
+
+    def test_multiprocess_mode_sums_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        labels = [['view', 'core:home'], ['method', 'GET'], ['status', '2xx']]
+        with open(os.path.join(directory, '1-dead.json'), 'w') as file:
+            json.dump([['http_requests_total', labels, 5]], file)
+        key = ('http_requests_total', tuple(map(tuple, labels)))
+        local = metrics.snapshot().get(key, 0)
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            totals = metrics.collect()
+
+        self.assertEqual(totals[key], local + 5)
+        self.assertEqual(len([name for name in os.listdir(directory) if name.endswith('.json')]), 2)
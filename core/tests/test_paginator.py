@@ -0,0 +1,29 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from base.paginator import EstimatedCountPaginator
+from user.models import User
+
+
+class EstimatedCountPaginatorTest(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            User.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='password123')
+
+    def test_exact_count_without_planner_estimate(self):
+        paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_large_estimate_skips_count_query(self):
+        paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 2)
+        with patch.object(EstimatedCountPaginator, '_planner_estimate', return_value=5_000_000):
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 5_000_000)
+
+    def test_small_estimate_falls_back_to_exact_count(self):
+        paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 2)
+        with patch.object(EstimatedCountPaginator, '_planner_estimate', return_value=10):
+            self.assertEqual(paginator.count, 3)
@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+from base.querycheck import QueryBudgetMixin, QueryLog, query_shape
+from user.models import EmailOutbox, User
+
+
+def named_routes(patterns=None, namespace=''):
+    """Yields the namespaced name of every named URL pattern."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from named_routes(pattern.url_patterns, namespace + (f'{pattern.namespace}:' if pattern.namespace else ''))
+        elif pattern.name:
+            yield namespace + pattern.name
+
+
+ROUTE_BUDGETS = {
+    'core:home': 0,
+    'core:metrics': 0,
+    'core:static': 0,
+    'core:media': 0,
+    'user:register': 0,
+    'user:login': 0,
+    'user:logout': 4,
+    'user:profile': 3,
+    'user:update': 3,
+    'user:confirm_email': 0,
+    'user:confirmation_sent': 0,
+    'user:email_confirmed': 0,
+    'user:invalid_token': 0,
+    'user:password_change': 2,
+    'user:password_change_done': 2,
+    'user:password_reset': 0,
+    'user:password_reset_done': 0,
+    'user:password_reset_confirm': 0,
+    'user:password_reset_complete': 0,
+    'admin:index': 3,
+    'admin:login': 2,
+    'admin:logout': 4,
+    'admin:password_change': 2,
+    'admin:password_change_done': 2,
+    'admin:autocomplete': 2,
+    'admin:jsi18n': 2,
+    'admin:view_on_site': 4,
+    'admin:app_list': 2,
+    'admin:auth_group_changelist': 5,
+    'admin:auth_group_add': 4,
+    'admin:auth_group_history': 4,
+    'admin:auth_group_delete': 4,
+    'admin:auth_group_change': 5,
+    'admin:user_user_changelist': 4,
+    'admin:user_user_add': 2,
+    'admin:user_user_history': 4,
+    'admin:user_user_delete': 4,
+    'admin:user_user_change': 3,
+    'admin:user_emailoutbox_changelist': 5,
+    'admin:user_emailoutbox_add': 3,
+    'admin:user_emailoutbox_history': 4,
+    'admin:user_emailoutbox_delete': 3,
+    'admin:user_emailoutbox_change': 3,
+}
+
+
+POST_ROUTES = ('user:logout', 'admin:logout')
+
+
+class QueryLogTest(TestCase):
+
+    def test_shapes_ignore_parameters(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE a = %s AND b IN (%s, %s) AND c = 'x' LIMIT 21"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ? LIMIT ?',
+        )
+        self.assertEqual(query_shape('SELECT 1 FROM t WHERE id IN (%s)'), query_shape('SELECT 1 FROM t WHERE id IN (%s, %s)'))
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=3)
+    def test_flags_n_plus_one(self):
+        users = [User.objects.create_user(email=f'{n}@example.com', username=f'u{n}') for n in range(3)]
+        with QueryLog() as log:
+            for user in users:
+                User.objects.get(pk=user.pk)
+        self.assertEqual(len(log), 3)
+        self.assertEqual(log.repeated()[0][1], 3)
+        self.assertIn('possible N+1', log.problems()[0])
+        with QueryLog() as log:
+            list(User.objects.filter(pk__in=[user.pk for user in users]))
+        self.assertEqual(log.repeated(), [])
+
+    def test_flags_slow_queries(self):
+        with QueryLog() as log:
+            User.objects.count()
+        self.assertEqual(len(log.slow(threshold=0)), 1)
+        self.assertEqual(log.slow(threshold=60), [])
+
+    def test_nested_logs_both_record(self):
+        with QueryLog() as outer:
+            with QueryLog() as inner:
+                User.objects.count()
+            User.objects.count()
+        self.assertEqual((len(outer), len(inner)), (2, 1))
+
+    @override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_SLOW_SECONDS=0)
+    def test_middleware_reports_queries(self):
+        self.client.force_login(User.objects.create_superuser(email='a@example.com', username='a', password='x'))
+        with self.assertLogs('base.querycheck', 'WARNING') as logs:
+            response = self.client.get(reverse('admin:index'))
+        self.assertEqual(len(logs.output), int(response['X-Query-Count']))
+        self.assertTrue(all('slow query' in line for line in logs.output))
+
+
+class RouteQueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, PROFILE_PICTURE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        # Enough rows for a per-row query on a list page to show as N+1
+        for n in range(5):
+            User.objects.create_user(email=f'user{n}@example.com', username=f'user{n}', bio='bio')
+            EmailOutbox.objects.create(to_email=f'user{n}@example.com', subject='Hello', body='Hi')
+            Group.objects.create(name=f'group{n}')
+        self.picture = default_storage.save('media/a.png', ContentFile(b'picture'))
+
+    def _args(self, name):
+        objects = {'auth_group': Group.objects.first, 'user_user': lambda: self.admin, 'user_emailoutbox': EmailOutbox.objects.first}
+        for prefix, get_object in objects.items():
+            if name.startswith(f'admin:{prefix}_') and not name.endswith(('_changelist', '_add')):
+                return [get_object().pk]
+        return {
+            'admin:view_on_site': [ContentType.objects.get_for_model(User).pk, self.admin.pk],
+            'admin:app_list': ['user'],
+            'core:static': ['admin/css/base.css'],
+            'core:media': [self.picture],
+            'user:confirm_email': ['invalid', 'invalid'],
+            'user:password_reset_confirm': ['invalid', 'invalid'],
+        }.get(name, [])
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(set(named_routes()) - set(ROUTE_BUDGETS), set())
+
+    def test_routes_stay_within_budget(self):
+        for name, budget in ROUTE_BUDGETS.items():
+            with self.subTest(name):
+                self.client.force_login(self.admin)
+                caches['default'].clear()
+                url = reverse(name, args=self._args(name))
+                with self.assertQueryBudget(budget, name):
+                    if name in POST_ROUTES:
+                        response = self.client.post(url)
+                    else:
+                        response = self.client.get(url)
+                self.assertLess(response.status_code, 500)
@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from base.db_router import PrimaryReplicaRouter, replica_reads
+from base.middleware import ReplicaRoutingMiddleware
+from base.querycheck import QueryLog
+from user.models import User
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class PrimaryReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_use_primary_outside_replica_block(self):
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_reads_use_replica_inside_replica_block(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(User), 'replica_0')
+            self.assertEqual(User.objects.all().db, 'replica_0')
+
+    @override_settings(DATABASE_REPLICAS=[f'replica_{n}' for n in range(8)])
+    def test_block_reads_from_one_replica(self):
+        with replica_reads():
+            self.assertEqual(len({self.router.db_for_read(User) for _ in range(50)}), 1)
+
+    def test_write_pins_remaining_reads_to_primary(self):
+        with replica_reads() as state:
+            self.assertEqual(self.router.db_for_write(User), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertTrue(state['wrote'])
+
+    def test_migrations_skip_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica_0', 'user'))
+        self.assertIsNone(self.router.allow_migrate('default', 'user'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingMiddlewareTest(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+
+    def view(self, request):
+        self.seen.append(User.objects.all().db)
+        if request.method == 'POST':
+            PrimaryReplicaRouter().db_for_write(User)
+        return HttpResponse()
+
+    def test_safe_request_reads_from_replica(self):
+        response = ReplicaRoutingMiddleware(self.view)(self.factory.get('/'))
+        self.assertEqual(self.seen, ['replica_0'])
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def test_write_sets_pin_cookie(self):
+        response = ReplicaRoutingMiddleware(self.view)(self.factory.post('/'))
+        self.assertEqual(self.seen, ['default'])
+        self.assertIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def test_pinned_client_reads_from_primary(self):
+        middleware = ReplicaRoutingMiddleware(self.view)
+        cookie = middleware(self.factory.post('/')).cookies[settings.REPLICA_PIN_COOKIE_NAME]
+        request = self.factory.get('/')
+        request.COOKIES[cookie.key] = cookie.value
+        middleware(request)
+        self.assertEqual(self.seen, ['default', 'default'])
+
+    def test_expired_pin_reads_from_replica(self):
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE_NAME] = str(time.time() - 1)
+        ReplicaRoutingMiddleware(self.view)(request)
+        self.assertEqual(self.seen, ['replica_0'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica_test'])
+class ReplicaReadsTest(TransactionTestCase):
+    # The replica is a second connection to the primary's test database, so it
+    # only sees committed rows
+    databases = '__all__'
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_safe_request_reads_from_replica(self):
+        user = User.objects.create_user(username='replica', email='replica@example.com', password='pw', bio='On the replica')
+        self.client.force_login(user)
+        with QueryLog() as log:
+            response = self.client.get(reverse('user:profile'))
+        self.assertContains(response, 'On the replica')
+        self.assertEqual({query.alias for query in log.queries}, {'replica_test'})
+
+
+@override_settings(DATABASE_REPLICAS=['replica_test'])
+class ReplicaReadYourWritesTest(TestCase):
+    # Replicas are left out on purpose: any query routed to one fails the test.
+    databases = {'default'}
+
+    def test_profile_update_is_read_back_from_primary(self):
+        user = User.objects.create_user(username='replica', email='replica@example.com', password='pw')
+        self.client.force_login(user)
+        response = self.client.post(reverse('user:update'), {
+            'username': 'replica', 'email': 'replica@example.com', 'bio': 'Updated',
+        })
+        self.assertIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+        self.assertContains(self.client.get(reverse('user:profile')), 'Updated')
@@ -0,0 +1,140 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from base.storage import ContentAddressedStorage, brotli
+
+
+class MediaViewTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MEDIA_SERVE_MODE='python')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = bytes(range(256)) * 4
+        self.name = ContentAddressedStorage(location=media_root).save('pictures/a.png', ContentFile(self.content))
+        self.url = reverse('core:media', args=[self.name])
+
+    def _body(self, response):
+        body = b''.join(response.streaming_content)
+        response.close()
+        return body
+
+    def test_streams_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self._body(response), self.content)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        response.close()
+        etag_response = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(etag_response.status_code, 304)
+        date_response = self.client.get(self.url, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(date_response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self._body(response), self.content[10:20])
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=-5'})
+        self.assertEqual(self._body(response), self.content[-5:])
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=1000-'})
+        self.assertEqual(self._body(response), self.content[1000:])
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        response = self.client.get(self.url, headers={'Range': f'bytes={len(self.content)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.content)
+
+    def test_offload(self):
+        with override_settings(MEDIA_SERVE_MODE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/internal/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/internal/{self.name}')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(settings.MEDIA_ROOT, self.name))
+
+    def test_missing_and_traversal(self):
+        self.assertEqual(self.client.get(reverse('core:media', args=['pictures/none.png'])).status_code, 404)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/%2e%2e/blog_platform/settings.py').status_code, 404)
+
+
+class StaticPipelineTest(SimpleTestCase):
+
+    def setUp(self):
+        source, root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as file:
+            file.write('body { background: url("../logo.png"); }\n' + '.item { margin: 0; }\n' * 200)
+        with open(os.path.join(source, 'logo.png'), 'wb') as file:
+            file.write(os.urandom(512))
+        settings_override = override_settings(
+            STATIC_ROOT=root,
+            STATICFILES_DIRS=[source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(root, 'staticfiles.json')) as file:
+            self.manifest = json.load(file)['paths']
+        self.root = root
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        css = self.manifest['css/site.css']
+        self.assertRegex(css, r'^css/site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, css), 'rb') as original, gzip.open(os.path.join(self.root, css + '.gz')) as packed:
+            content = original.read()
+            self.assertEqual(packed.read(), content)
+        self.assertIn(self.manifest['logo.png'].encode(), content)
+        self.assertEqual(os.path.exists(os.path.join(self.root, css + '.br')), brotli is not None)
+        # Binary and incompressible files are left alone
+        self.assertFalse(os.path.exists(os.path.join(self.root, self.manifest['logo.png'] + '.gz')))
+
+    def test_serves_precompressed_variant(self):
+        url = reverse('core:static', args=[self.manifest['css/site.css']])
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn(b'.item', gzip.decompress(b''.join(response.streaming_content)))
+        response.close()
+
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        response.close()
+
+    def test_unhashed_names_are_not_immutable(self):
+        response = self.client.get(reverse('core:static', args=['css/site.css']))
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.STATIC_CACHE_MAX_AGE}')
+        response.close()
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from base.storage import ContentAddressedStorage
+from core.models import MediaBlob
+from user.models import User
+
+
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save('media/one.JPG', ContentFile(b'avatar'))
+        second = self.storage.save('media/two.jpg', ContentFile(b'avatar'))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^media/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len(os.listdir(os.path.dirname(self.storage.path(first)))), 1)
+
+    def test_different_content_gets_different_names(self):
+        self.assertNotEqual(
+            self.storage.save('media/a.png', ContentFile(b'one')),
+            self.storage.save('media/a.png', ContentFile(b'two')),
+        )
+
+    def test_derived_files_keep_their_name(self):
+        name = self.storage.save('media/a.png', ContentFile(b'one'))
+        derived = name.replace('.png', '.small.webp')
+        self.assertEqual(self.storage.save_derived(derived, ContentFile(b'small')), derived)
+        self.assertEqual(self.storage.save_derived(derived, ContentFile(b'smaller')), derived)
+        with self.storage.open(derived) as stream:
+            self.assertEqual(stream.read(), b'smaller')
+
+
+class MediaGarbageCollectionTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, PROFILE_PICTURE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _picture(self, content=b'picture'):
+        return ContentFile(content, name='avatar.png')
+
+    def test_users_share_one_reference_counted_blob(self):
+        first = User.objects.create_user(email='a@example.com', username='a', profile_picture=self._picture())
+        second = User.objects.create_user(email='b@example.com', username='b', profile_picture=self._picture())
+        self.assertEqual(first.profile_picture.name, second.profile_picture.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.profile_picture.name).refcount, 2)
+
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=second.profile_picture.name).refcount, 1)
+
+    def test_replacing_picture_moves_reference(self):
+        user = User.objects.create_user(email='a@example.com', username='a', profile_picture=self._picture())
+        old = user.profile_picture.name
+        user = User.objects.get(pk=user.pk)
+        user.profile_picture = self._picture(b'new picture')
+        user.save(update_fields=['profile_picture', 'updated_at'])
+
+        self.assertEqual(MediaBlob.objects.get(name=old).refcount, 0)
+        self.assertEqual(MediaBlob.objects.get(name=user.profile_picture.name).refcount, 1)
+
+    def test_gc_deletes_unreferenced_blobs_and_derived_files(self):
+        kept = User.objects.create_user(email='a@example.com', username='a', profile_picture=self._picture(b'kept'))
+        gone = User.objects.create_user(email='b@example.com', username='b', profile_picture=self._picture(b'gone'))
+        name = gone.profile_picture.name
+        derived = name.replace('.png', '.small.webp')
+        default_storage.save_derived(derived, ContentFile(b'variant'))
+        gone.delete()
+
+        out = StringIO()
+        call_command('gc_media', '--grace-seconds', '0', stdout=out)
+
+        self.assertIn('Deleted 1 unreferenced blobs.', out.getvalue())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(derived))
+        self.assertTrue(default_storage.exists(kept.profile_picture.name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_gc_respects_grace_period(self):
+        user = User.objects.create_user(email='a@example.com', username='a', profile_picture=self._picture())
+        user.delete()
+        call_command('gc_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(user.profile_picture.name))
+
+    def test_reupload_restarts_grace_period(self):
+        user = User.objects.create_user(email='a@example.com', username='a', profile_picture=self._picture())
+        name = user.profile_picture.name
+        user.delete()
+        MediaBlob.objects.filter(name=name).update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(default_storage.save('media/again.png', self._picture()), name)
+        call_command('gc_media', stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+
+    def test_gc_deletes_old_orphans(self):
+        # Written without a reference row, like an upload whose transaction rolled back
+        orphan = default_storage.content_name('media/orphan.png', ContentFile(b'orphan'))
+        default_storage.save_derived(orphan, ContentFile(b'orphan'))
+        legacy = 'media/legacy.png'
+        default_storage.save_derived(legacy, ContentFile(b'legacy'))
+        future = timezone.now() + timedelta(seconds=60)
+        out = StringIO()
+        with patch('core.management.commands.gc_media.timezone.now', return_value=future):
+            call_command('gc_media', '--orphans', '--grace-seconds', '0', stdout=out)
+        self.assertIn('Deleted 1 orphaned files.', out.getvalue())
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertTrue(default_storage.exists(legacy))
@@ -0,0 +1,25 @@
+import time
+
+from django.test import SimpleTestCase
+
+from base.base_model import uuid7
+
+
+class UUID7Test(SimpleTestCase):
+
+    def test_version_and_variant(self):
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, 'specified in RFC 4122')
+
+    def test_keys_are_time_ordered(self):
+        first = uuid7()
+        time.sleep(0.002)
+        second = uuid7()
+        self.assertLess(first, second)
+
+    def test_timestamp_prefix(self):
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+        self.assertTrue(before <= value.int >> 80 <= after)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -5,4 +6,7 @@ app_name = 'core'
 
 urlpatterns = [
     path('', views.HomePageView.as_view(), name='home'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
+    path(f"{settings.STATIC_URL.lstrip('/')}<path:path>", views.StaticView.as_view(), name='static'),
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", views.MediaView.as_view(), name='media'),
 ]
\ No newline at end of file
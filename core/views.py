@@ -1,7 +1,125 @@
+import hmac
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils._os import safe_join
+from django.views import View
 from django.views.generic import TemplateView
 from django.shortcuts import render
 
+from base import metrics
+from base.serving import precompressed_variant, serve_file
+from base.storage import is_content_addressed
+from user.throttling import throttle_stats
+
 
 class HomePageView(TemplateView):
     template_name = 'home.html'
 
+
+class MediaView(View):
+    """
+    Serves files under ``MEDIA_ROOT`` without reading them into memory.
+
+    Supports conditional and single range requests, or offloads the transfer to
+    the web server depending on ``MEDIA_SERVE_MODE``.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404('Invalid media path.')
+        if not os.path.isfile(full_path):
+            raise Http404('Media file not found.')
+
+        if is_content_addressed(path):
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+        mode = settings.MEDIA_SERVE_MODE
+        return serve_file(
+            request, full_path, path, cache_control,
+            accel_prefix=settings.MEDIA_ACCEL_REDIRECT_PREFIX if mode == 'x-accel-redirect' else None,
+            sendfile=mode == 'x-sendfile',
+        )
+
+    head = get
+
+
+class StaticView(View):
+    """
+    Serves collected static files from ``STATIC_ROOT``, sending the ``.br`` or
+    ``.gz`` sibling written by ``collectstatic`` when the client accepts it.
+
+    Hashed names are cached for a year as immutable; unhashed ones for
+    ``STATIC_CACHE_MAX_AGE`` seconds.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(settings.STATIC_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404('Invalid static path.')
+        if not os.path.isfile(full_path):
+            raise Http404('Static file not found.')
+
+        if getattr(staticfiles_storage, 'is_hashed', lambda name: False)(path):
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = f'public, max-age={settings.STATIC_CACHE_MAX_AGE}'
+        variant, encoding, varies = precompressed_variant(request, full_path)
+        headers = {}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        if varies:
+            headers['Vary'] = 'Accept-Encoding'
+        return serve_file(
+            request, variant, path, cache_control,
+            content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream',
+            extra_headers=headers,
+        )
+
+    head = get
+
+
+class MetricsView(View):
+    """
+    Prometheus scrape endpoint with the request metrics of every worker and the
+    throttle counters.
+
+    With ``METRICS_TOKEN`` set, scrapers must send it as a bearer token.
+    Otherwise only direct requests from ``METRICS_ALLOWED_IPS`` may read it:
+    behind a reverse proxy every request comes from the proxy's address, so
+    proxied requests are refused.
+    """
+    http_method_names = ['get']
+
+    def get(self, request):
+        if not self._allowed(request):
+            return HttpResponseForbidden()
+        stats = throttle_stats()
+        extra = [
+            ('throttle_rejected_total', 'counter', 'Attempts rejected by rate limits, by scope.',
+             [((('scope', scope),), count) for scope, count in stats['rejected'].items()]),
+            ('throttle_hashes_saved_total', 'counter', 'Password hashes avoided by rejecting attempts.',
+             [((), stats['hashes_saved'])]),
+        ]
+        return HttpResponse(
+            metrics.exposition(metrics.collect(), extra),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+    def _allowed(self, request):
+        if settings.METRICS_TOKEN:
+            expected = f'Bearer {settings.METRICS_TOKEN}'
+            return hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode())
+        if settings.THROTTLE_NUM_PROXIES or 'X-Forwarded-For' in request.headers:
+            return False
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
@@ -1,15 +1,55 @@
-from django.contrib import admin
-from .models import User
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from base.paginator import EstimatedCountPaginator
+from .exports import EXPORT_FORMATS
+from .models import User, EmailOutbox
+from .services import UserModerationService
+from .sharding import is_sharded, user_shards
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """
+    Shows the users of one shard at a time, the first by default: a changelist
+    can't page through several databases at once. Only offered when sharded.
+    """
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in user_shards()]
+
+    def choices(self, changelist):
+        # No "All" choice
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.shard() == lookup,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}),
+                'display': title,
+            }
+
+    def shard(self):
+        return self.value() if self.value() in user_shards() else user_shards()[0]
+
+    def queryset(self, request, queryset):
+        return queryset.using(self.shard())
+
 
 class UserAdmin(admin.ModelAdmin):
     # Define the fields to be displayed in the list view
     list_display = ('username', 'email', 'is_active', 'is_staff', 'is_superuser', 'is_email_confirmed')
-    # Define the fields to be used for search
+    # Define the fields to be used for search (backed by trigram indexes on Postgres)
     search_fields = ('username', 'email')
-    # Define the fields to be used for filtering
+    # Define the fields to be used for filtering (backed by partial indexes)
     list_filter = ('is_active', 'is_staff', 'is_superuser', 'is_email_confirmed')
+    # Use planner estimates instead of COUNT(*) on large tables, and skip the
+    # second, unfiltered count the changelist runs for "x of y selected"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Define the bulk actions offered on the changelist
+    actions = ('activate_users', 'deactivate_users', 'confirm_emails', 'export_as_csv', 'export_as_jsonl')
     # Define the fields to be editable inline
-    readonly_fields = ('email_confirmation_token', 'email_confirmation_sent_at')
+    readonly_fields = ('email_confirmation_sent_at', 'created_at')
 
     # Define which fields should be displayed in the form view
     fieldsets = (
@@ -20,7 +60,7 @@ class UserAdmin(admin.ModelAdmin):
             'fields': ('is_active', 'is_staff', 'is_superuser')
         }),
         ('Important Dates', {
-            'fields': ('last_login', 'date_joined')
+            'fields': ('last_login', 'created_at')
         }),
         ('Profile', {
             'fields': ('profile_picture', 'bio')
@@ -35,10 +75,77 @@ class UserAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return (ShardListFilter, *list_filter) if is_sharded() else list_filter
+
+    def get_object(self, request, object_id, from_field=None):
+        # Edit and delete pages look the user up on its own shard
+        if is_sharded() and from_field is None:
+            try:
+                return self.get_queryset(request).using(User.objects.for_uid(object_id).db).get(pk=object_id)
+            except (User.DoesNotExist, ValueError):
+                return None
+        return super().get_object(request, object_id, from_field)
+
     # Override the save model method to handle password hashing
     def save_model(self, request, obj, form, change):
         if not change:  # New object
             obj.set_password(obj.password)
         super().save_model(request, obj, form, change)
 
+    def delete_queryset(self, request, queryset):
+        """
+        Deletes the selected users in bounded chunks instead of one large transaction.
+        """
+        UserModerationService.bulk_delete(queryset)
+
+    def _bulk_update(self, request, queryset, message, **values):
+        updated = UserModerationService.bulk_update(queryset, **values)
+        self.message_user(request, message % {'count': updated}, messages.SUCCESS)
+
+    @admin.action(description='Activate selected users')
+    def activate_users(self, request, queryset):
+        self._bulk_update(request, queryset.filter(is_active=False), '%(count)d users activated.', is_active=True)
+
+    @admin.action(description='Deactivate selected users')
+    def deactivate_users(self, request, queryset):
+        self._bulk_update(request, queryset.filter(is_active=True), '%(count)d users deactivated.', is_active=False)
+
+    @admin.action(description='Mark selected users as email-confirmed')
+    def confirm_emails(self, request, queryset):
+        self._bulk_update(
+            request, queryset.filter(is_email_confirmed=False), '%(count)d email addresses confirmed.',
+            is_email_confirmed=True,
+        )
+
+    def _export(self, queryset, export_format):
+        """
+        Streams the selected users straight from a server-side cursor to the client.
+        """
+        iter_lines, content_type, extension = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(iter_lines(queryset), content_type=content_type)
+        filename = f'users-{timezone.now():%Y%m%d-%H%M%S}.{extension}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @admin.action(description='Export selected users as CSV')
+    def export_as_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    @admin.action(description='Export selected users as JSONL')
+    def export_as_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl')
+
 admin.site.register(User, UserAdmin)
+
+
+class EmailOutboxAdmin(admin.ModelAdmin):
+    # Define the fields to be displayed in the list view
+    list_display = ('subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    # Define the fields to be used for filtering
+    list_filter = ('status',)
+    # The worker owns these rows; the admin is for inspection only
+    readonly_fields = ('to_email', 'subject', 'body', 'html_body', 'attempts', 'last_error', 'sent_at')
+
+admin.site.register(EmailOutbox, EmailOutboxAdmin)
@@ -0,0 +1,146 @@
+"""
+Async counterparts of the views in user.views, routed instead of them when
+USE_ASYNC_VIEWS is enabled (the default under blog_platform.asgi). Queries go
+through the async ORM and password hashing runs on the bounded executor from
+user.hashers, so neither blocks the event loop.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import alogin
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect, render
+from django.views import View
+
+from .backends import aload_cached_bio
+from .forms import AsyncLoginForm, RegistrationForm
+from .hashers import acheck_password, amake_password
+from .models import User
+from .services import EmailService, RegistrationService
+from .throttling import ThrottleMixin
+from .uploads import LimitedImageUploadMixin
+from .views import custom_error_handler
+import logging
+logger = logging.getLogger(__name__)
+
+
+async def arender(request, template_name, context=None):
+    """
+    ``render`` run in a worker thread. The context processors read
+    ``request.user`` and the session, which may query the database.
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
+
+class AsyncRegistrationView(LimitedImageUploadMixin, ThrottleMixin, View):
+    """
+    Async view for user registration, rate limited like RegistrationView.
+
+    Methods:
+        get(request): Renders the registration form.
+        post(request): Creates a new user if the form data is valid.
+    """
+    throttle_scope = 'register'
+
+    async def get(self, request):
+        return await arender(request, 'user/register.html', {'form': RegistrationForm()})
+
+    async def post(self, request):
+        """
+        Validates the form, hashes the password off the event loop and inserts the
+        user and its confirmation email in one transaction.
+        """
+        try:
+            form = RegistrationForm(request.POST, request.FILES)
+            # Validation runs the username/email uniqueness queries.
+            if not await sync_to_async(form.is_valid)():
+                return await arender(request, 'user/register.html', {'form': form})
+
+            user = form.instance
+            user.password = await amake_password(form.cleaned_data['password'])
+            # Transactions are not available to async code, so the write runs in
+            # a worker thread.
+            await sync_to_async(RegistrationService.register)(user, request)
+            return redirect('user:confirmation_sent')
+        except Exception as e:
+            logger.error(f"An error occurred: {e}")
+            return custom_error_handler(request, e)
+
+
+class AsyncLoginView(ThrottleMixin, View):
+    """
+    Async view for logging in, rate limited like LoginView.
+
+    Methods:
+        get(request): Renders the login form.
+        post(request): Logs in the user if the credentials are valid.
+    """
+    throttle_scope = 'login'
+    throttle_account_field = 'username'
+
+    async def get(self, request):
+        return await arender(request, 'user/login.html', {'form': AsyncLoginForm(request)})
+
+    async def post(self, request):
+        try:
+            form = AsyncLoginForm(request, data=request.POST)
+            if form.is_valid():
+                user = await self.authenticate(form.cleaned_data['username'], form.cleaned_data['password'])
+                if user is not None:
+                    await alogin(request, user)
+                    return redirect('user:profile')
+                form.add_error(None, form.get_invalid_login_error())
+            return await arender(request, 'user/login.html', {'form': form})
+        except Exception as e:
+            logger.error(f"An error occurred: {e}")
+            return custom_error_handler(request, e)
+
+    async def authenticate(self, email, password):
+        """
+        Checks the credentials like ``ModelBackend.authenticate``.
+
+        Returns:
+            User: The authenticated user, or None.
+        """
+        try:
+            user = await User._default_manager.aget_by_natural_key(email)
+        except User.DoesNotExist:
+            # Hash anyway so response times don't reveal which emails exist.
+            await amake_password(password)
+            return None
+        if not user.is_active or not await acheck_password(user, password):
+            return None
+        user.backend = settings.AUTHENTICATION_BACKENDS[0]
+        return user
+
+
+class AsyncProfileView(View):
+    """
+    Async view displaying the logged-in user's own profile.
+
+    Methods:
+        get(request): Renders the profile page from the cached user.
+    """
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        await aload_cached_bio(user)
+        return await arender(request, 'user/profile.html', {'user': user})
+
+
+class AsyncEmailConfirmationView(View):
+    """
+    Async view confirming a user's email address.
+
+    Methods:
+        get(request, uid, token): Verifies the signed token and confirms the address.
+    """
+
+    async def get(self, request, uid=None, token=None):
+        if uid is None:
+            return await arender(request, 'user/invalid_token.html')
+        if await EmailService.aconfirm_email(token, uid):
+            return redirect('user:email_confirmed')
+        return redirect('user:invalid_token')
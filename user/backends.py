@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+
+# Columns left out of the cached projection because they can be large and are
+# only needed on the profile page.
+DEFERRED_USER_FIELDS = ('bio',)
+# Columns never written to the cache. What the session and templates need from
+# the password is cached in its place (see User.get_session_auth_hash).
+UNCACHED_USER_FIELDS = ('password',)
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+def _shared_cache():
+    # The version keys must be seen by every process, so they skip the local
+    # tier of a TwoTierCache.
+    cache = _cache()
+    return getattr(cache, 'shared', cache)
+
+
+def _timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+
+
+def _version_key(uid):
+    return f'user:auth:version:{uid}'
+
+
+def _user_key(uid, version):
+    return f'user:auth:{uid}:{version}'
+
+
+def _bio_key(user):
+    # Versioned by updated_at, so any save that changes the user also retires the
+    # cached bio without an explicit delete.
+    return f'user:bio:{user.pk}:{user.updated_at.timestamp()}'
+
+
+def _projection_fields():
+    """
+    Returns the cached attribute names, in concrete field order as ``Model.from_db`` expects.
+    """
+    return tuple(
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.attname not in DEFERRED_USER_FIELDS + UNCACHED_USER_FIELDS
+    )
+
+
+def _projection(db, fields, row):
+    """
+    Returns the version and cached value for a row of ``fields`` plus the password.
+    """
+    *values, password = row
+    user = get_user_model().from_db(db, fields, values)
+    user.password = password
+    entry = (tuple(values), user.get_session_auth_hash(), user.has_usable_password())
+    return user.updated_at.timestamp(), entry
+
+
+def _from_projection(db, fields, entry):
+    values, session_auth_hash, has_usable_password = entry
+    user = get_user_model().from_db(db, fields, values)
+    user._session_auth_hash = session_auth_hash
+    user._has_usable_password = has_usable_password
+    return user
+
+
+def get_cached_user(uid):
+    """
+    Returns the user with the given primary key, loaded from the cache if possible.
+
+    The instance carries every column except ``DEFERRED_USER_FIELDS`` and the
+    password. Those are loaded lazily on first access, as with ``QuerySet.defer()``.
+
+    Entries are keyed by the user's ``updated_at``, and the current version is
+    looked up in the shared tier on every call. A process therefore never
+    serves its local copy of a user that another process has invalidated.
+
+    Args:
+        uid: The user's primary key.
+
+    Returns:
+        User: The user, or None if no such user exists.
+    """
+    fields = _projection_fields()
+    queryset = get_user_model()._default_manager.for_uid(uid)
+    version = _shared_cache().get(_version_key(uid))
+    entry = None if version is None else _cache().get(_user_key(uid, version))
+    if entry is None:
+        row = queryset.filter(pk=uid).values_list(*fields, 'password').first()
+        if row is None:
+            return None
+        version, entry = _projection(queryset.db, fields, row)
+        _cache().set(_user_key(uid, version), entry, _timeout())
+        _shared_cache().set(_version_key(uid), version, _timeout())
+    return _from_projection(queryset.db, fields, entry)
+
+
+async def aget_cached_user(uid):
+    """
+    Async version of ``get_cached_user`` using the async cache and ORM APIs.
+    """
+    fields = _projection_fields()
+    queryset = get_user_model()._default_manager.for_uid(uid)
+    version = await _shared_cache().aget(_version_key(uid))
+    entry = None if version is None else await _cache().aget(_user_key(uid, version))
+    if entry is None:
+        row = await queryset.filter(pk=uid).values_list(*fields, 'password').afirst()
+        if row is None:
+            return None
+        version, entry = _projection(queryset.db, fields, row)
+        await _cache().aset(_user_key(uid, version), entry, _timeout())
+        await _shared_cache().aset(_version_key(uid), version, _timeout())
+    return _from_projection(queryset.db, fields, entry)
+
+
+def load_cached_bio(user):
+    """
+    Fills in the user's bio from the cache, querying only on a miss.
+    """
+    key = _bio_key(user)
+    bio = _cache().get(key)
+    if bio is None:
+        queryset = get_user_model()._default_manager.for_uid(user.pk)
+        bio = queryset.filter(pk=user.pk).values_list('bio', flat=True).first() or ''
+        _cache().set(key, bio, _timeout())
+    user.bio = bio
+    return user
+
+
+async def aload_cached_bio(user):
+    """
+    Async version of ``load_cached_bio``.
+    """
+    key = _bio_key(user)
+    bio = await _cache().aget(key)
+    if bio is None:
+        queryset = get_user_model()._default_manager.for_uid(user.pk)
+        bio = await queryset.filter(pk=user.pk).values_list('bio', flat=True).afirst() or ''
+        await _cache().aset(key, bio, _timeout())
+    user.bio = bio
+    return user
+
+
+def invalidate_cached_users(uids, using=None):
+    """
+    Retires the cached projections of the given users once the transaction on
+    the ``using`` database commits, or right away outside one. Call this after
+    writes that bypass ``User.save()``, such as ``QuerySet.update()``; they must
+    also set ``updated_at``, which versions the entries.
+
+    Retiring them before the commit would let a concurrent request cache the
+    old row again for ``USER_CACHE_TIMEOUT``.
+    """
+    keys = [_version_key(uid) for uid in uids]
+    transaction.on_commit(lambda: _shared_cache().delete_many(keys), using=using)
+
+
+async def ainvalidate_cached_users(uids):
+    await _shared_cache().adelete_many([_version_key(uid) for uid in uids])
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Authenticates like ``ModelBackend`` but loads the session user from the cache.
+
+    ``AuthenticationMiddleware`` calls ``get_user`` on every request. With this
+    backend that is a cache hit in steady state instead of a query for the full
+    user row. Entries are invalidated when the user is saved or deleted (see
+    ``user.signals``) and by the bulk write paths that bypass ``save()``.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await aget_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
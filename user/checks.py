@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.checks import Error, Tags, Warning, register
+
+from base.cache import TwoTierCache
+
+
+def _counter_backend(alias):
+    """Returns the backend that ``incr()`` on the cache ``alias`` ends up in."""
+    backend = caches[alias]
+    while isinstance(backend, TwoTierCache):
+        backend = backend.shared
+    return backend
+
+
+def _throttle_backend():
+    if not getattr(settings, 'THROTTLE_RATES', {}):
+        return None
+    try:
+        return _counter_backend(getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default'))
+    except InvalidCacheBackendError:
+        return None
+
+
+@register(Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    """
+    Refuses throttle caches whose ``incr()`` is a read followed by a write:
+    concurrent attempts would overwrite each other's counts, letting a parallel
+    brute force through.
+    """
+    backend = _throttle_backend()
+    if backend is None or isinstance(backend, (RedisCache, BaseMemcachedCache, LocMemCache)):
+        return []
+    return [Error(
+        f'THROTTLE_CACHE_ALIAS uses {type(backend).__module__}.{type(backend).__name__}, whose incr() is not atomic.',
+        hint='Use a Redis or Memcached cache for the throttle counters.',
+        id='user.E001',
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_throttle_cache_shared(app_configs, **kwargs):
+    if isinstance(_throttle_backend(), LocMemCache):
+        return [Warning(
+            'THROTTLE_CACHE_ALIAS uses a local memory cache, so every worker process counts attempts separately.',
+            hint='Use a Redis or Memcached cache shared by all workers.',
+            id='user.W001',
+        )]
+    return []
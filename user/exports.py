@@ -0,0 +1,72 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from user.sharding import shard_querysets
+
+# Columns written by user exports. The password hash is deliberately left out.
+EXPORT_FIELDS = (
+    'uid', 'username', 'email', 'bio', 'is_active', 'is_staff', 'is_superuser',
+    'is_email_confirmed', 'created_at', 'last_login',
+)
+DEFAULT_CHUNK_SIZE = 2000
+# Spreadsheets evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """
+    A file-like object that returns what is written to it, so ``csv.writer`` can
+    produce one line at a time for streaming.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_user_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields export rows as tuples, reading them through a server-side cursor.
+
+    Only ``chunk_size`` rows are held in memory at once, and no model instances
+    are built. With several user shards, an unpinned queryset is read from each
+    shard in turn.
+    """
+    for shard_queryset in shard_querysets(queryset):
+        yield from shard_queryset.order_by().values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def escape_formula(value):
+    """
+    Prefixes user-controlled text that a spreadsheet would run as a formula
+    with ``'``, so it is shown as text (CSV injection).
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields the export as CSV lines, starting with a header row.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in iter_user_rows(queryset, chunk_size):
+        yield writer.writerow([escape_formula(value) for value in row])
+
+
+def iter_jsonl(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields the export as JSON Lines, one object per user.
+    """
+    for row in iter_user_rows(queryset, chunk_size):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+# Format name -> (line generator, content type, file extension)
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv', 'csv'),
+    'jsonl': (iter_jsonl, 'application/x-ndjson', 'jsonl'),
+}
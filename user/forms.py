@@ -1,5 +1,6 @@
 from django import forms
 from .models import User
+from .uploads import ProfilePictureField
 from django.contrib.auth.forms import AuthenticationForm
 class RegistrationForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput())
@@ -7,6 +8,7 @@ class RegistrationForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ['username', 'email', 'password', 'profile_picture', 'bio']
+        field_classes = {'profile_picture': ProfilePictureField}
     def clean(self):
         cleaned_data = super().clean()
         password = cleaned_data.get("password")
@@ -14,6 +16,16 @@ class RegistrationForm(forms.ModelForm):
 
         if password and password_confirm and password != password_confirm:
             self.add_error('password_confirm', "Passwords do not match")
+
+    def save(self, commit=True):
+        """
+        Hashes the password before the user is inserted, so registration needs a single write.
+        """
+        user = super().save(commit=False)
+        user.set_password(self.cleaned_data['password'])
+        if commit:
+            user.save(force_insert=True)
+        return user
 class LoginForm(AuthenticationForm):
     username = forms.CharField(
         label='Email',
@@ -25,7 +37,25 @@ class LoginForm(AuthenticationForm):
         widget=forms.PasswordInput(attrs={'class': 'form-control'})
     )
 
+class AsyncLoginForm(LoginForm):
+    """
+    LoginForm that only validates its fields. AsyncLoginView checks the
+    credentials itself with the async ORM and the password executor.
+    """
+    def clean(self):
+        return self.cleaned_data
+
 class UpdateForm(forms.ModelForm):
     class Meta:
         model = User
-        fields = ['username', 'email', 'profile_picture', 'bio']
\ No newline at end of file
+        fields = ['username', 'email', 'profile_picture', 'bio']
+        field_classes = {'profile_picture': ProfilePictureField}
+
+    def save(self, commit=True):
+        """
+        Writes only the columns the user actually changed.
+        """
+        user = super().save(commit=False)
+        if commit and self.changed_data:
+            user.save(update_fields=[*self.changed_data, 'updated_at'])
+        return user
\ No newline at end of file
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_password_executor():
+    """
+    Returns the shared, bounded thread pool used for password hashing.
+
+    The hashers spend their time in C code that releases the GIL, so threads hash
+    in parallel. The pool size (``PASSWORD_HASHING_WORKERS``) caps how many CPUs
+    login and registration traffic can occupy at once; excess work queues up
+    instead of stalling the event loop.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count(),
+                    thread_name_prefix='password-hashing',
+                )
+    return _executor
+
+
+async def acheck_password(user, raw_password):
+    """
+    Async version of ``user.check_password`` that hashes on the password executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_password_executor(), user.check_password, raw_password)
+
+
+async def amake_password(raw_password):
+    """
+    Async version of ``make_password`` that hashes on the password executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_password_executor(), make_password, raw_password)
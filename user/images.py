@@ -0,0 +1,136 @@
+"""
+Resized WebP variants of profile pictures.
+
+Variants are written next to the original (``media/alice.jpg`` gets
+``media/alice.small.webp`` and so on) by a background process pool once the
+upload is committed, so requests never decode or resize images themselves.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_sizes():
+    """Returns the ``{variant: edge length in pixels}`` map of square variants to generate."""
+    return getattr(settings, 'PROFILE_PICTURE_VARIANTS', {'small': 64, 'medium': 128, 'large': 256})
+
+
+def variant_name(name, variant):
+    """
+    Returns the storage name of a variant of the stored file ``name``.
+    """
+    root, _ = os.path.splitext(name)
+    return f'{root}.{variant}.webp'
+
+
+def generate_variants(name, storage=None):
+    """
+    Writes every configured variant of the stored image ``name``, replacing old ones.
+
+    Returns:
+        list: The storage names of the variants written.
+    """
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as stream, Image.open(stream) as image:
+        # Let the JPEG decoder downscale by a power of two while decoding, which
+        # is far cheaper than decoding the full bitmap and resizing it.
+        largest = max(variant_sizes().values())
+        image.draft('RGB', (largest, largest))
+        # Honour camera rotation; palette, CMYK and 16-bit uploads are converted
+        # to modes the WebP encoder accepts.
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        written = []
+        for variant, size in variant_sizes().items():
+            thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            thumbnail.save(buffer, 'WEBP', quality=getattr(settings, 'PROFILE_PICTURE_WEBP_QUALITY', 80), method=4)
+            target = variant_name(name, variant)
+            if hasattr(storage, 'save_derived'):
+                # Content-addressed storage would rename the variant by its own hash
+                written.append(storage.save_derived(target, ContentFile(buffer.getvalue())))
+            else:
+                storage.delete(target)
+                written.append(storage.save(target, ContentFile(buffer.getvalue())))
+    return written
+
+
+def mark_variants_generated(uid, name):
+    """
+    Records on the user ``uid`` that the variants of their picture ``name``
+    exist, unless they have changed their picture since.
+    """
+    from user.backends import invalidate_cached_users
+
+    User = apps.get_model('user', 'User')
+    queryset = User.objects.for_uid(uid).filter(pk=uid, profile_picture=name)
+    if queryset.update(profile_picture_variants_for=name, updated_at=timezone.now()):
+        invalidate_cached_users([uid], using=queryset.db)
+
+
+def _generate_logged(name, uid=None):
+    try:
+        written = generate_variants(name)
+        if uid is not None:
+            mark_variants_generated(uid, name)
+        return written
+    except Exception as e:
+        logger.error(f"Generating variants of {name} failed: {e}")
+        return []
+
+
+def get_image_executor():
+    """
+    Returns the shared process pool that generates variants, or None when
+    ``PROFILE_PICTURE_WORKERS`` is 0 and variants are generated inline.
+
+    Workers are spawned rather than forked, as forking a threaded web worker is
+    unsafe, and set Django up once on start.
+    """
+    global _executor
+    workers = getattr(settings, 'PROFILE_PICTURE_WORKERS', 2)
+    if not workers:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+    return _executor
+
+
+def schedule_variants(name, using=None, uid=None):
+    """
+    Generates the variants of ``name`` once the current transaction on ``using``
+    commits, in the process pool when there is one, then marks them generated
+    on the user ``uid``.
+    """
+    def submit():
+        executor = get_image_executor()
+        if executor is None:
+            _generate_logged(name, uid)
+        else:
+            executor.submit(_generate_logged, name, uid)
+
+    transaction.on_commit(submit, using=using)
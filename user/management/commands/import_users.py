@@ -0,0 +1,197 @@
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from user.models import User, UserShardDirectory
+from user.sharding import is_sharded, shard_for_uid
+
+BOOLEAN_FIELDS = ('is_active', 'is_staff', 'is_email_confirmed')
+
+
+def hash_passwords(passwords):
+    """
+    Hashes a chunk of raw passwords. Runs inside the worker processes.
+
+    Empty passwords produce an unusable password, like ``set_password(None)``.
+    """
+    return [make_password(password or None) for password in passwords]
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+class Command(BaseCommand):
+    """
+    Streams users from a CSV or JSONL file into the database.
+
+    Rows are read lazily and handled one chunk at a time: the passwords of a chunk
+    are hashed in a process pool while earlier chunks are written with
+    ``bulk_create``. At most ``--workers * 2`` chunks are in flight, so memory use
+    depends on the chunk size, not on the size of the input file.
+
+    Recognised columns: ``email`` and ``username`` (required), ``password``, ``bio``,
+    ``is_active``, ``is_staff`` and ``is_email_confirmed``. Emails are lowercased,
+    and rows with a missing or invalid email are skipped. With
+    ``--ignore-conflicts`` the rows of existing users are counted separately.
+
+    With several ``USER_SHARDS`` each user is written to its own shard, after its
+    email is claimed in the shard directory. Model signals don't run.
+    """
+
+    help = 'Bulk import users from a CSV or JSONL file, hashing passwords in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='Input format. Guessed from the file extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows hashed and inserted per batch.')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes. 0 hashes in this process.')
+        parser.add_argument('--ignore-conflicts', action='store_true', help='Skip rows whose email or username already exists.')
+
+    def handle(self, *args, **options):
+        input_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        try:
+            rows = self._read_csv(stream) if input_format == 'csv' else self._read_jsonl(stream)
+            self._import(rows, options)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def _read_csv(self, stream):
+        yield from csv.DictReader(stream)
+
+    def _read_jsonl(self, stream):
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise CommandError(f'Invalid JSON on line {line_number}: {e}')
+
+    def _chunks(self, rows, chunk_size):
+        iterator = iter(rows)
+        while chunk := list(itertools.islice(iterator, chunk_size)):
+            yield chunk
+
+    def _import(self, rows, options):
+        chunk_size = options['chunk_size']
+        workers = options['workers'] if options['workers'] is not None else os.cpu_count()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup) if workers else None
+        max_in_flight = max(workers, 1) * 2
+        pending = deque()
+        self.imported = self.skipped = self.conflicts = 0
+        self.started = time.perf_counter()
+        try:
+            for chunk in self._chunks(rows, chunk_size):
+                chunk = self._clean_chunk(chunk)
+                passwords = [row.get('password') for row in chunk]
+                if executor:
+                    pending.append((chunk, executor.submit(hash_passwords, passwords)))
+                    if len(pending) >= max_in_flight:
+                        self._write(*pending.popleft(), options)
+                else:
+                    self._write(chunk, hash_passwords(passwords), options)
+            while pending:
+                self._write(*pending.popleft(), options)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - self.started
+        conflicts = f', {self.conflicts} already existed' if options['ignore_conflicts'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} users in {elapsed:.1f}s '
+            f'({self.imported / elapsed if elapsed else 0:,.0f} users/s), skipped {self.skipped} invalid rows{conflicts}.'
+        ))
+
+    def _clean_chunk(self, chunk):
+        cleaned = []
+        for row in chunk:
+            email = (row.get('email') or '').strip().lower()
+            username = (row.get('username') or '').strip()
+            try:
+                validate_email(email)
+            except ValidationError:
+                email = ''
+            if not email or not username:
+                self.skipped += 1
+                continue
+            row['email'] = email
+            row['username'] = username
+            cleaned.append(row)
+        return cleaned
+
+    def _write(self, chunk, hashed, options):
+        if hasattr(hashed, 'result'):
+            hashed = hashed.result()
+        users = []
+        for row, password in zip(chunk, hashed):
+            fields = {name: _parse_bool(row[name]) for name in BOOLEAN_FIELDS if row.get(name) not in (None, '')}
+            users.append(User(
+                email=row['email'],
+                username=row['username'],
+                password=password,
+                bio=row.get('bio') or '',
+                **fields,
+            ))
+        if is_sharded():
+            inserted = self._create_sharded(users, options['ignore_conflicts'])
+        else:
+            inserted = self._create(User.objects, users, options['ignore_conflicts'])
+        self.conflicts += len(users) - len(inserted)
+        self.imported += len(inserted)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{self.imported} users imported ({self.imported / elapsed:,.0f} users/s)')
+
+    def _create(self, manager, objs, ignore_conflicts):
+        """Inserts ``objs`` and returns the primary keys actually written."""
+        if not objs:
+            return set()
+        manager.bulk_create(objs, batch_size=len(objs), ignore_conflicts=ignore_conflicts)
+        pks = [obj.pk for obj in objs]
+        if not ignore_conflicts:
+            return set(pks)
+        # Skipped rows aren't reported; the new primary keys tell which were written
+        return set(manager.filter(pk__in=pks).values_list('pk', flat=True))
+
+    def _create_sharded(self, users, ignore_conflicts):
+        """
+        Claims the users' emails in the directory, then writes each user to its
+        shard. Directory entries of users the shards didn't take are released.
+        """
+        directory = UserShardDirectory.objects.db_manager(DEFAULT_DB_ALIAS)
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            claimed = self._create(
+                directory, [UserShardDirectory(user_uid=user.pk, email=user.email) for user in users], ignore_conflicts,
+            )
+        by_shard = {}
+        for user in users:
+            if user.pk in claimed:
+                by_shard.setdefault(shard_for_uid(user.pk), []).append(user)
+        inserted = set()
+        try:
+            for alias, shard_users in by_shard.items():
+                with transaction.atomic(using=alias):
+                    inserted |= self._create(User.objects.db_manager(alias), shard_users, ignore_conflicts)
+        finally:
+            released = claimed - inserted
+            if released:
+                directory.filter(user_uid__in=released).delete()
+        return inserted
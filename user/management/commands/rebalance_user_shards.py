@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from user.backends import invalidate_cached_users
+from user.models import User, UserShardDirectory
+from user.sharding import shard_for_uid, user_shards
+
+
+class Command(BaseCommand):
+    """
+    Moves users whose primary key hashes to a different shard than the one they
+    are stored on, e.g. after a database is added to ``USER_SHARDS``.
+
+    Shards are scanned in primary key order. Misplaced users are copied to their
+    new shard and then deleted from the old one, a batch at a time. The email
+    directory maps emails to primary keys, not shards, so it needs no changes.
+    """
+
+    help = 'Move users to the shard their primary key hashes to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users moved per transaction.')
+        parser.add_argument(
+            '--source', action='append', default=[],
+            help='Database alias to scan; defaults to every shard. Also used to drain a retired shard. May be repeated.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many users would move.')
+        parser.add_argument(
+            '--rebuild-directory', action='store_true',
+            help='Also add missing email directory entries, e.g. when sharding is first enabled.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        for source in options['source'] or user_shards():
+            pending = defaultdict(list)
+            moved = defaultdict(int)
+            if options['rebuild_directory'] and not options['dry_run']:
+                self._rebuild_directory(source, batch_size)
+            for user in User.objects.using(source).order_by('pk').iterator(chunk_size=batch_size):
+                target = shard_for_uid(user.pk)
+                if target == source:
+                    continue
+                pending[target].append(user)
+                if len(pending[target]) >= batch_size:
+                    moved[target] += self._move(pending.pop(target), source, target, options['dry_run'])
+            for target, users in pending.items():
+                moved[target] += self._move(users, source, target, options['dry_run'])
+
+            for target, count in sorted(moved.items()):
+                verb = 'Would move' if options['dry_run'] else 'Moved'
+                self.stdout.write(f'{verb} {count} users from {source} to {target}.')
+                total += count
+
+        self.stdout.write(self.style.SUCCESS(f'{total} users misplaced.' if options['dry_run'] else f'Moved {total} users.'))
+
+    def _move(self, users, source, target, dry_run):
+        if dry_run:
+            return len(users)
+        pks = [user.pk for user in users]
+        # Copy before deleting: a crash in between leaves a duplicate on the old
+        # shard, which the next run cleans up, rather than a lost user.
+        with transaction.atomic(using=target):
+            User.objects.using(target).bulk_create(users, ignore_conflicts=True)
+        copied = User.objects.using(target).filter(pk__in=pks).count()
+        if copied != len(pks):
+            raise CommandError(f'Only {copied} of {len(pks)} users reached {target}; nothing was deleted from {source}.')
+        with transaction.atomic(using=source):
+            # Only the user rows: the ORM's cascade would also delete what refers
+            # to them on the old shard, such as admin log entries.
+            User.objects.using(source).filter(pk__in=pks)._raw_delete(source)
+        invalidate_cached_users(pks, using=source)
+        return len(users)
+
+    def _rebuild_directory(self, source, batch_size):
+        rows = User.objects.using(source).values_list('pk', 'email').iterator(chunk_size=batch_size)
+        batch = []
+        for pk, email in rows:
+            batch.append(UserShardDirectory(user_uid=pk, email=email.lower()))
+            if len(batch) >= batch_size:
+                UserShardDirectory.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        UserShardDirectory.objects.bulk_create(batch, ignore_conflicts=True)
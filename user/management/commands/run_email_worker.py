@@ -0,0 +1,58 @@
+import logging
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from user.services import EmailOutboxService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Drains the email outbox.
+
+    Due messages are sent in batches over one reused mail connection, which is
+    only opened when there is something to send. It is dropped after a failed
+    batch and whenever the outbox is idle, so a long-running worker does not
+    hold an SMTP session open for nothing. A batch that fails, including
+    failing to connect, is retried after ``--poll-interval``.
+    """
+
+    help = 'Send queued emails from the outbox in batches, retrying failures with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages claimed per batch.')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the due messages and exit.')
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        try:
+            while True:
+                try:
+                    sent, failed = EmailOutboxService.process_batch(connection, options['batch_size'])
+                except Exception as e:
+                    logger.error(f"Email outbox batch failed: {e}")
+                    connection.close()
+                    if options['once']:
+                        raise
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} message(s), {failed} failed.')
+                    if failed:
+                        # The relay may have dropped us; reconnect for the next batch.
+                        connection.close()
+                    continue
+
+                connection.close()
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
@@ -0,0 +1,235 @@
+import random
+import string
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from operator import attrgetter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from base.base_model import uuid7
+from user.models import EmailOutbox, User, UserShardDirectory
+from user.sharding import is_sharded, shard_for_uid, user_shards
+
+SEED_DOMAIN = 'seed.example.invalid'
+# Generated accounts are spread over the year from this date, one every 30 seconds
+SEED_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+SEED_SPACING = timedelta(seconds=30)
+
+WORDS = (
+    'coffee', 'travel', 'photography', 'python', 'music', 'hiking', 'books', 'design', 'running', 'cooking',
+    'film', 'gardening', 'chess', 'climbing', 'databases', 'cycling', 'painting', 'history', 'jazz', 'science',
+    'writer', 'engineer', 'teacher', 'student', 'founder', 'parent', 'gamer', 'runner', 'maker', 'nurse',
+    'loves', 'enjoys', 'learning', 'building', 'sharing', 'about', 'weekend', 'city', 'coast', 'mountains',
+)
+
+
+def copy_text_line(values):
+    """Returns a row in the text format of Postgres ``COPY``, for psycopg2's ``copy_expert``."""
+    fields = []
+    for value in values:
+        if value is None:
+            fields.append('\\N')
+        elif isinstance(value, bool):
+            fields.append('t' if value else 'f')
+        elif isinstance(value, datetime):
+            fields.append(value.isoformat())
+        else:
+            fields.append(
+                str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+            )
+    return '\t'.join(fields) + '\n'
+
+
+class Command(BaseCommand):
+    """
+    Fills the database with deterministic fake users for load testing.
+
+    Rows are generated in memory and written without the ORM: ``COPY`` on
+    Postgres (with psycopg 3 or psycopg2) and batched ``executemany`` inserts
+    elsewhere, one transaction per batch. Every account gets the same password, hashed once
+    with a fixed salt, so seeding costs no hashing and seeded users can log in.
+    About ``--unconfirmed`` of the accounts have not confirmed their email and
+    get a sent confirmation email in the outbox.
+
+    Runs with the same ``--seed``, ``--offset`` and ``--users`` produce the same
+    rows; ``--offset`` appends users after an earlier run. Accounts use the
+    ``@seed.example.invalid`` domain and are removed with ``--delete``. Model
+    signals don't run, so the shard directory is written here when sharded.
+    """
+
+    help = 'Insert deterministic fake users and emails in bulk for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000, help='Number of users to create.')
+        parser.add_argument('--offset', type=int, default=0, help='Number the users from here, after an earlier run.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+        parser.add_argument('--batch-size', type=int, default=20_000, help='Rows written per transaction.')
+        parser.add_argument('--password', default='seed-password', help='Password of every seeded user.')
+        parser.add_argument('--unconfirmed', type=float, default=0.1, help='Share of users with an unconfirmed email.')
+        parser.add_argument('--delete', action='store_true', help='Delete all seeded users and emails instead.')
+
+    def handle(self, *args, **options):
+        if options['delete']:
+            self._delete()
+            return
+        if options['batch_size'] < 1 or options['users'] < 0:
+            raise CommandError('--users and --batch-size must be positive.')
+
+        # A salt as long as a random one, or the hasher would rehash it at login
+        salt = ''.join(random.Random(f'salt:{options["seed"]}').choices(string.ascii_letters + string.digits, k=22))
+        self.password = make_password(options['password'], salt=salt)
+        self.writers = {}
+        rng = random.Random(f'{options["seed"]}:{options["offset"]}')
+        started = time.perf_counter()
+        users = emails = 0
+        end = options['offset'] + options['users']
+        for start in range(options['offset'], end, options['batch_size']):
+            user_rows, email_rows = self._generate(rng, start, min(start + options['batch_size'], end), options)
+            self._write_users(user_rows)
+            self._write('default', EmailOutbox, email_rows)
+            users += len(user_rows)
+            emails += len(email_rows)
+            self.stdout.write(f'{users} users...', ending='\r')
+        self._analyze()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {users} users and {emails} emails in {elapsed:.1f}s ({users / elapsed if elapsed else 0:,.0f} users/s).'
+        ))
+
+    def _generate(self, rng, start, end, options):
+        users, emails = [], []
+        for number in range(start, end):
+            created_at = SEED_EPOCH + SEED_SPACING * number
+            uid = uuid7(int(created_at.timestamp() * 1000), rng.getrandbits(80))
+            name = f'seed{number:07d}'
+            email = f'{name}@{SEED_DOMAIN}'
+            confirmed = rng.random() >= options['unconfirmed']
+            last_login = created_at + timedelta(seconds=rng.randrange(30 * 86400)) if confirmed and rng.random() < 0.6 else None
+            users.append({
+                'uid': uid,
+                'created_at': created_at,
+                'updated_at': last_login or created_at,
+                'password': self.password,
+                'last_login': last_login,
+                'username': name,
+                'email': email,
+                'profile_picture': '',
+                'profile_picture_variants_for': '',
+                'bio': ' '.join(rng.choices(WORDS, k=rng.randint(3, 16))).capitalize() + '.',
+                'is_staff': False,
+                'is_active': confirmed,
+                'is_superuser': False,
+                'is_email_confirmed': confirmed,
+                'email_confirmation_sent_at': created_at,
+            })
+            if not confirmed:
+                emails.append({
+                    'uid': uuid7(int(created_at.timestamp() * 1000), rng.getrandbits(80)),
+                    'created_at': created_at,
+                    'updated_at': created_at,
+                    'to_email': email,
+                    'subject': 'Confirm your email address',
+                    'body': f'Hi {name}, please confirm your email address.',
+                    'html_body': '',
+                    'status': EmailOutbox.Status.SENT,
+                    'attempts': 1,
+                    'next_attempt_at': created_at,
+                    'last_error': '',
+                    'sent_at': created_at,
+                })
+        return users, emails
+
+    def _write_users(self, rows):
+        if not is_sharded():
+            self._write('default', User, rows)
+            return
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(shard_for_uid(row['uid']), []).append(row)
+        for alias, shard_rows in by_shard.items():
+            self._write(alias, User, shard_rows)
+        self._write('default', UserShardDirectory, [{'user_uid': row['uid'], 'email': row['email']} for row in rows])
+
+    def _write(self, alias, model, rows):
+        if not rows:
+            return
+        connection = connections[alias]
+        fields = model._meta.concrete_fields
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            copy_driver = self._copy_driver(connection)
+            if copy_driver == 'psycopg':
+                # psycopg adapts the Python values itself
+                with cursor.cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                    for row in rows:
+                        copy.write_row([row[field.attname] for field in fields])
+                return
+            if copy_driver == 'psycopg2':
+                buffer = StringIO()
+                for row in rows:
+                    buffer.write(copy_text_line([row[field.attname] for field in fields]))
+                buffer.seek(0)
+                cursor.cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', buffer)
+                return
+            # Only keys and dates need converting for the database driver. The
+            # field methods are bypassed for speed; values are already valid.
+            converters = []
+            for index, field in enumerate(fields):
+                if field.get_internal_type() == 'DateTimeField':
+                    converters.append((index, connection.ops.adapt_datetimefield_value))
+                elif field.get_internal_type() == 'UUIDField' and not connection.features.has_native_uuid_field:
+                    converters.append((index, attrgetter('hex')))
+            params = []
+            for row in rows:
+                values = [row[field.attname] for field in fields]
+                # Several columns of a row share one timestamp; convert it once
+                converted = {}
+                for index, convert in converters:
+                    value = values[index]
+                    if value is not None:
+                        key = id(value)
+                        if key not in converted:
+                            converted[key] = convert(value)
+                        values[index] = converted[key]
+                params.append(values)
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', params)
+
+    def _copy_driver(self, connection):
+        # The Postgres driver whose COPY support to use, or None to insert
+        if connection.alias not in self.writers:
+            driver = None
+            if connection.vendor == 'postgresql':
+                from django.db.backends.postgresql.psycopg_any import is_psycopg3
+                driver = 'psycopg' if is_psycopg3 else 'psycopg2'
+            self.writers[connection.alias] = driver
+        return self.writers[connection.alias]
+
+    def _analyze(self):
+        # Refresh planner statistics; the admin's estimated counts come from them
+        for alias, model in [*((alias, User) for alias in user_shards()), ('default', EmailOutbox)]:
+            connection = connections[alias]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    def _delete(self):
+        # Plain DELETEs: going through the ORM would load every row for the signals
+        pattern = f'%@{SEED_DOMAIN}'
+        users = sum(self._delete_where(alias, User, 'email', pattern) for alias in user_shards())
+        emails = self._delete_where('default', EmailOutbox, 'to_email', pattern)
+        if is_sharded():
+            self._delete_where('default', UserShardDirectory, 'email', pattern)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {users} seeded users and {emails} emails.'))
+
+    def _delete_where(self, alias, model, column, pattern):
+        connection = connections[alias]
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE {connection.ops.quote_name(column)} LIKE %s', [pattern])
+            return cursor.rowcount
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_email_outbox'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='email_confirmation_token',
+        ),
+    ]
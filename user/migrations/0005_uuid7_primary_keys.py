@@ -0,0 +1,24 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:14
+
+import base.base_model
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_remove_user_email_confirmation_token'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='uid',
+            field=models.UUIDField(default=base.base_model.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='uid',
+            field=models.UUIDField(default=base.base_model.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
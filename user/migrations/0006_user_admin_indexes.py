@@ -0,0 +1,76 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:18
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.migrations.operations import AddIndex
+
+# Trigram indexes for the admin's icontains search. Django renders icontains on
+# Postgres as UPPER("col"::text) LIKE UPPER(%s), so the indexes cover that exact
+# expression. Other engines have no trigram support and keep sequential scans.
+TRIGRAM_INDEXES = {
+    'user_username_trgm_idx': 'username',
+    'user_email_trgm_idx': 'email',
+}
+
+
+# All indexes are built CONCURRENTLY, so the user table stays writable while
+# they build; that can't run in a transaction, hence the non-atomic migration.
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """``AddIndexConcurrently`` on Postgres, a plain ``AddIndex`` elsewhere."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON "user" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('user', '0005_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['-uid'], name='user_inactive_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', True)), fields=['-uid'], name='user_staff_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_email_confirmed', False)), fields=['-uid'], name='user_unconfirmed_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes, hints={'model_name': 'user'}),
+    ]
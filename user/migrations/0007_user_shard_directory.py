@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_user_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserShardDirectory',
+            fields=[
+                ('user_uid', models.UUIDField(primary_key=True, serialize=False)),
+                ('email', models.EmailField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name': 'User shard directory entry',
+                'verbose_name_plural': 'User shard directory',
+                'db_table': 'user_shard_directory',
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:41
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+
+
+def dedupe_emails(apps, schema_editor):
+    """
+    Resolves emails that only differ in case before the case-insensitive unique
+    constraint is added.
+
+    Each group keeps the account most likely in use: confirmed, then active,
+    then most recently logged in, then oldest. The others are deactivated and
+    their email is suffixed with their primary key, so no account is deleted.
+    The start of the email is cut where the suffix would not fit the column.
+    """
+    User = apps.get_model('user', 'User')
+    max_length = User._meta.get_field('email').max_length
+    db = schema_editor.connection.alias
+    users = User.objects.using(db).annotate(email_lower=Lower('email'))
+    duplicates = (
+        users.values('email_lower').annotate(count=Count('pk')).filter(count__gt=1).values_list('email_lower', flat=True)
+    )
+    for email_lower in duplicates.iterator():
+        group = users.filter(email_lower=email_lower).order_by(
+            '-is_email_confirmed', '-is_active', F('last_login').desc(nulls_last=True), 'created_at',
+        )
+        for user in list(group)[1:]:
+            suffix = f'.duplicate-{user.pk.hex}'
+            user.email = user.email[:max_length - len(suffix)] + suffix
+            user.is_active = False
+            user.save(update_fields=['email', 'is_active'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_user_shard_directory'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_emails, migrations.RunPython.noop, hints={'model_name': 'user'}),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='user_email_lower_uniq', violation_error_message='A user with that email already exists.'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:55
+
+from itertools import islice
+
+from django.db import migrations, router
+from django.db.models import Count, F
+
+
+def count_existing_pictures(apps, schema_editor):
+    """
+    Records references to the profile pictures stored before content-addressed
+    storage, so gc_media never considers them unreferenced.
+
+    Runs once per user shard and adds to the counts the other shards recorded
+    in the blob table, which only exists on the default database.
+    """
+    User = apps.get_model('user', 'User')
+    MediaBlob = apps.get_model('core', 'MediaBlob')
+    db = schema_editor.connection.alias
+    blobs = MediaBlob.objects.using(router.db_for_write(MediaBlob))
+    counts = (
+        User.objects.using(db).exclude(profile_picture='')
+        .values_list('profile_picture').annotate(refcount=Count('pk')).order_by()
+    )
+    rows = counts.iterator()
+    while batch := dict(islice(rows, 1000)):
+        for name in blobs.filter(name__in=batch).values_list('name', flat=True):
+            blobs.filter(name=name).update(refcount=F('refcount') + batch.pop(name))
+        blobs.bulk_create(MediaBlob(name=name, refcount=refcount) for name, refcount in batch.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('user', '0008_case_insensitive_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_existing_pictures, migrations.RunPython.noop, hints={'model_name': 'user'}),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-18 04:04
+
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def mark_existing_variants(apps, schema_editor):
+    """
+    Marks the pictures whose variants were generated before the field existed,
+    checking the storage once per distinct picture.
+
+    Variants are stored next to the picture as ``<name>.<variant>.webp``.
+    """
+    User = apps.get_model('user', 'User')
+    db = schema_editor.connection.alias
+    variants = getattr(settings, 'PROFILE_PICTURE_VARIANTS', {'small': 64, 'medium': 128, 'large': 256})
+    first_variant = next(iter(variants), None)
+    if first_variant is None:
+        return
+    names = User.objects.using(db).exclude(profile_picture='').values_list('profile_picture', flat=True).distinct()
+    for name in names.iterator():
+        if default_storage.exists(f'{os.path.splitext(name)[0]}.{first_variant}.webp'):
+            User.objects.using(db).filter(profile_picture=name).update(profile_picture_variants_for=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_profile_picture_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_variants_for',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(mark_existing_variants, migrations.RunPython.noop, hints={'model_name': 'user'}),
+    ]
@@ -1,10 +1,13 @@
+from django.core.exceptions import ValidationError
 from django.utils import timezone
-import uuid
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from base.base_model import BaseModel
-from django.utils.http import urlsafe_base64_encode
-from django.utils.encoding import force_bytes
+from user.images import variant_name, variant_sizes
+from user.sharding import (
+    forget_user_email, is_sharded, record_user_email, reserve_user_email, shard_for_uid, uid_for_email,
+)
 from django.utils.translation import gettext_lazy as _
 
 
@@ -21,6 +24,40 @@ class CustomUserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def for_uid(self, uid):
+        """
+        Returns a queryset on the shard owning the user with the given primary key.
+
+        Raises:
+            ValueError: If ``uid`` is not a valid UUID.
+        """
+        queryset = self.get_queryset()
+        return queryset.using(shard_for_uid(uid)) if is_sharded() else queryset
+
+    def for_email(self, email):
+        """
+        Returns a queryset on the shard owning the user with the given email, found
+        through the email directory. It is empty if no user has that email.
+        """
+        if not is_sharded():
+            return self.get_queryset()
+        uid = uid_for_email(email)
+        return self.none() if uid is None else self.for_uid(uid)
+
+    def _by_email(self, email):
+        # Compares lower(email), so the lookup is a probe of user_email_lower_uniq.
+        return self.for_email(email).alias(email_lower=Lower(self.model.USERNAME_FIELD)).filter(
+            email_lower=email.lower(),
+        )
+
+    def get_by_natural_key(self, email):
+        """Returns the user with the given email, ignoring case."""
+        return self._by_email(email).get()
+
+    async def aget_by_natural_key(self, email):
+        """Async version of get_by_natural_key, used by the async login view."""
+        return await self._by_email(email).aget()
+
     def create_superuser(self, email, password=None, **extra_fields):
         """Create and save a SuperUser with the given email and password."""
         extra_fields.setdefault('is_staff', True)
@@ -36,15 +73,18 @@ class CustomUserManager(BaseUserManager):
 
 class User(BaseModel, AbstractBaseUser):
     username = models.CharField(max_length=50, unique=True)
-    email = models.EmailField(max_length=255, unique=True)
+    # Unique ignoring case, through the user_email_lower_uniq constraint
+    email = models.EmailField(max_length=255)
     password = models.CharField(max_length=255)
     profile_picture = models.ImageField(upload_to='media', blank=True)
+    # The picture whose resized variants exist, set by the worker that wrote them
+    # (see user.images). The original is served while it differs.
+    profile_picture_variants_for = models.CharField(max_length=100, blank=True, editable=False)
     bio = models.TextField(blank=True)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     is_superuser = models.BooleanField(default=False)
     is_email_confirmed = models.BooleanField(default=False)
-    email_confirmation_token = models.CharField(max_length=255, blank=True, null=True)
     email_confirmation_sent_at = models.DateTimeField(null=True, blank=True)
 
     USERNAME_FIELD = 'email'
@@ -55,27 +95,181 @@ class User(BaseModel, AbstractBaseUser):
     def __str__(self):
         return self.username
 
-    class Meta:
-        verbose_name = 'User'
-        verbose_name_plural = 'Users'
-        db_table = 'user'
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a save can tell whether the stored picture changed and
+        # move its reference count (see user.signals).
+        picture = instance.__dict__.get('profile_picture')
+        instance._loaded_profile_picture = getattr(picture, 'name', picture)
+        # And whether the email changed, for the shard directory
+        instance._loaded_email = instance.__dict__.get('email')
+        return instance
 
-
-    def generate_confirmation_token(self):
+    def validate_constraints(self, exclude=None):
         """
-        Generates a URL-safe base64 encoded token for email_confirmation_token field.
+        Also checks the email against the shard directory when sharded, as a
+        shard's own constraint only sees the users stored on it.
         """
-        uid = uuid.uuid4().hex
-        return urlsafe_base64_encode(force_bytes(uid))
+        errors = {}
+        try:
+            super().validate_constraints(exclude)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+        if is_sharded() and 'email' not in errors and not (exclude and 'email' in exclude) and self.email:
+            owner = uid_for_email(self.email)
+            if owner is not None and owner != str(self.pk):
+                errors['email'] = [ValidationError(_('A user with that email already exists.'), code='unique')]
+        if errors:
+            raise ValidationError(errors)
+
+    def get_session_auth_hash(self):
+        # Users loaded by CachedModelBackend carry the hash instead of the password
+        if 'password' not in self.__dict__ and hasattr(self, '_session_auth_hash'):
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
+    def has_usable_password(self):
+        if 'password' not in self.__dict__ and hasattr(self, '_has_usable_password'):
+            return self._has_usable_password
+        return super().has_usable_password()
 
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields and 'updated_at' not in update_fields:
+            # The cached projection is versioned by updated_at (see user.backends)
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+        if not is_sharded():
+            return super().save(*args, **kwargs)
+        # The email directory row is written first and put back if the shard
+        # write fails, so the two never disagree about who owns an email.
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding:
+            reserve_user_email(self.pk, self.email)
+            restore = lambda: forget_user_email(self.pk, self.email)  # noqa: E731
+        elif update_fields is None or 'email' in update_fields:
+            old_email = getattr(self, '_loaded_email', None)
+            if old_email is None:
+                old_email = User.objects.for_uid(self.pk).filter(pk=self.pk).values_list('email', flat=True).first()
+            if old_email is None or old_email.lower() == self.email.lower():
+                return self._save_tracking_email(*args, **kwargs)
+            record_user_email(self.pk, self.email, old_email=old_email)
+            restore = lambda: record_user_email(self.pk, old_email, old_email=self.email)  # noqa: E731
+        else:
+            return self._save_tracking_email(*args, **kwargs)
+        try:
+            self._save_tracking_email(*args, **kwargs)
+        except Exception:
+            restore()
+            raise
+
+    def _save_tracking_email(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_email = self.email
+
+    def profile_picture_url(self, variant=None):
         """
-        Saves the current user instance.
+        Returns the URL of a resized variant of the profile picture (see
+        ``PROFILE_PICTURE_VARIANTS``), or of the original when no variant is given
+        or it hasn't been generated yet.
 
-        If the user has not been confirmed and does not have an email confirmation token,
-        generates a new token before saving.
+        Returns:
+            str: The URL, or an empty string if the user has no picture.
         """
-        if self.email_confirmation_token is None and not self.is_email_confirmed:
-            self.email_confirmation_token = self.generate_confirmation_token()
-            self.email_confirmation_sent_at = timezone.now()
-        super().save(*args, **kwargs)
+        if not self.profile_picture:
+            return ''
+        name = self.profile_picture.name
+        if variant in variant_sizes() and self.profile_picture_variants_for == name:
+            return self.profile_picture.storage.url(variant_name(name, variant))
+        return self.profile_picture.url
+
+    @property
+    def profile_picture_urls(self):
+        """Variant name to URL, for templates, e.g. ``user.profile_picture_urls.medium``."""
+        return {variant: self.profile_picture_url(variant) for variant in variant_sizes()}
+
+    def has_perm(self, perm, obj=None):
+        """Active superusers have every permission; there are no per-user permissions."""
+        return self.is_active and self.is_superuser
+
+    def has_module_perms(self, app_label):
+        """Active superusers can access every app in the admin."""
+        return self.is_active and self.is_superuser
+
+    class Meta:
+        verbose_name = 'User'
+        verbose_name_plural = 'Users'
+        db_table = 'user'
+        constraints = [
+            models.UniqueConstraint(
+                Lower('email'),
+                name='user_email_lower_uniq',
+                violation_error_message=_('A user with that email already exists.'),
+            ),
+        ]
+        indexes = [
+            # Partial indexes for the admin list filters. Each covers the minority
+            # side of its flag and is ordered like the changelist (-pk).
+            models.Index(fields=['-uid'], name='user_inactive_idx', condition=models.Q(is_active=False)),
+            models.Index(fields=['-uid'], name='user_staff_idx', condition=models.Q(is_staff=True)),
+            models.Index(fields=['-uid'], name='user_unconfirmed_idx', condition=models.Q(is_email_confirmed=False)),
+        ]
+
+
+class UserShardDirectory(models.Model):
+    """
+    Maps each lowercased email to its user, so a login by email can go straight
+    to the right shard. Lives on the default database and is only maintained
+    when ``USER_SHARDS`` lists more than one database.
+    """
+    user_uid = models.UUIDField(primary_key=True)
+    email = models.EmailField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.email
+
+    class Meta:
+        verbose_name = 'User shard directory entry'
+        verbose_name_plural = 'User shard directory'
+        db_table = 'user_shard_directory'
+
+
+class EmailOutbox(BaseModel):
+    """
+    A queued outgoing email.
+
+    Requests only insert rows into this table; the ``run_email_worker`` management
+    command drains them in batches over a single SMTP connection, retrying failed
+    sends with exponential backoff.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SENT = 'sent', _('Sent')
+        FAILED = 'failed', _('Failed')
+
+    to_email = models.EmailField(max_length=255)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.subject} -> {self.to_email}'
+
+    class Meta:
+        verbose_name = 'Email outbox message'
+        verbose_name_plural = 'Email outbox'
+        db_table = 'email_outbox'
+        indexes = [
+            # Only pending rows are ever polled by the worker.
+            models.Index(
+                fields=['next_attempt_at'],
+                name='email_outbox_due_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
@@ -1,17 +1,21 @@
 import logging
-from django.core.mail import send_mail
-from django.core.exceptions import ObjectDoesNotExist, ImproperlyConfigured
+from contextlib import nullcontext
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.exceptions import ObjectDoesNotExist, ImproperlyConfigured, ValidationError
+from django.db import router, transaction
 from django.urls import reverse
-from django.utils.crypto import get_random_string
 from django.utils import timezone
 from django.contrib.sites.shortcuts import get_current_site
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from charset_normalizer import from_bytes
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from blog_platform import settings
+from django.conf import settings
 from django.utils.encoding import force_bytes, force_str
-from user.models import User
+from user.backends import ainvalidate_cached_users, invalidate_cached_users
+from user.models import User, EmailOutbox
+from user.sharding import forget_user_email, is_sharded, shard_querysets
+from user.tokens import email_confirmation_token_generator
 
 logger = logging.getLogger(__name__)
 
@@ -23,32 +27,41 @@ class EmailService:
         None
 
     Methods:
-        send_confirmation_email(user): Sends an email confirmation to the specified user.
+        send_confirmation_email(user, request): Queues an email confirmation for the specified user.
         confirm_email(token, uid): Confirms the email address of the user with the specified token and user ID.
+        aconfirm_email(token, uid): Async version of confirm_email.
     """
     @staticmethod
-    def send_confirmation_email(user):
+    def send_confirmation_email(user, request=None):
+        """
+        Queues the confirmation email in the outbox instead of talking to SMTP inline.
+
+        Args:
+            user (User): The user to confirm.
+            request (HttpRequest): The current request, used to resolve the site domain.
+
+        Returns:
+            EmailOutbox: The queued message, or None on failure. The link only
+            ever leaves the server in the email.
+        """
         try:
-            # Generate a secure random token
-            token = get_random_string(length=32)
-            user.email_confirmation_token = token
-            user.email_confirmation_token_expires = timezone.now() + timezone.timedelta(days=1)
-            user.save()
+            # Generate a signed token; nothing is stored on the user row
+            token = email_confirmation_token_generator.make_token(user)
 
             # Get the current site configuration
             try:
-                current_site = get_current_site(None)
+                current_site = get_current_site(request)
             except ImproperlyConfigured as e:
                 logger.error(f"Failed to get current site configuration: {e}")
                 return
 
             # Generate the email confirmation link
-            protocol = current_site.scheme or 'http'
+            protocol = getattr(current_site, 'scheme', None) or 'http'
             domain = current_site.domain
             uid = urlsafe_base64_encode(force_bytes(user.pk))
             token_url = f'{protocol}://{domain}{reverse("user:confirm_email", args=[uid, token])}'
 
-            # Send the email
+            # Queue the email; the outbox worker delivers it
             subject = 'Confirm your email address'
             message = render_to_string(
                 'user/confirm_email.html', {
@@ -60,36 +73,269 @@ class EmailService:
                 }
             )
             plain_message = strip_tags(message)
-            try:
-                send_mail(
-                    subject,
-                    plain_message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [user.email],
-                    html_message=message,
-                )
-            except Exception as e:
-                logger.error(f"Failed to send email confirmation to {user.email}: {e}")
-                return
+            return EmailOutboxService.enqueue(subject, plain_message, user.email, html_body=message)
         except Exception as e:
             logger.error(f"An error occurred while sending email confirmation: {e}")
 
     @staticmethod
     def confirm_email(token, uid):
+        """
+        Confirms the email address of the user the token was issued for.
+
+        The token is verified from its signature alone; the only query is the UPDATE
+        that confirms and activates the account. It matches no row when the email
+        changed since the token was issued or the address is already confirmed.
+
+        Args:
+            token (str): The signed token from the confirmation link.
+            uid (str): The base64 encoded user primary key from the confirmation link.
+
+        Returns:
+            bool: True if the email address was confirmed.
+        """
         try:
-            # Decode the token
+            # Decode the user ID
             uid = force_str(urlsafe_base64_decode(uid))
-            # Get the user by the decoded UID
-            user = User.objects.get(pk=uid)
+            claims = email_confirmation_token_generator.check_token(token)
+            if claims is None or claims[0] != uid:
+                return False
             # Confirm the user
-            if user.email_confirmation_token == token and user.email_confirmation_token_expires > timezone.now():
-                # Confirm the user
-                user.is_email_confirmed = True
-                # Clear the token
-                user.email_confirmation_token = None
-                user.email_confirmation_token_expires = None
-                user.save()
-                return True
-        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-            # Handle errors, such as invalid token or user not found
-            return False
\ No newline at end of file
+            queryset = User.objects.for_uid(uid).filter(pk=uid, email=claims[1], is_email_confirmed=False)
+            updated = queryset.update(
+                is_email_confirmed=True,
+                is_active=True,
+                updated_at=timezone.now(),
+            )
+            if updated:
+                invalidate_cached_users([uid], using=queryset.db)
+            return updated == 1
+        except (TypeError, ValueError, OverflowError, ValidationError):
+            # Handle errors, such as a malformed user ID
+            return False
+
+    @staticmethod
+    async def aconfirm_email(token, uid):
+        """
+        Async version of ``confirm_email`` using the async ORM.
+        """
+        try:
+            uid = force_str(urlsafe_base64_decode(uid))
+            claims = email_confirmation_token_generator.check_token(token)
+            if claims is None or claims[0] != uid:
+                return False
+            updated = await User.objects.for_uid(uid).filter(pk=uid, email=claims[1], is_email_confirmed=False).aupdate(
+                is_email_confirmed=True,
+                is_active=True,
+                updated_at=timezone.now(),
+            )
+            if updated:
+                await ainvalidate_cached_users([uid])
+            return updated == 1
+        except (TypeError, ValueError, OverflowError, ValidationError):
+            return False
+
+class RegistrationService:
+    """
+    A service class for creating new accounts.
+
+    Methods:
+        register(user, request): Inserts the user and queues its confirmation email.
+    """
+    @staticmethod
+    def register(user, request=None):
+        """
+        Inserts the new user and its confirmation email in one transaction.
+
+        The user row is inserted exactly once, inactive, with the confirmation
+        timestamp set, and the outbox row is inserted with it. When users are
+        sharded the user's shard and the outbox database each get a transaction:
+        the shard commits first, so no email is ever queued for a user that was
+        not saved, and the user is deleted again if the outbox then fails to
+        commit. The email directory entry the insert reserved is released
+        whenever the user does not end up saved.
+
+        Args:
+            user (User): An unsaved user whose password is already hashed.
+            request (HttpRequest): The current request, used to build the confirmation link.
+
+        Returns:
+            User: The saved user.
+        """
+        shard = router.db_for_write(User, instance=user)
+        outbox = router.db_for_write(EmailOutbox)
+        saved = False
+        try:
+            with transaction.atomic(using=outbox) if outbox != shard else nullcontext():
+                with transaction.atomic(using=shard):
+                    user.is_active = False
+                    user.email_confirmation_sent_at = timezone.now()
+                    user.save(force_insert=True)
+                    logger.info(f"User created with username: {user.username}")
+
+                    if EmailService.send_confirmation_email(user, request) is None:
+                        raise RuntimeError(f"Could not queue the confirmation email for {user.email}")
+                saved = shard != outbox
+        except Exception:
+            if saved:
+                User.objects.using(shard).filter(pk=user.pk).delete()
+            if is_sharded():
+                forget_user_email(user.pk, user.email)
+            raise
+        return user
+
+
+class EmailOutboxService:
+    """
+    A service class for the durable email outbox.
+
+    Messages are written to the ``EmailOutbox`` table by request handlers and sent
+    later by the ``run_email_worker`` management command.
+
+    Methods:
+        enqueue(subject, body, to_email, html_body): Queues a message for delivery.
+        process_batch(connection, batch_size): Sends one batch of due messages.
+        retry_delay(attempts): Returns the backoff delay for the given attempt number.
+    """
+    @staticmethod
+    def enqueue(subject, body, to_email, html_body=''):
+        return EmailOutbox.objects.create(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            html_body=html_body,
+        )
+
+    @staticmethod
+    def retry_delay(attempts):
+        base = getattr(settings, 'EMAIL_OUTBOX_RETRY_BACKOFF', 60)
+        ceiling = getattr(settings, 'EMAIL_OUTBOX_RETRY_BACKOFF_MAX', 3600)
+        return timezone.timedelta(seconds=min(base * 2 ** (attempts - 1), ceiling))
+
+    @staticmethod
+    def process_batch(connection=None, batch_size=None):
+        """
+        Sends one batch of due messages over a single mail connection.
+
+        Rows are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several workers
+        can drain the outbox concurrently without sending a message twice.
+
+        The connection is only opened once due messages were claimed, so polling
+        an empty outbox never talks to the mail server.
+
+        Args:
+            connection: A mail backend connection to reuse, opened here if needed.
+                A new one is created and closed around the batch when omitted.
+            batch_size (int): Maximum number of messages to send.
+
+        Returns:
+            tuple: The number of messages sent and the number that failed.
+        """
+        batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 100)
+        max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        owns_connection = connection is None
+        if owns_connection:
+            connection = get_connection()
+
+        sent = failed = 0
+        try:
+            with transaction.atomic():
+                messages = list(
+                    EmailOutbox.objects.select_for_update(skip_locked=True)
+                    .filter(status=EmailOutbox.Status.PENDING, next_attempt_at__lte=timezone.now())
+                    .order_by('next_attempt_at')[:batch_size]
+                )
+                if not messages:
+                    return 0, 0
+                # Failing to connect rolls the claim back; the worker retries later
+                connection.open()
+                for outbox_message in messages:
+                    email = EmailMultiAlternatives(
+                        outbox_message.subject,
+                        outbox_message.body,
+                        settings.DEFAULT_FROM_EMAIL,
+                        [outbox_message.to_email],
+                        connection=connection,
+                    )
+                    if outbox_message.html_body:
+                        email.attach_alternative(outbox_message.html_body, 'text/html')
+                    outbox_message.attempts += 1
+                    try:
+                        connection.send_messages([email])
+                    except Exception as e:
+                        logger.error(f"Failed to send email to {outbox_message.to_email}: {e}")
+                        outbox_message.last_error = str(e)
+                        if outbox_message.attempts >= max_attempts:
+                            outbox_message.status = EmailOutbox.Status.FAILED
+                        else:
+                            outbox_message.next_attempt_at = timezone.now() + EmailOutboxService.retry_delay(
+                                outbox_message.attempts
+                            )
+                        failed += 1
+                    else:
+                        outbox_message.status = EmailOutbox.Status.SENT
+                        outbox_message.sent_at = timezone.now()
+                        outbox_message.last_error = ''
+                        sent += 1
+                EmailOutbox.objects.bulk_update(
+                    messages,
+                    ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+                )
+        finally:
+            if owns_connection:
+                connection.close()
+        return sent, failed
+
+
+class UserModerationService:
+    """
+    A service class for moderating many users at once.
+
+    Work is split into primary-key chunks, each applied with a single UPDATE or
+    DELETE in its own short transaction. Row locks are only held for one chunk at a
+    time, and model ``save()``/``delete()`` hooks are not run per user. Querysets
+    not pinned to a database cover every user shard.
+
+    Methods:
+        bulk_update(queryset, chunk_size, **values): Updates the users in chunks.
+        bulk_delete(queryset, chunk_size): Deletes the users in chunks.
+    """
+    @staticmethod
+    def _pk_chunks(queryset, chunk_size):
+        """
+        Yields lists of primary keys using keyset pagination, so each chunk is an
+        index range scan no matter how far into the queryset it is.
+        """
+        chunk_size = chunk_size or getattr(settings, 'USER_MODERATION_CHUNK_SIZE', 1000)
+        ordered = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            page = ordered if last_pk is None else ordered.filter(pk__gt=last_pk)
+            pks = list(page.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return
+            yield pks
+            last_pk = pks[-1]
+
+    @staticmethod
+    def bulk_update(queryset, chunk_size=None, **values):
+        values.setdefault('updated_at', timezone.now())
+        updated = 0
+        for shard_queryset in shard_querysets(queryset):
+            db = shard_queryset.db
+            manager = queryset.model._default_manager.db_manager(db)
+            for pks in UserModerationService._pk_chunks(shard_queryset, chunk_size):
+                with transaction.atomic(using=db):
+                    updated += manager.filter(pk__in=pks).update(**values)
+                    invalidate_cached_users(pks, using=db)
+        return updated
+
+    @staticmethod
+    def bulk_delete(queryset, chunk_size=None):
+        deleted = 0
+        for shard_queryset in shard_querysets(queryset):
+            db = shard_queryset.db
+            manager = queryset.model._default_manager.db_manager(db)
+            for pks in UserModerationService._pk_chunks(shard_queryset, chunk_size):
+                with transaction.atomic(using=db):
+                    deleted += manager.filter(pk__in=pks).delete()[1].get(queryset.model._meta.label, 0)
+        return deleted
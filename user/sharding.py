@@ -0,0 +1,160 @@
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+# Low 64 bits of a UUIDv7, which are random rather than timestamp bits
+_HASH_MASK = (1 << 64) - 1
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+def _directory_key(email):
+    return f'user:shard:{email.lower()}'
+
+
+def user_shards():
+    """Returns the database aliases holding the ``user`` table, in shard order."""
+    return getattr(settings, 'USER_SHARDS', ['default'])
+
+
+def is_sharded():
+    return len(user_shards()) > 1
+
+
+def shard_querysets(queryset):
+    """
+    Returns the user ``queryset`` once per shard, for work that has to cover
+    every user. A queryset already pinned to a database with ``using()`` is
+    returned as is.
+    """
+    if not is_sharded() or queryset._db is not None:
+        return [queryset]
+    return [queryset.using(alias) for alias in user_shards()]
+
+
+def jump_hash(key, num_buckets):
+    """
+    Jump consistent hash (Lamping & Veach). Growing from n to n + 1 buckets only
+    moves about 1 / (n + 1) of the keys, all of them into the new bucket.
+    """
+    bucket, candidate = -1, 0
+    while candidate < num_buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & _HASH_MASK
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_uid(uid):
+    """
+    Returns the alias of the shard that owns the user with the given primary key.
+
+    Raises:
+        ValueError: If ``uid`` is not a valid UUID.
+    """
+    shards = user_shards()
+    if len(shards) == 1:
+        return shards[0]
+    if not isinstance(uid, uuid.UUID):
+        uid = uuid.UUID(str(uid))
+    return shards[jump_hash(uid.int & _HASH_MASK, len(shards))]
+
+
+def uid_for_email(email):
+    """
+    Looks the email up in the email→user directory, through the cache.
+
+    Returns:
+        str: The owning user's primary key, or None if no user has that email.
+    """
+    key = _directory_key(email)
+    uid = _cache().get(key)
+    if uid is None:
+        directory = apps.get_model('user', 'UserShardDirectory')
+        uid = directory.objects.filter(email=email.lower()).values_list('user_uid', flat=True).first()
+        if uid is None:
+            return None
+        uid = str(uid)
+        _cache().set(key, uid, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+    return uid
+
+
+def reserve_user_email(uid, email):
+    """
+    Claims ``email`` for a new user before it is inserted on its shard, in a
+    transaction of its own: the shard's commit can't be undone from here, so a
+    duplicate email has to fail first.
+
+    Raises:
+        IntegrityError: If another user has the email.
+    """
+    directory = apps.get_model('user', 'UserShardDirectory')
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        directory.objects.using(DEFAULT_DB_ALIAS).create(user_uid=uid, email=email.lower())
+
+
+def record_user_email(uid, email, old_email=None):
+    """
+    Points the directory entry for ``email`` at the user, replacing their
+    ``old_email``.
+
+    Raises:
+        IntegrityError: If another user has the email.
+    """
+    directory = apps.get_model('user', 'UserShardDirectory')
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        directory.objects.using(DEFAULT_DB_ALIAS).update_or_create(user_uid=uid, defaults={'email': email.lower()})
+    if old_email:
+        _cache().delete(_directory_key(old_email))
+    _cache().set(_directory_key(email), str(uid), getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+
+
+def forget_user_email(uid, email):
+    directory = apps.get_model('user', 'UserShardDirectory')
+    directory.objects.filter(user_uid=uid).delete()
+    _cache().delete(_directory_key(email))
+
+
+class UserShardRouter:
+    """
+    Routes ``User`` rows to the shard chosen by a hash of their primary key.
+
+    Queries that know their user go through ``User.objects.for_uid()`` or
+    ``for_email()``, which pin the queryset to one shard. Saves and deletes of a
+    loaded instance are routed here by its primary key. Every other model, and
+    unscoped user queries, fall through to the next router. With a single shard
+    the router does nothing at all.
+    """
+
+    def _user_instance(self, model, hints):
+        if not is_sharded() or model._meta.label != settings.AUTH_USER_MODEL:
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, model) and instance.pk is not None:
+            return instance
+        return None
+
+    def db_for_read(self, model, **hints):
+        instance = self._user_instance(model, hints)
+        if instance is None:
+            return None
+        return instance._state.db or shard_for_uid(instance.pk)
+
+    def db_for_write(self, model, **hints):
+        instance = self._user_instance(model, hints)
+        return shard_for_uid(instance.pk) if instance is not None else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not is_sharded():
+            return None
+        shards = user_shards()
+        if f'{app_label}.{model_name}' == settings.AUTH_USER_MODEL.lower():
+            return db in shards
+        if db in shards and db != 'default':
+            return False
+        return None
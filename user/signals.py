@@ -0,0 +1,73 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import MediaBlob
+
+from user.backends import invalidate_cached_users
+from user.images import schedule_variants
+from user.models import User
+from user.sharding import forget_user_email, is_sharded, shard_for_uid
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, using, **kwargs):
+    """
+    Retires the cached projection whenever a user is saved (including password
+    changes) or deleted, once the write commits.
+    """
+    invalidate_cached_users([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=User)
+def forget_user_shard(sender, instance, **kwargs):
+    # Only the copy on the user's own shard owns the directory entry, so the
+    # rebalancing command can delete moved copies without losing it.
+    if is_sharded() and instance._state.db == shard_for_uid(instance.pk):
+        forget_user_email(instance.pk, instance.email)
+
+
+@receiver(post_save, sender=User)
+def generate_profile_picture_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    Queues the resized variants of a profile picture they haven't been marked
+    generated for.
+    """
+    picture = instance.profile_picture
+    if not picture or (update_fields is not None and 'profile_picture' not in update_fields):
+        return
+    if instance.profile_picture_variants_for != picture.name:
+        schedule_variants(picture.name, using=instance._state.db, uid=instance.pk)
+
+
+@receiver(post_save, sender=User)
+def count_profile_picture_references(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Moves the storage reference from the previous profile picture to the new one,
+    so shared content-addressed files are only garbage collected once unused.
+    """
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    if created:
+        old = ''
+    elif hasattr(instance, '_loaded_profile_picture'):
+        old = instance._loaded_profile_picture or ''
+    else:
+        # Loaded without the picture column; the previous value is unknown
+        return
+    new = instance.profile_picture.name or ''
+    if old != new:
+        if new:
+            MediaBlob.objects.acquire(new)
+        if old:
+            MediaBlob.objects.release(old)
+    instance._loaded_profile_picture = new
+
+
+@receiver(post_delete, sender=User)
+def release_profile_picture(sender, instance, **kwargs):
+    # Copies removed by rebalance_user_shards still live on in another shard
+    if is_sharded() and instance._state.db != shard_for_uid(instance.pk):
+        return
+    if instance.profile_picture:
+        MediaBlob.objects.release(instance.profile_picture.name)
@@ -0,0 +1,96 @@
+import json
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from user.models import User
+
+
+class UserAdminExportTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        self.user = User.objects.create_user(email='test@example.com', username='testuser', password='password123')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:user_user_changelist')
+
+    def _run_action(self, action):
+        return self.client.post(self.url, {'action': action, '_selected_action': [str(self.user.pk)]})
+
+    def test_export_as_csv_streams(self):
+        response = self._run_action('export_as_csv')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('uid,username,email'))
+        self.assertIn('test@example.com', lines[1])
+        self.assertNotIn('pbkdf2', lines[1])
+
+    def test_export_as_jsonl_streams(self):
+        response = self._run_action('export_as_jsonl')
+
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['test@example.com'])
+        self.assertNotIn('password', rows[0])
+
+
+class UserAdminChangelistTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        self.client.force_login(self.admin)
+
+    def test_changelist_counts_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:user_user_changelist'), {'is_active__exact': '0'})
+
+        self.assertEqual(response.status_code, 200)
+        counts = [q['sql'] for q in queries if 'COUNT(' in q['sql'] and 'FROM "user"' in q['sql']]
+        self.assertEqual(len(counts), 1)
+
+
+@override_settings(USER_MODERATION_CHUNK_SIZE=2)
+class UserAdminModerationTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='password123')
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='password123')
+            for i in range(5)
+        ]
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:user_user_changelist')
+
+    def _run_action(self, action, **extra):
+        data = {'action': action, '_selected_action': [str(user.pk) for user in self.users], **extra}
+        return self.client.post(self.url, data)
+
+    def test_deactivate_and_activate_users(self):
+        self._run_action('deactivate_users')
+        self.assertEqual(User.objects.filter(is_active=False).count(), 5)
+
+        self._run_action('activate_users')
+        self.assertEqual(User.objects.filter(is_active=False).count(), 0)
+        self.assertTrue(User.objects.get(pk=self.admin.pk).is_active)
+
+    def test_confirm_emails(self):
+        self._run_action('confirm_emails')
+        self.assertEqual(User.objects.filter(is_email_confirmed=True).count(), 5)
+
+    def test_updates_run_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._run_action('deactivate_users')
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "user"')]
+        self.assertEqual(len(updates), 3)
+
+    def test_delete_selected_deletes_in_chunks(self):
+        response = self._run_action('delete_selected', post='yes')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(User.objects.all()), [self.admin])
@@ -0,0 +1,214 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import urlsafe_base64_encode
+
+from user.async_views import AsyncEmailConfirmationView, AsyncLoginView, AsyncProfileView, AsyncRegistrationView
+from user.models import EmailOutbox, User
+from user.tokens import email_confirmation_token_generator
+
+
+class AsyncViewTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.THROTTLE_CACHE_ALIAS].clear()
+        self.factory = AsyncRequestFactory()
+
+    def _prepare(self, request, user=None):
+        # Like the test client; views parsing uploads run the CSRF check themselves
+        request._dont_enforce_csrf_checks = True
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        request.user = user or AnonymousUser()
+
+        async def auser():
+            return request.user
+
+        request.auser = auser
+        return request
+
+
+class AsyncRegistrationViewTest(AsyncViewTestCase):
+
+    async def test_registration(self):
+        request = self._prepare(self.factory.post(reverse('user:register'), {
+            'username': 'testuser',
+            'email': 'test@example.com',
+            'password': 'password123',
+            'password_confirm': 'password123',
+        }))
+
+        response = await AsyncRegistrationView.as_view()(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], reverse('user:confirmation_sent'))
+        user = await User.objects.aget(email='test@example.com')
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password('password123'))
+        self.assertEqual(await EmailOutbox.objects.filter(to_email='test@example.com').acount(), 1)
+
+    async def test_invalid_registration(self):
+        request = self._prepare(self.factory.post(reverse('user:register'), {
+            'username': 'testuser',
+            'email': 'test@example.com',
+            'password': 'password123',
+            'password_confirm': 'other',
+        }))
+
+        response = await AsyncRegistrationView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await User.objects.aexists())
+
+
+class AsyncLoginViewTest(AsyncViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='test@example.com', username='testuser', password='password123')
+
+    async def test_login(self):
+        request = self._prepare(self.factory.post(
+            reverse('user:login'), {'username': 'test@example.com', 'password': 'password123'}
+        ))
+
+        response = await AsyncLoginView.as_view()(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('user:profile'))
+        self.assertEqual(request.session[SESSION_KEY], str(self.user.pk))
+
+    async def test_wrong_password(self):
+        request = self._prepare(self.factory.post(
+            reverse('user:login'), {'username': 'test@example.com', 'password': 'wrongpassword'}
+        ))
+
+        response = await AsyncLoginView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(SESSION_KEY, request.session)
+
+    async def test_unknown_email(self):
+        request = self._prepare(self.factory.post(
+            reverse('user:login'), {'username': 'missing@example.com', 'password': 'password123'}
+        ))
+
+        response = await AsyncLoginView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncProfileViewTest(AsyncViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email='test@example.com', username='testuser', password='password123', bio='Async bio'
+        )
+
+    async def test_profile(self):
+        request = self._prepare(self.factory.get(reverse('user:profile')), user=self.user)
+
+        response = await AsyncProfileView.as_view()(request)
+
+        self.assertContains(response, 'Async bio')
+
+    async def test_anonymous_redirects_to_login(self):
+        request = self._prepare(self.factory.get(reverse('user:profile')))
+
+        response = await AsyncProfileView.as_view()(request)
+
+        self.assertEqual(response.status_code, 302)
+
+
+class AsyncEmailConfirmationViewTest(AsyncViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email='test@example.com', username='testuser', password='password123', is_active=False
+        )
+        self.uid = urlsafe_base64_encode(str(self.user.pk).encode('utf-8'))
+
+    async def test_confirmation(self):
+        token = email_confirmation_token_generator.make_token(self.user)
+        request = self._prepare(self.factory.get(reverse('user:confirm_email', args=[self.uid, token])))
+
+        response = await AsyncEmailConfirmationView.as_view()(request, uid=self.uid, token=token)
+
+        self.assertEqual(response.url, reverse('user:email_confirmed'))
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertTrue(user.is_email_confirmed)
+        self.assertTrue(user.is_active)
+
+    async def test_invalid_token(self):
+        request = self._prepare(self.factory.get('/'))
+
+        response = await AsyncEmailConfirmationView.as_view()(request, uid=self.uid, token='invalid')
+
+        self.assertEqual(response.url, reverse('user:invalid_token'))
+
+
+def load_user_and_session(request):
+    """A context processor reading what the auth and messages processors expose lazily."""
+    return {'logged_in': request.user.is_authenticated, 'session_keys': list(request.session.keys())}
+
+
+@override_settings(TEMPLATES=[{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            *settings.TEMPLATES[0]['OPTIONS']['context_processors'],
+            f'{__name__}.load_user_and_session',
+        ],
+    },
+}])
+class AsyncViewRenderingTest(AsyncViewTestCase):
+    """
+    Renders each page with the real session and lazy ``request.user`` and an
+    empty cache, so the context processors have to query the database.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='test@example.com', username='testuser', password='password123')
+        self.client.force_login(self.user)
+        self.session_key = self.client.session.session_key
+
+    def _request(self, request, logged_in=True):
+        # As SessionMiddleware, AuthenticationMiddleware and MessageMiddleware set them up
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(
+            self.session_key if logged_in else None
+        )
+        request._dont_enforce_csrf_checks = True
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        MessageMiddleware(lambda request: None).process_request(request)
+        cache.clear()
+        return request
+
+    async def test_pages_render_with_an_empty_cache(self):
+        pages = [
+            (AsyncProfileView, self.factory.get(reverse('user:profile'))),
+            (AsyncRegistrationView, self.factory.get(reverse('user:register'))),
+            (AsyncRegistrationView, self.factory.post(reverse('user:register'), {'username': 'x'})),
+            (AsyncLoginView, self.factory.get(reverse('user:login'))),
+            (AsyncLoginView, self.factory.post(reverse('user:login'), {'username': 'x', 'password': 'y'})),
+            (AsyncEmailConfirmationView, self.factory.get(reverse('user:invalid_token'))),
+        ]
+        for view, request in pages:
+            with self.subTest(view=view.__name__, method=request.method):
+                response = await view.as_view()(self._request(request))
+                self.assertEqual(response.status_code, 200)
+
+    async def test_profile_renders_the_logged_in_user(self):
+        response = await AsyncProfileView.as_view()(self._request(self.factory.get(reverse('user:profile'))))
+
+        self.assertContains(response, 'testuser')
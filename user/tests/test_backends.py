@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from base.cache import _local_tiers
+from user.backends import CachedModelBackend, get_cached_user
+from user.models import User
+from user.services import UserModerationService
+
+
+class CachedModelBackendTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com', username='testuser', password='password123', bio='A long bio'
+        )
+
+    def test_get_user_is_cached(self):
+        backend = CachedModelBackend()
+        with self.assertNumQueries(1):
+            backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.user.pk)
+        self.assertEqual(user.email, 'test@example.com')
+        self.assertIn('bio', user.get_deferred_fields())
+
+    def test_save_invalidates_cache(self):
+        get_cached_user(self.user.pk)
+        self.user.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(get_cached_user(self.user.pk).username, 'renamed')
+
+    def test_password_change_invalidates_cache(self):
+        get_cached_user(self.user.pk)
+        self.user.set_password('newpassword123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertTrue(get_cached_user(self.user.pk).check_password('newpassword123'))
+
+    def test_password_is_not_cached(self):
+        get_cached_user(self.user.pk)
+        # The local tier holds a pickled copy of everything written to the shared one
+        for _, pickled in _local_tiers[settings.CACHES['default']['LOCATION']].values():
+            self.assertNotIn(self.user.password.encode(), pickled)
+        with self.assertNumQueries(0):
+            user = get_cached_user(self.user.pk)
+            self.assertTrue(user.has_usable_password())
+            self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_invalidation_reaches_other_processes(self):
+        get_cached_user(self.user.pk)
+        # Another worker's local tier still holds the entry after the write
+        local = dict(_local_tiers[settings.CACHES['default']['LOCATION']])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'renamed'
+            self.user.save(update_fields=['username'])
+        _local_tiers[settings.CACHES['default']['LOCATION']].update(local)
+
+        self.assertEqual(get_cached_user(self.user.pk).username, 'renamed')
+
+    def test_bulk_update_invalidates_cache(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserModerationService.bulk_update(User.objects.filter(pk=self.user.pk), is_active=False)
+
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+    def test_invalidation_waits_for_commit(self):
+        get_cached_user(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.username = 'renamed'
+            self.user.save()
+            # Until the commit, a concurrent read could cache the old row again
+            self.assertEqual(get_cached_user(self.user.pk).username, 'testuser')
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_cached_user(self.user.pk).username, 'renamed')
+
+    def test_profile_page_makes_no_queries_when_warm(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('user:profile'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user:profile'))
+
+        self.assertContains(response, 'A long bio')
@@ -0,0 +1,147 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from user.management.commands.seed import copy_text_line
+from user.models import EmailOutbox, User
+
+
+class ImportUsersCommandTest(TestCase):
+
+    def _write(self, suffix, content):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        handle.write(content)
+        handle.close()
+        self.addCleanup(os.unlink, handle.name)
+        return handle.name
+
+    def test_import_csv(self):
+        path = self._write('.csv', (
+            'email,username,password,bio,is_staff\n'
+            'One@EXAMPLE.com,one,password123,First,true\n'
+            'two@example.com,two,,Second,\n'
+            ',missing-email,password123,,\n'
+            'not-an-email,invalid-email,password123,,\n'
+        ))
+        out = StringIO()
+
+        call_command('import_users', path, workers=0, chunk_size=2, stdout=out)
+
+        self.assertEqual(User.objects.count(), 2)
+        one = User.objects.get(username='one')
+        self.assertEqual(one.email, 'one@example.com')
+        self.assertTrue(one.check_password('password123'))
+        self.assertTrue(one.is_staff)
+        self.assertFalse(User.objects.get(username='two').has_usable_password())
+        self.assertIn('Imported 2 users', out.getvalue())
+        self.assertIn('skipped 2 invalid rows', out.getvalue())
+
+    def test_import_jsonl_with_process_pool(self):
+        path = self._write('.jsonl', '\n'.join(
+            json.dumps({'email': f'user{i}@example.com', 'username': f'user{i}', 'password': 'password123'})
+            for i in range(5)
+        ))
+
+        call_command('import_users', path, workers=2, chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(User.objects.count(), 5)
+        self.assertTrue(User.objects.get(username='user4').check_password('password123'))
+
+    def test_import_ignore_conflicts(self):
+        User.objects.create_user(email='one@example.com', username='one', password='password123')
+        path = self._write('.csv', 'email,username,password\nOne@example.com,one,other\nthree@example.com,three,\n')
+        out = StringIO()
+
+        call_command('import_users', path, workers=0, ignore_conflicts=True, stdout=out)
+
+        self.assertEqual(User.objects.count(), 2)
+        self.assertTrue(User.objects.get(username='one').check_password('password123'))
+        self.assertIn('Imported 1 users', out.getvalue())
+        self.assertIn('1 already existed', out.getvalue())
+
+
+class ExportUsersCommandTest(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            User.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='password123')
+
+    def test_export_csv_to_stdout(self):
+        out = StringIO()
+
+        call_command('export_users', chunk_size=2, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('uid,username,email'))
+
+    def test_export_csv_escapes_formulas(self):
+        User.objects.create_user(email='formula@example.com', username='formula', bio='=HYPERLINK("http://x")')
+        User.objects.create_user(email='plus@example.com', username='plus', bio='+1 555')
+        out = StringIO()
+
+        call_command('export_users', stdout=out)
+
+        bios = {row['username']: row['bio'] for row in csv.DictReader(StringIO(out.getvalue()))}
+        self.assertEqual(bios['formula'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(bios['plus'], "'+1 555")
+        self.assertEqual(bios['user0'], '')
+
+    def test_export_jsonl_to_file(self):
+        handle = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        handle.close()
+        self.addCleanup(os.unlink, handle.name)
+
+        call_command('export_users', format='jsonl', output=handle.name, stdout=StringIO())
+
+        with open(handle.name, encoding='utf-8') as exported:
+            rows = [json.loads(line) for line in exported]
+        self.assertEqual(sorted(row['username'] for row in rows), ['user0', 'user1', 'user2'])
+
+
+class SeedCommandTest(TestCase):
+
+    def _seed(self, *args):
+        call_command('seed', *args, stdout=StringIO())
+        return list(User.objects.order_by('pk').values_list('uid', 'username', 'bio', 'is_email_confirmed'))
+
+    def test_seed_is_deterministic(self):
+        first = self._seed('--users', '50', '--batch-size', '20')
+        self.assertEqual(len(first), 50)
+        self.assertEqual([row[1] for row in first], [f'seed{n:07d}' for n in range(50)])
+
+        call_command('seed', '--delete', stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+        self.assertEqual(self._seed('--users', '50', '--batch-size', '20'), first)
+
+    def test_seeded_users_can_log_in(self):
+        self._seed('--users', '5', '--password', 'secret-123')
+        user = User.objects.get_by_natural_key('SEED0000003@seed.example.invalid')
+        self.assertTrue(user.check_password('secret-123'))
+        self.assertEqual(len({user.password for user in User.objects.all()}), 1)
+
+    def test_unconfirmed_users_get_a_sent_email(self):
+        self._seed('--users', '40', '--unconfirmed', '0.5')
+        unconfirmed = set(User.objects.filter(is_email_confirmed=False).values_list('email', flat=True))
+        self.assertTrue(unconfirmed)
+        self.assertEqual(set(EmailOutbox.objects.values_list('to_email', flat=True)), unconfirmed)
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.Status.SENT).exists())
+
+    def test_copy_text_line_escapes_values(self):
+        created_at = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        line = copy_text_line([None, True, created_at, 'tab\there\nnew \\ line', 7])
+        self.assertEqual(line, '\\N\tt\t2024-01-01T00:00:00+00:00\ttab\\there\\nnew \\\\ line\t7\n')
+
+    def test_offset_appends(self):
+        self._seed('--users', '10')
+        rows = self._seed('--users', '10', '--offset', '10')
+        self.assertEqual(len(rows), 20)
+        # Keys stay in creation order
+        self.assertEqual([row[1] for row in rows], [f'seed{n:07d}' for n in range(20)])
@@ -1,92 +1,162 @@
+import re
+from io import StringIO
 from unittest.mock import patch, MagicMock
 from django.test import TestCase
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 from django.utils import timezone
-from django.core.mail import send_mail
-from user.models import User
-from user.services import EmailService
+from django.core import mail
+from django.core.management import call_command
+from user.models import User, EmailOutbox
+from user.services import EmailService, EmailOutboxService
+from user.tokens import email_confirmation_token_generator
 
 class EmailServiceTest(TestCase):
 
-    @patch('user.services.send_mail')
     @patch('user.services.get_current_site')
-    def test_send_confirmation_email(self, mock_get_current_site, mock_send_mail):
+    def test_send_confirmation_email(self, mock_get_current_site):
         # Set up the mock for current site
         mock_get_current_site.return_value = MagicMock(domain='example.com', scheme='http')
 
         # Create a mock user
         user = User(username='testuser', email='test@example.com')
-        user.email_confirmation_token = 'dummy-token'
-        user.email_confirmation_token_expires = timezone.now() + timezone.timedelta(days=1)
         user.save = MagicMock()  # Mock the save method
 
         # Call the method to be tested
-        EmailService.send_confirmation_email(user)
+        result = EmailService.send_confirmation_email(user)
 
-        # Check if send_mail was called
-        mock_send_mail.assert_called_once()
+        # The email is queued in the outbox instead of being sent inline
+        self.assertEqual(len(mail.outbox), 0)
+        outbox_message = EmailOutbox.objects.get()
+        self.assertEqual(outbox_message.to_email, 'test@example.com')
+        self.assertEqual(outbox_message.status, EmailOutbox.Status.PENDING)
+        self.assertEqual(outbox_message.subject, 'Confirm your email address')
+        self.assertEqual(result, outbox_message)
 
-        # Ensure that save was called on the user
-        user.save.assert_called_once()
-
-    @patch('user.models.User.objects.get')
-    def test_confirm_email(self, mock_get_user):
-        # Set up the mock user
-        user = User(username='testuser', email='test@example.com')
-        user.email_confirmation_token = 'dummy-token'
-        user.email_confirmation_token_expires = timezone.now() + timezone.timedelta(days=1)
-        user.save = MagicMock()
-        mock_get_user.return_value = user
+        # The token is stateless, so the user row is not written
+        user.save.assert_not_called()
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        token = re.search(rf'/confirm-email/{uid}/([^/]+)/', outbox_message.body).group(1)
+        self.assertEqual(email_confirmation_token_generator.check_token(token), (str(user.pk), user.email))
 
-        # Encode the user ID
+    def _create_user(self):
+        user = User.objects.create_user(email='test@example.com', username='testuser', password='password123')
         uid = urlsafe_base64_encode(str(user.pk).encode('utf-8'))
-        token = 'dummy-token'
+        return user, uid
 
-        # Call the method to be tested
-        EmailService.confirm_email(token, uid)
+    def test_confirm_email(self):
+        user, uid = self._create_user()
+        token = email_confirmation_token_generator.make_token(user)
+
+        # Only the confirming UPDATE hits the database
+        with self.assertNumQueries(1):
+            result = EmailService.confirm_email(token, uid)
 
-        # Check if the user’s email is confirmed
+        self.assertTrue(result)
+        user.refresh_from_db()
         self.assertTrue(user.is_email_confirmed)
-        user.save.assert_called_once()
 
-    @patch('user.models.User.objects.get')
-    def test_confirm_email_invalid_token(self, mock_get_user):
-        # Set up the mock user
-        user = User(username='testuser', email='test@example.com')
-        user.email_confirmation_token = 'correct-token'
-        user.email_confirmation_token_expires = timezone.now() + timezone.timedelta(days=1)
-        user.save = MagicMock()
-        mock_get_user.return_value = user
+    def test_confirm_email_invalid_token(self):
+        user, uid = self._create_user()
 
-        # Encode the user ID
-        uid = urlsafe_base64_encode(str(user.pk).encode('utf-8'))
-        invalid_token = 'wrong-token'
+        with self.assertNumQueries(0):
+            result = EmailService.confirm_email('wrong-token', uid)
 
-        # Call the method to be tested
-        result = EmailService.confirm_email(invalid_token, uid)
+        self.assertFalse(result)
+        user.refresh_from_db()
+        self.assertFalse(user.is_email_confirmed)
+
+    def test_confirm_email_token_for_other_user(self):
+        user, uid = self._create_user()
+        other = User.objects.create_user(email='other@example.com', username='other', password='password123')
+        token = email_confirmation_token_generator.make_token(other)
 
-        # Check if the user’s email is not confirmed
+        self.assertFalse(EmailService.confirm_email(token, uid))
+        user.refresh_from_db()
         self.assertFalse(user.is_email_confirmed)
-        self.assertFalse(result)
-        user.save.assert_not_called()
 
-    @patch('user.models.User.objects.get')
-    def test_confirm_email_token_expired(self, mock_get_user):
-        # Set up the mock user
-        user = User(username='testuser', email='test@example.com')
-        user.email_confirmation_token = 'correct-token'
-        user.email_confirmation_token_expires = timezone.now() - timezone.timedelta(days=1)
-        user.save = MagicMock()
-        mock_get_user.return_value = user
+    def test_confirm_email_after_email_change(self):
+        user, uid = self._create_user()
+        token = email_confirmation_token_generator.make_token(user)
+        User.objects.filter(pk=user.pk).update(email='changed@example.com')
 
-        # Encode the user ID
-        uid = urlsafe_base64_encode(str(user.pk).encode('utf-8'))
-        token = 'correct-token'
+        self.assertFalse(EmailService.confirm_email(token, uid))
 
-        # Call the method to be tested
-        result = EmailService.confirm_email(token, uid)
+    def test_confirm_email_token_expired(self):
+        user, uid = self._create_user()
+        token = email_confirmation_token_generator.make_token(user)
+
+        with self.settings(EMAIL_CONFIRMATION_TOKEN_MAX_AGE=-1):
+            result = EmailService.confirm_email(token, uid)
 
-        # Check if the user’s email is not confirmed
-        self.assertFalse(user.is_email_confirmed)
         self.assertFalse(result)
-        user.save.assert_not_called()
+        user.refresh_from_db()
+        self.assertFalse(user.is_email_confirmed)
+
+
+class EmailOutboxServiceTest(TestCase):
+
+    def setUp(self):
+        self.outbox_message = EmailOutboxService.enqueue('Subject', 'Body', 'test@example.com', html_body='<p>Body</p>')
+
+    def test_process_batch_sends_due_messages(self):
+        connection = MagicMock()
+        sent, failed = EmailOutboxService.process_batch(connection)
+
+        self.assertEqual((sent, failed), (1, 0))
+        connection.send_messages.assert_called_once()
+        self.outbox_message.refresh_from_db()
+        self.assertEqual(self.outbox_message.status, EmailOutbox.Status.SENT)
+        self.assertEqual(self.outbox_message.attempts, 1)
+        self.assertIsNotNone(self.outbox_message.sent_at)
+
+    def test_process_batch_skips_messages_not_yet_due(self):
+        EmailOutbox.objects.update(next_attempt_at=timezone.now() + timezone.timedelta(minutes=5))
+        connection = MagicMock()
+
+        self.assertEqual(EmailOutboxService.process_batch(connection), (0, 0))
+        connection.open.assert_not_called()
+        connection.send_messages.assert_not_called()
+
+    def test_process_batch_schedules_retry_with_backoff(self):
+        connection = MagicMock()
+        connection.send_messages.side_effect = OSError('relay unavailable')
+
+        sent, failed = EmailOutboxService.process_batch(connection)
+
+        self.assertEqual((sent, failed), (0, 1))
+        self.outbox_message.refresh_from_db()
+        self.assertEqual(self.outbox_message.status, EmailOutbox.Status.PENDING)
+        self.assertEqual(self.outbox_message.last_error, 'relay unavailable')
+        self.assertGreater(self.outbox_message.next_attempt_at, timezone.now())
+
+    def test_process_batch_gives_up_after_max_attempts(self):
+        EmailOutbox.objects.update(attempts=4)
+        connection = MagicMock()
+        connection.send_messages.side_effect = OSError('relay unavailable')
+
+        with self.settings(EMAIL_OUTBOX_MAX_ATTEMPTS=5):
+            EmailOutboxService.process_batch(connection)
+
+        self.outbox_message.refresh_from_db()
+        self.assertEqual(self.outbox_message.status, EmailOutbox.Status.FAILED)
+
+    def test_worker_retries_after_connection_failure(self):
+        connection = MagicMock()
+        connection.open.side_effect = [OSError('connection refused'), True]
+        # The second sleep ends the loop like Ctrl+C would
+        with patch('user.management.commands.run_email_worker.get_connection', return_value=connection), \
+                patch('user.management.commands.run_email_worker.time.sleep', side_effect=[None, KeyboardInterrupt]), \
+                self.assertLogs('user.management.commands.run_email_worker', 'ERROR'):
+            call_command('run_email_worker', stdout=StringIO())
+
+        self.assertEqual(connection.open.call_count, 2)
+        connection.send_messages.assert_called_once()
+        self.outbox_message.refresh_from_db()
+        self.assertEqual(self.outbox_message.status, EmailOutbox.Status.SENT)
+
+    def test_retry_delay_is_exponential_and_capped(self):
+        with self.settings(EMAIL_OUTBOX_RETRY_BACKOFF=60, EMAIL_OUTBOX_RETRY_BACKOFF_MAX=300):
+            self.assertEqual(EmailOutboxService.retry_delay(1).total_seconds(), 60)
+            self.assertEqual(EmailOutboxService.retry_delay(2).total_seconds(), 120)
+            self.assertEqual(EmailOutboxService.retry_delay(4).total_seconds(), 300)
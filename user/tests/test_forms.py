@@ -30,6 +30,17 @@ class RegistrationFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('password_confirm', form.errors)
 
+    def test_email_taken_in_other_case(self):
+        User.objects.create_user(email='test@example.com', username='existing', password='password123')
+        form = RegistrationForm(data={
+            'username': 'testuser',
+            'email': 'Test@Example.com',
+            'password': 'password123',
+            'password_confirm': 'password123',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('A user with that email already exists.', str(form.errors))
+
     def test_missing_fields(self):
         form_data = {
             'username': '',
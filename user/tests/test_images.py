@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from user.images import variant_name
+from user.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def jpeg_upload(name='avatar.jpg', size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    PROFILE_PICTURE_WORKERS=0,
+    PROFILE_PICTURE_VARIANTS={'small': 64, 'large': 256},
+)
+class ProfilePictureVariantTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def _create_user(self):
+        return User.objects.create_user(
+            email='pictures@example.com', username='pictures', password='password123',
+            profile_picture=jpeg_upload(),
+        )
+
+    @staticmethod
+    def _generation_callbacks(callbacks):
+        # Saves also queue the user's cache invalidation
+        return [callback for callback in callbacks if callback.__qualname__.startswith('schedule_variants')]
+
+    def test_variants_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self._create_user()
+        user.refresh_from_db()
+
+        storage = user.profile_picture.storage
+        with storage.open(variant_name(user.profile_picture.name, 'small')) as stream, Image.open(stream) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (64, 64))
+        self.assertTrue(user.profile_picture_url('large').endswith('.large.webp'))
+        self.assertLess(
+            storage.size(variant_name(user.profile_picture.name, 'large')),
+            storage.size(user.profile_picture.name),
+        )
+
+    def test_falls_back_to_original_until_generated(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            user = self._create_user()
+
+        self.assertEqual(len(self._generation_callbacks(callbacks)), 1)
+        self.assertEqual(user.profile_picture_url('small'), user.profile_picture.url)
+        self.assertEqual(user.profile_picture_urls, {'small': user.profile_picture.url, 'large': user.profile_picture.url})
+
+    def test_saves_without_picture_change_queue_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self._create_user()
+        user.refresh_from_db()
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.bio = 'Updated'
+            user.save(update_fields=['bio', 'updated_at'])
+            user.save()
+        self.assertEqual(self._generation_callbacks(callbacks), [])
+
+    def test_urls_do_not_check_the_storage(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self._create_user()
+        user.refresh_from_db()
+
+        self.assertEqual(user.profile_picture_variants_for, user.profile_picture.name)
+        with patch.object(user.profile_picture.storage, 'exists') as exists:
+            urls = user.profile_picture_urls
+        exists.assert_not_called()
+        self.assertTrue(urls['small'].endswith('.small.webp'))
+
+    def test_picture_changed_before_generation_is_not_marked(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            user = self._create_user()
+        User.objects.filter(pk=user.pk).update(profile_picture='media/other.jpg')
+
+        for callback in self._generation_callbacks(callbacks):
+            callback()
+
+        user.refresh_from_db()
+        self.assertEqual(user.profile_picture_variants_for, '')
+
+    def test_no_picture(self):
+        user = User.objects.create_user(email='plain@example.com', username='plain', password='password123')
+        self.assertEqual(user.profile_picture_url('small'), '')
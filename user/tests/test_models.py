@@ -1,9 +1,7 @@
+from django.db import IntegrityError
 from django.test import TestCase
-from django.utils.http import urlsafe_base64_decode
-from django.utils.encoding import force_bytes
-from django.utils import timezone
 from user.models import User
-import uuid
+from user.tokens import email_confirmation_token_generator
 
 class UserModelTest(TestCase):
 
@@ -22,34 +20,33 @@ class UserModelTest(TestCase):
         self.assertEqual(user.email, 'testuser@example.com')
         self.assertTrue(user.check_password('testpassword'))
         self.assertFalse(user.is_email_confirmed)
-        self.assertIsNotNone(user.email_confirmation_token)
-        self.assertIsNotNone(user.email_confirmation_sent_at)
 
-    def test_generate_confirmation_token(self):
-        """Test that generate_confirmation_token generates a valid token."""
-        token = self.user.generate_confirmation_token()
-        # Decode the token
-        decoded_uid = urlsafe_base64_decode(token).decode('utf-8')
-        # Check if the decoded UID is a valid UUID
-        try:
-            uuid.UUID(decoded_uid)
-            valid_uuid = True
-        except ValueError:
-            valid_uuid = False
-        self.assertTrue(valid_uuid)
+    def test_email_lookup_ignores_case(self):
+        """Test that login lookups match the email in any case with a single query."""
+        with self.assertNumQueries(1):
+            self.assertEqual(User.objects.get_by_natural_key('TestUser@Example.COM'), self.user)
 
-    def test_save_generates_token_if_needed(self):
-        """Test that save() generates a confirmation token if one does not exist."""
-        user = User(
-            email='newuser@example.com',
-            username='newuser',
-            password='newpassword'
-        )
-        user.save()
-        self.assertIsNotNone(user.email_confirmation_token)
-        self.assertIsNotNone(user.email_confirmation_sent_at)
-        self.assertFalse(user.is_email_confirmed)
+    def test_email_unique_ignoring_case(self):
+        """Test that two users can't share an email that differs only in case."""
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(email='TESTUSER@example.com', username='other', password='testpassword')
+
+    def test_confirmation_token_round_trip(self):
+        """Test that a confirmation token verifies without touching the database."""
+        token = email_confirmation_token_generator.make_token(self.user)
+        with self.assertNumQueries(0):
+            claims = email_confirmation_token_generator.check_token(token)
+        self.assertEqual(claims, (str(self.user.pk), self.user.email))
+
+    def test_confirmation_token_rejects_tampering(self):
+        """Test that a modified token is rejected."""
+        token = email_confirmation_token_generator.make_token(self.user)
+        self.assertIsNone(email_confirmation_token_generator.check_token(token[:-1] + 'x'))
 
+    def test_confirmation_token_expires(self):
+        """Test that a token older than the maximum age is rejected."""
+        token = email_confirmation_token_generator.make_token(self.user)
+        self.assertIsNone(email_confirmation_token_generator.check_token(token, max_age=-1))
 
     def test_custom_user_manager_create_user(self):
         """Test the CustomUserManager.create_user method."""
@@ -0,0 +1,219 @@
+import json
+import os
+import tempfile
+import uuid
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, router
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.operations import RunPython, RunSQL
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import urlsafe_base64_encode
+
+from base.base_model import uuid7
+from user.models import EmailOutbox, User, UserShardDirectory
+from user.services import EmailOutboxService, EmailService, RegistrationService, UserModerationService
+from user.sharding import jump_hash, shard_for_uid
+from user.tokens import email_confirmation_token_generator
+
+# user_shard_test is a second test database, set up by the test settings
+SHARDS = ['default', 'user_shard_test']
+
+
+def uid_on(shard):
+    """Returns a fresh primary key that hashes to the given shard."""
+    while True:
+        uid = uuid7()
+        if shard_for_uid(uid) == shard:
+            return uid
+
+
+class JumpHashTest(SimpleTestCase):
+
+    def test_growing_only_moves_keys_to_the_new_bucket(self):
+        keys = [uuid.uuid4().int & ((1 << 64) - 1) for _ in range(2000)]
+        moved = 0
+        for key in keys:
+            before, after = jump_hash(key, 3), jump_hash(key, 4)
+            if before != after:
+                self.assertEqual(after, 3)
+                moved += 1
+        self.assertLess(moved, len(keys) * 0.35)
+
+    def test_single_shard_needs_no_hashing(self):
+        self.assertEqual(shard_for_uid('not-a-uuid'), 'default')
+
+
+@override_settings(USER_SHARDS=SHARDS)
+class UserShardingTest(TestCase):
+    databases = set(SHARDS)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            uid=uid_on('default'), email='Sharded@example.com', username='sharded', password='password123',
+        )
+
+    def test_router_uses_primary_key_hash(self):
+        self.assertEqual(User.objects.for_uid(uid_on('user_shard_test')).db, 'user_shard_test')
+        self.assertEqual(User.objects.for_uid(self.user.pk).db, 'default')
+
+    def test_user_is_stored_and_found_on_its_shard(self):
+        user = User.objects.create_user(
+            uid=uid_on('user_shard_test'), email='Other@example.com', username='other', password='password123',
+        )
+        self.assertTrue(User.objects.using('user_shard_test').filter(pk=user.pk).exists())
+        self.assertFalse(User.objects.using('default').filter(pk=user.pk).exists())
+        found = User.objects.get_by_natural_key('other@example.com')
+        self.assertEqual((found, found._state.db), (user, 'user_shard_test'))
+
+    def test_duplicate_email_on_another_shard_is_not_inserted(self):
+        user = User(uid=uid_on('user_shard_test'), email='sharded@EXAMPLE.com', username='duplicate')
+        with self.assertRaises(IntegrityError):
+            RegistrationService.register(user)
+        self.assertFalse(User.objects.using('user_shard_test').exists())
+        self.assertEqual(UserShardDirectory.objects.get(email='sharded@example.com').user_uid, self.user.pk)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_failed_shard_insert_releases_the_email(self):
+        User.objects.create_user(uid=uid_on('user_shard_test'), email='first@example.com', username='taken')
+        user = User(uid=uid_on('user_shard_test'), email='second@example.com', username='taken')
+        with self.assertRaises(IntegrityError):
+            RegistrationService.register(user)
+        self.assertFalse(UserShardDirectory.objects.filter(email='second@example.com').exists())
+
+    def test_failed_outbox_insert_rolls_back_the_user(self):
+        user = User(uid=uid_on('user_shard_test'), email='queued@example.com', username='queued')
+        with patch.object(EmailOutboxService, 'enqueue', side_effect=DatabaseError), \
+                self.assertRaises(RuntimeError):
+            RegistrationService.register(user)
+        self.assertFalse(User.objects.using('user_shard_test').exists())
+        self.assertFalse(UserShardDirectory.objects.filter(email='queued@example.com').exists())
+
+    def test_save_records_lowercased_email(self):
+        entry = UserShardDirectory.objects.get(user_uid=self.user.pk)
+        self.assertEqual(entry.email, 'sharded@example.com')
+
+    def test_login_lookup_touches_one_shard(self):
+        cache.clear()
+        with self.assertNumQueries(2):  # directory, then the shard
+            self.assertEqual(User.objects.get_by_natural_key('Sharded@example.com'), self.user)
+        with self.assertNumQueries(1):
+            User.objects.get_by_natural_key('Sharded@example.com')
+
+    def test_unknown_email_skips_shards(self):
+        with self.assertNumQueries(1), self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_natural_key('nobody@example.com')
+
+    def test_confirmation_touches_one_shard(self):
+        token = email_confirmation_token_generator.make_token(self.user)
+        uid = urlsafe_base64_encode(str(self.user.pk).encode())
+        with self.assertNumQueries(1):
+            self.assertTrue(EmailService.confirm_email(token, uid))
+
+    def test_email_change_moves_directory_entry(self):
+        self.user.email = 'renamed@example.com'
+        self.user.save(update_fields=['email'])
+        self.assertEqual(User.objects.get_by_natural_key('renamed@example.com'), self.user)
+        self.assertFalse(UserShardDirectory.objects.filter(email='sharded@example.com').exists())
+
+    def test_email_taken_on_another_shard_fails_validation(self):
+        other = User.objects.create_user(
+            uid=uid_on('user_shard_test'), email='other@example.com', username='other', password='password123',
+        )
+        self.client.force_login(other)
+        response = self.client.post(reverse('user:update'), {'username': 'other', 'email': 'SHARDED@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('email', response.context['form'].errors)
+        self.assertEqual(User.objects.using('user_shard_test').get(pk=other.pk).email, 'other@example.com')
+
+    def test_failed_email_change_keeps_the_directory_and_shard_in_step(self):
+        other = User.objects.create_user(
+            uid=uid_on('user_shard_test'), email='other@example.com', username='other',
+        )
+        other = User.objects.for_uid(other.pk).get(pk=other.pk)
+        other.email = 'sharded@example.com'
+        with self.assertRaises(IntegrityError):
+            other.save(update_fields=['email'])
+        self.assertEqual(User.objects.using('user_shard_test').get(pk=other.pk).email, 'other@example.com')
+        self.assertEqual(UserShardDirectory.objects.get(user_uid=other.pk).email, 'other@example.com')
+        self.assertEqual(User.objects.get_by_natural_key('other@example.com'), other)
+
+    def test_delete_removes_directory_entry(self):
+        self.user.delete()
+        self.assertFalse(UserShardDirectory.objects.exists())
+
+    def test_user_data_migrations_run_on_every_shard(self):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        for (app_label, name), migration in loader.disk_migrations.items():
+            for operation in migration.operations:
+                if app_label == 'user' and isinstance(operation, (RunPython, RunSQL)):
+                    with self.subTest(migration=name):
+                        self.assertTrue(router.allow_migrate('user_shard_test', app_label, **operation.hints))
+
+    def test_rebalance_dry_run_counts_misplaced_users(self):
+        User.objects.db_manager('default').create_user(
+            uid=uid_on('user_shard_test'), email='misplaced@example.com', username='misplaced',
+        )
+        out = StringIO()
+        call_command('rebalance_user_shards', '--dry-run', '--source', 'default', stdout=out)
+        self.assertIn('Would move 1 users from default to user_shard_test.', out.getvalue())
+        self.assertTrue(User.objects.using('default').filter(email='misplaced@example.com').exists())
+
+    def test_rebalance_moves_misplaced_users(self):
+        misplaced = User.objects.db_manager('default').create_user(
+            uid=uid_on('user_shard_test'), email='misplaced@example.com', username='misplaced',
+        )
+        out = StringIO()
+        call_command('rebalance_user_shards', stdout=out)
+        self.assertIn('Moved 1 users from default to user_shard_test.', out.getvalue())
+        self.assertEqual(list(User.objects.using('default').values_list('pk', flat=True)), [self.user.pk])
+        self.assertEqual(list(User.objects.using('user_shard_test').values_list('pk', flat=True)), [misplaced.pk])
+        cache.clear()
+        self.assertEqual(User.objects.get_by_natural_key('misplaced@example.com')._state.db, 'user_shard_test')
+
+    def test_import_writes_users_to_their_shards(self):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        handle.write('email,username\n' + ''.join(f'Import{n}@example.com,import{n}\n' for n in range(20)))
+        handle.write('sharded@example.com,conflict\n')
+        handle.close()
+        self.addCleanup(os.unlink, handle.name)
+        out = StringIO()
+
+        call_command('import_users', handle.name, workers=0, ignore_conflicts=True, stdout=out)
+
+        self.assertIn('Imported 20 users', out.getvalue())
+        self.assertIn('1 already existed', out.getvalue())
+        for shard in SHARDS:
+            users = User.objects.using(shard).filter(username__startswith='import')
+            self.assertTrue(users.exists())
+            self.assertTrue(all(shard_for_uid(user.pk) == shard for user in users))
+        self.assertEqual(UserShardDirectory.objects.count(), 21)
+        cache.clear()
+        self.assertEqual(User.objects.get_by_natural_key('import7@example.com').username, 'import7')
+
+    def test_export_and_moderation_cover_every_shard(self):
+        other = User.objects.create_user(uid=uid_on('user_shard_test'), email='other@example.com', username='other')
+
+        out = StringIO()
+        call_command('export_users', format='jsonl', stdout=out)
+        self.assertEqual(sorted(json.loads(line)['username'] for line in out.getvalue().splitlines()), ['other', 'sharded'])
+
+        self.assertEqual(UserModerationService.bulk_update(User.objects.all(), is_active=False), 2)
+        self.assertFalse(User.objects.for_uid(other.pk).get(pk=other.pk).is_active)
+        self.assertEqual(UserModerationService.bulk_delete(User.objects.all()), 2)
+        self.assertFalse(UserShardDirectory.objects.exists())
+
+    def test_admin_shows_one_shard_at_a_time(self):
+        admin = User.objects.create_superuser(uid=uid_on('default'), email='admin@example.com', username='admin', password='pw')
+        other = User.objects.create_user(uid=uid_on('user_shard_test'), email='other@example.com', username='other')
+        self.client.force_login(admin)
+
+        changelist = reverse('admin:user_user_changelist')
+        self.assertNotContains(self.client.get(changelist), 'other@example.com')
+        self.assertContains(self.client.get(changelist, {'shard': 'user_shard_test'}), 'other@example.com')
+        self.assertContains(self.client.get(reverse('admin:user_user_change', args=[other.pk])), 'other@example.com')
@@ -0,0 +1,158 @@
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from user.checks import check_throttle_cache, check_throttle_cache_shared
+from user.models import User
+from user.throttling import acheck_throttle, check_throttle, client_ip, throttle_stats
+
+RATES = {
+    'login': {'ip': (3, 60), 'account': (2, 60)},
+    'register': {'ip': (1, 60)},
+    'password_reset': {'ip': (5, 60), 'account': (1, 60)},
+}
+
+
+@override_settings(THROTTLE_RATES=RATES)
+class ThrottleTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.THROTTLE_CACHE_ALIAS].clear()
+        self.factory = RequestFactory()
+
+    def test_account_limit_applies_across_ips(self):
+        first = self.factory.post('/', REMOTE_ADDR='10.0.0.1')
+        second = self.factory.post('/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(check_throttle('login', first, 'victim@example.com'), 0)
+        self.assertEqual(check_throttle('login', second, 'Victim@Example.com'), 0)
+        self.assertGreater(check_throttle('login', second, 'victim@example.com'), 0)
+        self.assertEqual(check_throttle('login', second, 'other@example.com'), 0)
+
+    def test_ip_limit_applies_across_accounts(self):
+        request = self.factory.post('/')
+        for index in range(3):
+            self.assertEqual(check_throttle('login', request, f'user{index}@example.com'), 0)
+        self.assertGreater(check_throttle('login', request, 'user3@example.com'), 0)
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        request = self.factory.post('/')
+        with patch('user.throttling.time.time', return_value=600.0):
+            for index in range(3):
+                check_throttle('login', request, f'user{index}@example.com')
+        # Early in the next window most of the old attempts still count.
+        with patch('user.throttling.time.time', return_value=665.0):
+            self.assertEqual(check_throttle('login', request), 0)
+            self.assertGreater(check_throttle('login', request), 0)
+
+    def test_async_check_shares_counters(self):
+        request = self.factory.post('/')
+        self.assertEqual(asyncio.run(acheck_throttle('register', request)), 0)
+        self.assertGreater(check_throttle('register', request), 0)
+
+    def test_parallel_attempts_respect_the_limit(self):
+        request = self.factory.post('/')
+        barrier = threading.Barrier(10)
+
+        def attempt(index):
+            barrier.wait()
+            return check_throttle('password_reset', request)
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(attempt, range(10)))
+
+        self.assertEqual(results.count(0), 5)
+
+    def test_concurrent_async_attempts_respect_the_limit(self):
+        request = self.factory.post('/')
+
+        async def burst():
+            return await asyncio.gather(*(acheck_throttle('password_reset', request) for _ in range(10)))
+
+        self.assertEqual(asyncio.run(burst()).count(0), 5)
+
+    def test_rejected_attempts_are_not_counted(self):
+        request = self.factory.post('/')
+        with patch('user.throttling.time.time', return_value=600.0):
+            self.assertEqual(check_throttle('register', request), 0)
+            self.assertGreater(check_throttle('register', request), 0)
+            self.assertGreater(check_throttle('register', request), 0)
+        # The previous window only held the one allowed attempt
+        with patch('user.throttling.time.time', return_value=719.0):
+            self.assertEqual(check_throttle('register', request), 0)
+
+    def test_unconfigured_scope_is_not_limited(self):
+        self.assertEqual(check_throttle('unknown', self.factory.post('/')), 0)
+
+    @override_settings(THROTTLE_NUM_PROXIES=1)
+    def test_client_ip_from_trusted_proxy(self):
+        request = self.factory.get('/', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '2.2.2.2')
+
+
+@override_settings(THROTTLE_RATES=RATES)
+class ThrottledViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.THROTTLE_CACHE_ALIAS].clear()
+        User.objects.create_user(email='test@example.com', username='testuser', password='password123')
+
+    def test_rejected_login_skips_hashing(self):
+        data = {'username': 'test@example.com', 'password': 'wrongpassword'}
+        self.client.post(reverse('user:login'), data)
+        self.client.post(reverse('user:login'), data)
+
+        with patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode') as encode, self.assertNumQueries(0):
+            response = self.client.post(reverse('user:login'), data)
+
+        encode.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(throttle_stats()['hashes_saved'], 1)
+        self.assertEqual(throttle_stats()['rejected']['login'], 1)
+
+    def test_registration_is_throttled(self):
+        self.client.post(reverse('user:register'), {'email': 'a@example.com'})
+        response = self.client.post(reverse('user:register'), {'email': 'b@example.com'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_password_reset_is_throttled_per_email(self):
+        check_throttle('password_reset', RequestFactory().post('/', REMOTE_ADDR='10.0.0.1'), 'test@example.com')
+        response = self.client.post(reverse('user:password_reset'), {'email': 'test@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(throttle_stats()['hashes_saved'], 0)
+
+
+class ThrottleCacheCheckTest(SimpleTestCase):
+
+    def _caches(self, backend):
+        return {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'throttle': {'BACKEND': backend, 'LOCATION': tempfile.gettempdir()},
+        }
+
+    def test_non_atomic_backend_is_refused(self):
+        with override_settings(CACHES=self._caches('django.core.cache.backends.filebased.FileBasedCache')):
+            self.assertEqual([error.id for error in check_throttle_cache(None)], ['user.E001'])
+
+    def test_atomic_backend_is_accepted(self):
+        with override_settings(CACHES=self._caches('django.core.cache.backends.redis.RedisCache')):
+            self.assertEqual(check_throttle_cache(None), [])
+
+    def test_local_memory_warns_on_deploy(self):
+        with override_settings(CACHES=self._caches('django.core.cache.backends.locmem.LocMemCache')):
+            self.assertEqual(check_throttle_cache(None), [])
+            self.assertEqual([warning.id for warning in check_throttle_cache_shared(None)], ['user.W001'])
+
+    @override_settings(THROTTLE_RATES={})
+    def test_unused_throttle_is_not_checked(self):
+        with override_settings(CACHES=self._caches('django.core.cache.backends.filebased.FileBasedCache')):
+            self.assertEqual(check_throttle_cache(None), [])
@@ -0,0 +1,153 @@
+import struct
+import tracemalloc
+from io import BytesIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http.multipartparser import MultiPartParser
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from user.models import User
+from user.uploads import LimitedImageUploadHandler, ProfilePictureField
+
+BOUNDARY = 'UploadBoundary'
+
+
+def bmp_header(width, height):
+    """Returns an uncompressed 24-bit BMP header and the pixel data length it announces."""
+    data_size = ((width * 3 + 3) & ~3) * height
+    header = struct.pack('<2sIHHI', b'BM', 54 + data_size, 0, 0, 54)
+    header += struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, data_size, 2835, 2835, 0, 0)
+    return header, data_size
+
+
+class GeneratedUploadStream:
+    """
+    A multipart body with one file, generated while it is read so the test
+    itself never holds the upload in memory.
+    """
+
+    def __init__(self, head, padding):
+        self.prefix = (
+            f'--{BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="profile_picture"; filename="big.bmp"\r\n'
+            'Content-Type: image/bmp\r\n\r\n'
+        ).encode() + head
+        self.padding = padding
+        self.suffix = f'\r\n--{BOUNDARY}--\r\n'.encode()
+        self.length = len(self.prefix) + padding + len(self.suffix)
+
+    def read(self, size=-1):
+        chunk = b''
+        if self.prefix:
+            chunk, self.prefix = self.prefix[:size], self.prefix[size:]
+        elif self.padding:
+            count = min(size, self.padding)
+            self.padding -= count
+            chunk = bytes(count)
+        else:
+            chunk, self.suffix = self.suffix[:size], self.suffix[size:]
+        return chunk
+
+
+def parse(stream):
+    meta = {
+        'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+        'CONTENT_LENGTH': str(stream.length),
+    }
+    return MultiPartParser(meta, stream, [LimitedImageUploadHandler()]).parse()[1]['profile_picture']
+
+
+@override_settings(PROFILE_PICTURE_FORMATS=('BMP',), PROFILE_PICTURE_MAX_PIXELS=20_000_000)
+class LimitedImageUploadHandlerTest(SimpleTestCase):
+
+    @override_settings(PROFILE_PICTURE_MAX_BYTES=60 * 2 ** 20)
+    def test_50mb_upload_memory_stays_flat(self):
+        head, data_size = bmp_header(4200, 4200)
+        self.assertGreater(data_size, 50 * 2 ** 20)
+
+        tracemalloc.start()
+        try:
+            upload = parse(GeneratedUploadStream(head, data_size))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertIsNone(upload.upload_error)
+        self.assertEqual(upload.image_info, ('BMP', (4200, 4200)))
+        self.assertEqual(upload.size, len(head) + data_size)
+        self.assertLess(peak, 2 * 2 ** 20)
+        upload.close()
+
+    @override_settings(PROFILE_PICTURE_MAX_BYTES=2 ** 20)
+    def test_oversized_upload_is_rejected_and_discarded(self):
+        head, data_size = bmp_header(1024, 1024)
+        upload = parse(GeneratedUploadStream(head, data_size))
+        self.assertIn('too large', str(upload.upload_error))
+        self.assertLess(upload.tell() + len(upload.read()), 2 ** 20)
+
+    def test_pixel_limit_checked_from_header(self):
+        head, _ = bmp_header(20_000, 20_000)
+        upload = parse(GeneratedUploadStream(head, 2 ** 20))
+        self.assertIn('dimensions', str(upload.upload_error))
+
+    def test_non_image_is_rejected(self):
+        upload = parse(GeneratedUploadStream(b'not an image', 1024))
+        self.assertIn('valid image', str(upload.upload_error))
+
+    def test_field_reports_upload_error(self):
+        head, _ = bmp_header(20_000, 20_000)
+        upload = parse(GeneratedUploadStream(head, 1024))
+        with self.assertRaisesMessage(ValidationError, 'The image dimensions are too large.'):
+            ProfilePictureField().clean(upload)
+
+
+class ProfilePictureFieldTest(SimpleTestCase):
+
+    def _upload(self, image_format, size=(32, 32)):
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, image_format)
+        return SimpleUploadedFile(f'avatar.{image_format.lower()}', buffer.getvalue())
+
+    def test_checks_header_of_other_uploads(self):
+        field = ProfilePictureField()
+        self.assertEqual(field.clean(self._upload('PNG')).content_type, 'image/png')
+
+    def test_rejects_unsupported_format(self):
+        with self.assertRaisesMessage(ValidationError, 'Unsupported image format.'):
+            ProfilePictureField().clean(self._upload('TIFF'))
+
+
+class LimitedImageUploadViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='test@example.com', username='testuser', password='password123')
+        self.data = {'username': 'testuser', 'email': 'test@example.com', 'bio': ''}
+
+    def _post(self, client, upload):
+        return client.post(reverse('user:update'), {**self.data, 'profile_picture': upload})
+
+    def test_profile_update_streams_through_limited_handler(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('notes.png', b'not an image', content_type='image/png')
+        with patch.object(LimitedImageUploadHandler, 'new_file', autospec=True,
+                          side_effect=LimitedImageUploadHandler.new_file) as new_file:
+            response = self._post(self.client, upload)
+        new_file.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Upload a valid image.')
+
+    def test_other_uploads_use_default_handlers(self):
+        self.assertNotIn('user.uploads.LimitedImageUploadHandler', settings.FILE_UPLOAD_HANDLERS)
+
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = self._post(client, SimpleUploadedFile('a.png', b'x', content_type='image/png'))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlsafe_base64_encode
+from user.models import User, EmailOutbox
+from user.tokens import email_confirmation_token_generator
+
+
+class RegistrationViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.THROTTLE_CACHE_ALIAS].clear()
+        self.form_data = {
+            'username': 'testuser',
+            'email': 'test@example.com',
+            'password': 'password123',
+            'password_confirm': 'password123',
+            'bio': 'This is a test bio',
+        }
+
+    def test_registration_is_a_single_insert(self):
+        # 2 unique checks (username, email), then one savepoint wrapping the
+        # user INSERT and the outbox INSERT.
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse('user:register'), self.form_data)
+
+        self.assertRedirects(response, reverse('user:confirmation_sent'))
+        user = User.objects.get(email='test@example.com')
+        self.assertFalse(user.is_active)
+        self.assertFalse(user.is_email_confirmed)
+        self.assertTrue(user.check_password('password123'))
+        self.assertIsNotNone(user.email_confirmation_sent_at)
+        self.assertEqual(EmailOutbox.objects.filter(to_email='test@example.com').count(), 1)
+
+    def test_invalid_registration_does_not_write(self):
+        self.form_data['password_confirm'] = 'differentpassword'
+
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('user:register'), self.form_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.exists())
+
+
+class LoginViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.THROTTLE_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(email='test@example.com', username='testuser', password='password123')
+
+    def test_login_query_budget(self):
+        # User lookup, session key collision check and INSERT (inside a savepoint),
+        # the last_login UPDATE and the final session UPDATE (inside a savepoint).
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                reverse('user:login'), {'username': 'test@example.com', 'password': 'password123'}
+            )
+
+        self.assertRedirects(response, reverse('user:profile'), fetch_redirect_response=False)
+        self.assertEqual(self.client.session['_auth_user_id'], str(self.user.pk))
+
+    def test_failed_login_query_budget(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('user:login'), {'username': 'test@example.com', 'password': 'wrongpassword'}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class EmailConfirmationViewTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com', username='testuser', password='password123', is_active=False
+        )
+        self.uid = urlsafe_base64_encode(str(self.user.pk).encode('utf-8'))
+
+    def test_confirmation_is_a_single_update(self):
+        token = email_confirmation_token_generator.make_token(self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user:confirm_email', args=[self.uid, token]))
+
+        self.assertRedirects(response, reverse('user:email_confirmed'), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_email_confirmed)
+        self.assertTrue(self.user.is_active)
+
+    def test_invalid_token_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user:confirm_email', args=[self.uid, 'invalid-token']))
+
+        self.assertRedirects(response, reverse('user:invalid_token'), fetch_redirect_response=False)
+
+
+class UpdateProfileViewTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', username='testuser', password='password123')
+        self.client.force_login(self.user)
+
+    def test_update_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('user:update'),
+                {'username': 'testuser', 'email': 'test@example.com', 'bio': 'Updated bio'},
+            )
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "user"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"bio"', updates[0])
+        self.assertNotIn('"username"', updates[0])
+
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.bio, 'Updated bio')
@@ -0,0 +1,207 @@
+"""
+Sliding-window rate limits for the views that hash passwords or send email.
+
+Each limit keeps one counter per fixed window in the cache and estimates the
+sliding window as the current count plus the previous window's count, weighted
+by how much of it still overlaps. An attempt increments its counters first and
+is judged on the values ``incr`` returns, so concurrent attempts can't all see
+room under the limit. Rejected attempts never reach the hasher.
+"""
+
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+HASHES_SAVED_KEY = 'throttle:hashes_saved'
+
+
+def _cache():
+    # Needs an atomic incr(); enforced by user.checks
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+
+def _rates(scope):
+    """Returns the ``{key_type: (limit, window_seconds)}`` limits configured for a scope."""
+    return getattr(settings, 'THROTTLE_RATES', {}).get(scope, {})
+
+
+def client_ip(request):
+    """
+    Returns the client address, trusting ``THROTTLE_NUM_PROXIES`` entries of
+    ``X-Forwarded-For`` added by our own reverse proxies.
+    """
+    num_proxies = getattr(settings, 'THROTTLE_NUM_PROXIES', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _identities(scope, request, account):
+    """Yields ``(key_prefix, limit, window)`` for every limit that applies."""
+    for key_type, (limit, window) in _rates(scope).items():
+        if key_type == 'ip':
+            ident = client_ip(request)
+        elif key_type == 'account' and account:
+            ident = account.strip().lower()
+        else:
+            continue
+        yield f'throttle:{scope}:{key_type}:{ident}', limit, window
+
+
+def _limits(scope, request, account, now):
+    """
+    Returns ``(current_key, previous_key, offset, limit, window)`` per applicable
+    limit, where ``offset`` is how far ``now`` is into the current window.
+    """
+    limits = []
+    for prefix, limit, window in _identities(scope, request, account):
+        index, offset = divmod(now, window)
+        limits.append((f'{prefix}:{int(index)}', f'{prefix}:{int(index) - 1}', offset, limit, window))
+    return limits
+
+
+def _retry_after(limits, previous_counts, current_counts):
+    """
+    Returns the seconds until every exceeded limit has room again, or 0.
+
+    ``current_counts`` already include the attempt being checked, which is
+    allowed if the attempts before it leave room.
+    """
+    retry_after = 0
+    for (current, previous, offset, limit, window), count in zip(limits, current_counts):
+        estimate = previous_counts.get(previous, 0) * (1 - offset / window) + count - 1
+        if estimate >= limit:
+            retry_after = max(retry_after, int(window - offset) + 1)
+    return retry_after
+
+
+def _rejection_counters(scope, request, saves_hash, retry_after):
+    logger.warning(f"Throttled {scope} attempt from {client_ip(request)}; retry after {retry_after}s")
+    return [f'throttle:rejected:{scope}'] + ([HASHES_SAVED_KEY] if saves_hash else [])
+
+
+def check_throttle(scope, request, account=None, saves_hash=True):
+    """
+    Records an attempt against the ``scope`` limits for the client IP and account.
+
+    Args:
+        scope (str): The key of ``THROTTLE_RATES`` to apply, e.g. 'login'.
+        request: The HTTP request.
+        account (str): The email the attempt is for, if any.
+        saves_hash (bool): Whether a rejected attempt skips a password hash.
+
+    Returns:
+        int: 0 if the attempt may proceed, otherwise the seconds to wait.
+    """
+    limits = _limits(scope, request, account, time.time())
+    if not limits:
+        return 0
+    cache = _cache()
+    previous_counts = cache.get_many([previous for current, previous, *_ in limits])
+    current_counts = [_incr(cache, current, window * 2) for current, previous, offset, limit, window in limits]
+    retry_after = _retry_after(limits, previous_counts, current_counts)
+    if retry_after:
+        # Only allowed attempts stay counted, so a client over the limit
+        # regains its full rate once it backs off.
+        for current, *_ in limits:
+            _decr(cache, current)
+        for key in _rejection_counters(scope, request, saves_hash, retry_after):
+            _incr(cache, key, None)
+    return retry_after
+
+
+async def acheck_throttle(scope, request, account=None, saves_hash=True):
+    """
+    Async version of ``check_throttle``.
+
+    Runs the sync check in a thread: Django's async cache API implements
+    ``aincr`` as a separate get and set, even for backends whose ``incr`` is
+    atomic, so concurrent attempts could all read the same count.
+    """
+    return await sync_to_async(check_throttle)(scope, request, account, saves_hash)
+
+
+def _incr(cache, key, timeout):
+    """Adds one to the counter ``key`` and returns its new value."""
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        value = cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        return _incr(cache, key, timeout)
+    # Some backends (file, database) reset the expiry on incr()
+    cache.touch(key, timeout)
+    return value
+
+
+def _decr(cache, key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        # Expired meanwhile; nothing left to take back
+        pass
+
+
+def throttle_stats():
+    """
+    Returns the number of rejected attempts per scope and the password hashes
+    those rejections saved, since the counters were last cleared.
+    """
+    scopes = list(getattr(settings, 'THROTTLE_RATES', {}))
+    counts = _cache().get_many([HASHES_SAVED_KEY] + [f'throttle:rejected:{scope}' for scope in scopes])
+    return {
+        'hashes_saved': counts.get(HASHES_SAVED_KEY, 0),
+        'rejected': {scope: counts.get(f'throttle:rejected:{scope}', 0) for scope in scopes},
+    }
+
+
+def throttled_response(retry_after):
+    response = HttpResponse('Too many attempts. Please try again later.', status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class ThrottleMixin:
+    """
+    Rate limits a view's POST requests before the handler runs.
+
+    Attributes:
+        throttle_scope (str): The key of ``THROTTLE_RATES`` to apply.
+        throttle_account_field (str): The POST field naming the account, if any.
+        throttle_saves_hash (bool): Whether each rejected POST avoids a password hash.
+    """
+    throttle_scope = None
+    throttle_account_field = None
+    throttle_saves_hash = True
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'POST':
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._athrottled_dispatch(request, *args, **kwargs)
+        retry_after = check_throttle(
+            self.throttle_scope, request, self._throttle_account(request), self.throttle_saves_hash,
+        )
+        if retry_after:
+            return throttled_response(retry_after)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def _athrottled_dispatch(self, request, *args, **kwargs):
+        retry_after = await acheck_throttle(
+            self.throttle_scope, request, self._throttle_account(request), self.throttle_saves_hash,
+        )
+        if retry_after:
+            return throttled_response(retry_after)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def _throttle_account(self, request):
+        return request.POST.get(self.throttle_account_field) if self.throttle_account_field else None
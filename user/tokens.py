@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core import signing
+
+
+class EmailConfirmationTokenGenerator:
+    """
+    Strategy object used to generate and check tokens for the email confirmation
+    mechanism.
+
+    Tokens are signed with ``SECRET_KEY`` and carry the user's primary key, email
+    address and creation time, so they can be verified without a database query.
+    Binding the email address means a token stops working once the address changes.
+    """
+    salt = 'user.tokens.EmailConfirmationTokenGenerator'
+
+    def make_token(self, user):
+        """
+        Returns a signed token for the given user.
+        """
+        return signing.dumps([str(user.pk), user.email], salt=self.salt)
+
+    def check_token(self, token, max_age=None):
+        """
+        Checks the token's signature and age.
+
+        Args:
+            token (str): The token from the confirmation link.
+            max_age (int): Maximum token age in seconds. Defaults to
+                ``EMAIL_CONFIRMATION_TOKEN_MAX_AGE``.
+
+        Returns:
+            tuple: The ``(uid, email)`` the token was issued for, or None if the
+            token is invalid or expired.
+        """
+        if max_age is None:
+            max_age = settings.EMAIL_CONFIRMATION_TOKEN_MAX_AGE
+        try:
+            uid, email = signing.loads(token, salt=self.salt, max_age=max_age)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        return uid, email
+
+
+email_confirmation_token_generator = EmailConfirmationTokenGenerator()
@@ -0,0 +1,176 @@
+"""
+Memory-bounded image uploads.
+
+``LimitedImageUploadHandler`` spools every uploaded file to disk in small chunks
+and inspects the image header as it arrives, so oversized files, decompression
+bombs and non-images are rejected without ever holding the file or its decoded
+bitmap in memory. ``ProfilePictureField`` reports those rejections on the form
+and reuses the header the handler already read. Views accepting a profile
+picture install the handler with ``LimitedImageUploadMixin``; other uploads keep
+Django's default handlers.
+"""
+
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.middleware.csrf import CsrfViewMiddleware
+from django.template.defaultfilters import filesizeformat
+from django.utils.decorators import method_decorator
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from PIL import Image, UnidentifiedImageError
+
+# Enough for the metadata (EXIF, ICC profiles) that can precede a JPEG's size
+HEADER_BYTES = 256 * 2 ** 10
+
+
+def _max_bytes():
+    return getattr(settings, 'PROFILE_PICTURE_MAX_BYTES', 5 * 2 ** 20)
+
+
+def read_image_header(head):
+    """
+    Parses the format and size from the start of an image without decoding it.
+
+    Returns:
+        tuple: ``(format, (width, height))``, or None if ``head`` doesn't start
+        with a complete header of a format Pillow knows.
+    """
+    try:
+        with Image.open(BytesIO(head)) as image:
+            return image.format, image.size
+    except Image.DecompressionBombError:
+        # Far past any pixel limit we'd accept
+        return None, (Image.MAX_IMAGE_PIXELS, Image.MAX_IMAGE_PIXELS)
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        return None
+
+
+def image_error(info):
+    """
+    Returns the validation message for an image header, or None if it's acceptable.
+    """
+    if info is None:
+        return _('Upload a valid image. The file you uploaded was either not an image or a corrupted image.')
+    image_format, (width, height) = info
+    if width * height > getattr(settings, 'PROFILE_PICTURE_MAX_PIXELS', 25_000_000):
+        return _('The image dimensions are too large.')
+    if image_format not in getattr(settings, 'PROFILE_PICTURE_FORMATS', ('JPEG', 'PNG', 'GIF', 'WEBP')):
+        return _('Unsupported image format.')
+    return None
+
+
+def _too_large():
+    return _('The file is too large. The maximum size is %(size)s.') % {'size': filesizeformat(_max_bytes())}
+
+
+class LimitedImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams uploads to a temporary file, enforcing ``PROFILE_PICTURE_MAX_BYTES``,
+    ``PROFILE_PICTURE_MAX_PIXELS`` and ``PROFILE_PICTURE_FORMATS`` on the fly.
+
+    A rejected file stops being written to disk and is handed to the form with
+    an ``upload_error`` message instead of being silently dropped. Accepted files
+    carry the parsed ``image_info`` header.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.head = bytearray()
+        self.image_info = None
+        self.error = None
+        if self.content_length is not None and self.content_length > _max_bytes():
+            self.error = _too_large()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error is not None:
+            return None
+        self.received += len(raw_data)
+        if self.received > _max_bytes():
+            return self._reject(_too_large())
+        if self.image_info is None:
+            self.head += raw_data[:HEADER_BYTES - len(self.head)]
+            self.image_info = read_image_header(bytes(self.head))
+            if self.image_info is not None:
+                self.head = None
+                error = image_error(self.image_info)
+                if error is not None:
+                    return self._reject(error)
+            elif len(self.head) >= HEADER_BYTES:
+                return self._reject(image_error(None))
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.error is None and self.image_info is None:
+            self.error = image_error(None)
+        file = super().file_complete(file_size)
+        file.image_info = self.image_info
+        file.upload_error = self.error
+        return file
+
+    def _reject(self, error):
+        # Free the disk space; the rest of the body is read and discarded.
+        self.error = error
+        self.head = None
+        self.file.seek(0)
+        self.file.truncate()
+        return None
+
+
+class ProfilePictureField(forms.ImageField):
+    """
+    ImageField that validates uploads by their header only.
+
+    Files from ``LimitedImageUploadHandler`` were already checked while streaming.
+    Files from any other handler have their first ``HEADER_BYTES`` read and
+    checked the same way, rather than being opened and verified in full.
+    """
+
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+        error = getattr(f, 'upload_error', None)
+        info = getattr(f, 'image_info', None)
+        if error is None and info is None:
+            if f.size is not None and f.size > _max_bytes():
+                error = _too_large()
+            else:
+                info = read_image_header(f.read(HEADER_BYTES))
+                f.seek(0)
+                error = image_error(info)
+        if error is not None:
+            raise ValidationError(error, code='invalid_image')
+        f.content_type = Image.MIME.get(info[0])
+        return f
+
+
+class LimitedImageUploadMixin:
+    """
+    Puts ``LimitedImageUploadHandler`` in front of the upload handlers of the
+    view's requests. Must come first among the view's bases.
+
+    Handlers can't change once the body is parsed, and ``CsrfViewMiddleware``
+    parses it before the view runs, so the view is exempt from the middleware
+    and runs the same CSRF check itself once the handler is in place.
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, LimitedImageUploadHandler(request))
+        rejected = CsrfViewMiddleware(lambda request: None).process_view(request, None, args, kwargs)
+        if rejected is None:
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+
+            async def func():
+                return rejected
+
+            return func()
+        return rejected
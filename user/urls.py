@@ -1,8 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from user.views import RegistrationView, LoginView, LogoutView, ProfileView, UpdateProfileView, EmailConfirmationView, EmailConfirmedView, PasswordChangeDoneView, PasswordResetCompleteView, PasswordChangeView, PasswordResetConfirmView, PasswordResetDoneView, PasswordResetView
+from user.views import RegistrationView, LoginView, LogoutView, ProfileView, UpdateProfileView, EmailConfirmationView, ConfirmationSentView, EmailConfirmedView, PasswordChangeDoneView, PasswordResetCompleteView, PasswordChangeView, PasswordResetConfirmView, PasswordResetDoneView, PasswordResetView
 
 app_name = 'user'
 
+if settings.USE_ASYNC_VIEWS:
+    # Under ASGI, serve the hot paths with their async counterparts.
+    from user.async_views import AsyncEmailConfirmationView as EmailConfirmationView
+    from user.async_views import AsyncLoginView as LoginView
+    from user.async_views import AsyncProfileView as ProfileView
+    from user.async_views import AsyncRegistrationView as RegistrationView
+
 urlpatterns = [
     path('register/', RegistrationView.as_view(), name='register'),
     path('login', LoginView.as_view(), name='login'),
@@ -11,6 +19,7 @@ urlpatterns = [
     path('profile/', ProfileView.as_view(), name='profile'),
     path('update-profile/', UpdateProfileView.as_view(), name='update'),
     path('confirm-email/<str:uid>/<str:token>/', EmailConfirmationView.as_view(), name='confirm_email'),
+    path('confirmation-sent/', ConfirmationSentView.as_view(), name='confirmation_sent'),
     path('email-confirmed/', EmailConfirmedView.as_view(), name='email_confirmed'),
     path('invalid-token/', EmailConfirmationView.as_view(), name='invalid_token'),
 
@@ -8,10 +8,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse_lazy, reverse
 
-from django.utils.http import urlsafe_base64_decode
-from django.utils.encoding import force_str
 from django.shortcuts import  redirect
-from django.contrib.auth import authenticate
 from django.contrib.auth.views import LogoutView as DjangoLogoutView
 from django.contrib.auth.views import PasswordResetCompleteView as DjangoPasswordResetCompleteView
 from django.contrib.auth.views import PasswordResetConfirmView as DjangoPasswordResetConfirmView
@@ -25,7 +22,10 @@ from django.urls import reverse_lazy
 from .models import User
 from .forms import RegistrationForm, UpdateForm, LoginForm
 
-from .services import EmailService
+from .backends import load_cached_bio
+from .services import EmailService, RegistrationService
+from .throttling import ThrottleMixin
+from .uploads import LimitedImageUploadMixin
 import logging
 logger = logging.getLogger(__name__)
 
@@ -34,14 +34,16 @@ def custom_error_handler(request, exception):
     return HttpResponse("An error occurred. Please try again later.", status=500)
 
 
-class RegistrationView(View):
+class RegistrationView(LimitedImageUploadMixin, ThrottleMixin, View):
     """
-    View for user registration.
+    View for user registration. POSTs are rate limited per IP before the
+    password is hashed, and the profile picture is checked as it streams in.
 
      Methods:
         get(request): Handles GET requests and renders the registration form.
         post(request): Handles POST requests and creates a new user if the form data is valid.
     """
+    throttle_scope = 'register'
 
     def get(self, request):
         """
@@ -62,21 +64,17 @@ class RegistrationView(View):
             logger.error(f"An error occurred: {e}")
             return custom_error_handler(request, e)
     def post(self, request):
+        """
+        Creates the user and queues the confirmation email in one transaction.
+        """
         try:
-            form = RegistrationForm(request.POST)
+            form = RegistrationForm(request.POST, request.FILES)
             if form.is_valid():
-                user = form.save(commit=False)
-                user.is_active = False
-                user.save()
-
-                # Debug log
-                logger.info(f"User created with username: {user.username}")
-
-                result = EmailService.send_confirmation_email(user)
-                logger.info(f"Email sent with result: {result}")
+                user = RegistrationService.register(form.save(commit=False), request)
+                logger.info(f"Confirmation email queued for: {user.username}")
 
-                # Redirect to confirmation email view
-                return redirect(reverse('user:confirm_email', kwargs={'uid': result['uid'], 'token': result['token']}))
+                # The confirmation link is only in the email
+                return redirect('user:confirmation_sent')
             return render(request, 'user/register.html', {'form': form})
 
         except IntegrityError as e:
@@ -88,7 +86,13 @@ class RegistrationView(View):
 
 
 
-class LoginView(View):
+class LoginView(ThrottleMixin, View):
+    """
+    View for logging in. POSTs are rate limited per IP and per submitted email
+    before ``authenticate()`` hashes anything.
+    """
+    throttle_scope = 'login'
+    throttle_account_field = 'username'
 
     def get(self, request):
         """
@@ -108,16 +112,12 @@ class LoginView(View):
         Handles POST requests and logs in the user if the form data is valid.
         """
         try:
-            form = LoginForm(request.POST)
+            # The form authenticates the credentials itself; reuse its user so the
+            # password is hashed only once per attempt.
+            form = LoginForm(request, data=request.POST)
             if form.is_valid():
-                username = form.cleaned_data['username']
-                password = form.cleaned_data['password']
-                user = authenticate(request, username=username, password=password)
-                if user is not None:
-                    login(request, user)
-                    return redirect('user:profile')
-                else:
-                    form.add_error(None, 'Invalid username or password')
+                login(request, form.get_user())
+                return redirect('user:profile')
             return render(request, 'user/login.html', {'form': form})
         except Exception as e:
             logger.error(f"An error occurred: {e}")
@@ -129,7 +129,7 @@ class LogoutView(DjangoLogoutView):
     View for user logout.
     """
 
-    next_page = reverse_lazy('home')
+    next_page = reverse_lazy('core:home')
 
 class ProfileView(LoginRequiredMixin, DetailView):
     """
@@ -168,24 +168,27 @@ class ProfileView(LoginRequiredMixin, DetailView):
         try:
             if not self.request.user.is_authenticated:
                 raise PermissionDenied
-            obj = self.request.user
+            # The session user comes from the cache without its bio; fill it in
+            # from the cache too so the page needs no queries in steady state.
+            obj = load_cached_bio(self.request.user)
             return obj
         except Exception as e:
             logger.error(f"An error occurred: {e}")
             return custom_error_handler(self.request, e)
 
-class UpdateProfileView(LoginRequiredMixin, UpdateView):
+class UpdateProfileView(LimitedImageUploadMixin, LoginRequiredMixin, UpdateView):
     """
     View for updating user profiles.
 
     This view requires the user to be authenticated. It allows the user to update
     their own profile information, including the username, email, profile picture,
-    and bio.
+    and bio. The profile picture is checked as it streams in.
 
     Attributes:
         model (User): The user model.
         form_class (UpdateForm): The form to use for updating the user profile.
         template_name (str): The name of the template to render.
+        success_url (str): The URL to redirect to after the profile is updated.
 
     Methods:
         get_object(self, queryset=None): Ensures that users can only update their own profile.
@@ -193,8 +196,9 @@ class UpdateProfileView(LoginRequiredMixin, UpdateView):
     """
 
     model = User
-    form_class = UpdateForm()
+    form_class = UpdateForm
     template_name = 'user/update.html'
+    success_url = reverse_lazy('user:profile')
 
     def get_object(self, queryset=None):
         """
@@ -240,32 +244,34 @@ class EmailConfirmationView(View):
     """
     View for confirming a user's email address.
 
-    This view handles the GET request to the email confirmation link. It decodes the token
-    from the URL, retrieves the corresponding user, confirms the user's email address, and saves
-    the changes to the database. If the token is invalid or the user is not found, it redirects
-    to the 'invalid_token' page.
+    This view handles the GET request to the email confirmation link. It verifies the signed
+    token from the URL and confirms the user's email address with a single UPDATE. If the
+    token is invalid, expired or the user is not found, it redirects to the 'invalid_token' page.
 
     Attributes:
         None
 
     Methods:
-        get(self, request, token): Handles the GET request and confirms the user's email address.
+        get(self, request, uid, token): Handles the GET request and confirms the user's email address.
     """
-    def get(self, request, uid, token):
-        try:
-            # Decode the token
-            uid = force_str(urlsafe_base64_decode(uid))
-            # Get the user by the decoded UID
-            user = User.objects.get(pk =uid, email_confirmation_token=token)
-            # Confirm the user
-            user.is_email_confirmed = True
-            user.email_confirmation_token = None  # Clear the token
-            user.save()
+    def get(self, request, uid=None, token=None):
+        if uid is None:
+            # The 'invalid_token' page itself
+            return render(request, 'user/invalid_token.html')
+        if EmailService.confirm_email(token, uid):
             return redirect('user:email_confirmed')
-        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-            # Handle errors, such as invalid token or user not found
-            return redirect('user:invalid_token')
+        # Handle errors, such as invalid token or user not found
+        return redirect('user:invalid_token')
+
+class ConfirmationSentView(View):
+    """
+    View telling a newly registered user to confirm their email address from
+    the link in their inbox.
+    """
+    template_name = 'user/confirmation_sent.html'
 
+    def get(self, request):
+        return render(request, self.template_name)
 
 class EmailConfirmedView(View):
     """
@@ -293,7 +299,7 @@ class PasswordChangeView(DjangoPasswordChangeView):
         success_url (str): The URL to redirect to after the password is changed.
     """
 
-    success_url = reverse_lazy('password_change_done')
+    success_url = reverse_lazy('user:password_change_done')
 
 
 class PasswordChangeDoneView(DjangoPasswordChangeDoneView):
@@ -301,17 +307,21 @@ class PasswordChangeDoneView(DjangoPasswordChangeDoneView):
     View for displaying a success message after the password is changed.
     """
 
-    template_name = 'password_change_done.html'
+    template_name = 'user/password_change_done.html'
 
 
-class PasswordResetView(DjangoPasswordResetView):
+class PasswordResetView(ThrottleMixin, DjangoPasswordResetView):
     """
-    View for resetting the user's password.
+    View for resetting the user's password. POSTs are rate limited per IP and
+    per email, so the view can't be used to flood an inbox.
     """
+    throttle_scope = 'password_reset'
+    throttle_account_field = 'email'
+    throttle_saves_hash = False
 
-    template_name = 'password_reset_form.html'
-    email_template_name = 'password_reset_email.html'
-    subject_template_name = 'password_reset_subject.txt'
+    template_name = 'user/password_reset_form.html'
+    email_template_name = 'user/password_reset_email.html'
+    success_url = reverse_lazy('user:password_reset_done')
 
 
 class PasswordResetDoneView(DjangoPasswordResetDoneView):
@@ -319,15 +329,18 @@ class PasswordResetDoneView(DjangoPasswordResetDoneView):
     View for displaying a success message after the password reset email is sent.
     """
 
-    template_name = 'password_reset_done.html'
+    template_name = 'user/password_reset_done.html'
 
 
-class PasswordResetConfirmView(DjangoPasswordResetConfirmView):
+class PasswordResetConfirmView(ThrottleMixin, DjangoPasswordResetConfirmView):
     """
-    View for confirming the password reset.
+    View for confirming the password reset. POSTs hash the new password and are
+    rate limited per IP.
     """
+    throttle_scope = 'password_reset_confirm'
 
-    template_name = 'password_reset_confirm.html'
+    template_name = 'user/password_reset_confirm.html'
+    success_url = reverse_lazy('user:password_reset_complete')
 
 
 class PasswordResetCompleteView(DjangoPasswordResetCompleteView):
@@ -335,4 +348,4 @@ class PasswordResetCompleteView(DjangoPasswordResetCompleteView):
     View for displaying a success message after the password is reset.
     """
 
-    template_name = 'password_reset_complete.html'
\ No newline at end of file
+    template_name = 'user/password_reset_complete.html'
\ No newline at end of file